@@ -4,30 +4,187 @@ API для регистрации и авторизации пользовате
 '''
 
 import json
+import math
 import os
+import random
+import re
 import hashlib
+import hmac
+import base64
 import secrets
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
-def get_db_connection():
-    """Получение подключения к базе данных"""
+# Лимиты запросов: маршрут -> (емкость корзины, секунд на ее полное пополнение).
+# login — попытки входа с одного IP, login_account — попытки входа в одну учетную запись с любых IP
+# (перебор паролей с множества адресов). Переопределяются переменной RATE_LIMITS вида "login=20/60,register=5/3600"
+RATE_LIMIT_DEFAULTS: Dict[str, Tuple[float, float]] = {
+    'login': (20, 60),
+    'login_account': (10, 300),
+    'register': (5, 3600),
+}
+RATE_LIMIT_MAX_KEYS = 50000
+
+# Режим лимитов: local — корзины только в памяти экземпляра,
+# shared — корзины сверяются с таблицей rate_limit_buckets не чаще раза в RATE_LIMIT_SYNC_INTERVAL секунд
+RATE_LIMIT_MODE = os.environ.get('RATE_LIMIT_MODE', 'local')
+RATE_LIMIT_SYNC_INTERVAL = float(os.environ.get('RATE_LIMIT_SYNC_INTERVAL', '1'))
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Лимиты по умолчанию с переопределениями из строки вида route=capacity/seconds"""
+    limits = dict(RATE_LIMIT_DEFAULTS)
+    for item in spec.split(','):
+        route, _, value = item.strip().partition('=')
+        capacity, _, seconds = value.partition('/')
+        if route and capacity and seconds:
+            limits[route] = (float(capacity), float(seconds))
+    return limits
+
+RATE_LIMITS = parse_rate_limits(os.environ.get('RATE_LIMITS', ''))
+
+# "маршрут:субъект" -> [токены, момент пополнения, потрачено с последней сверки, момент сверки]
+_rate_buckets: Dict[str, List[float]] = {}
+_rate_buckets_lock = threading.Lock()
+
+# Реплики для чтения (через запятую) и окно, в течение которого действует подсказка read-your-writes
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+READ_YOUR_WRITES_WINDOW = 30
+# Текстовая форма pg_lsn: два шестнадцатеричных числа через "/"
+LSN_PATTERN = re.compile(r'[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}')
+
+# Маршруты только для чтения, которые можно обслуживать с реплики
+READ_ROUTES = {('GET', 'me')}
+
+def get_db_connection(readonly: bool = False, min_lsn: Optional[str] = None):
+    """Получение подключения к базе данных: чтения уходят на реплику, догнавшую min_lsn"""
     DATABASE_URL = os.environ.get('DATABASE_URL')
     if not DATABASE_URL:
         raise Exception('DATABASE_URL environment variable not set')
     
+    if readonly and DATABASE_REPLICA_URLS:
+        conn = None
+        try:
+            conn = psycopg2.connect(random.choice(DATABASE_REPLICA_URLS), cursor_factory=RealDictCursor)
+            if not min_lsn:
+                return conn
+            
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, false) AS caught_up", (min_lsn,))
+            caught_up = cursor.fetchone()['caught_up']
+            cursor.close()
+            if caught_up:
+                return conn
+            conn.close()
+        except psycopg2.Error:
+            # Недоступная или отстающая реплика — читаем с основного сервера
+            if conn is not None:
+                conn.close()
+    
     return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
 
+def parse_lsn_hint(headers: Dict) -> Optional[str]:
+    """LSN из подсказки X-Min-Lsn вида <lsn>@<unix-время записи>, если она еще не устарела"""
+    hint = headers.get('X-Min-Lsn') or headers.get('x-min-lsn')
+    if not hint:
+        return None
+    
+    lsn, _, written_at = hint.partition('@')
+    if not LSN_PATTERN.fullmatch(lsn):
+        return None
+    try:
+        if time.time() - float(written_at) > READ_YOUR_WRITES_WINDOW:
+            return None
+    except ValueError:
+        return None
+    return lsn
+
+def write_lsn_headers(cursor) -> Dict[str, str]:
+    """Заголовок с LSN только что закоммиченной записи для последующих чтений"""
+    if not DATABASE_REPLICA_URLS:
+        return {}
+    
+    cursor.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+    lsn = cursor.fetchone()['lsn']
+    return {'X-Write-Lsn': f'{lsn}@{int(time.time())}', 'Access-Control-Expose-Headers': 'X-Write-Lsn'}
+
 def hash_password(password: str) -> str:
     """Хеширование пароля"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+# Максимум активных сессий пользователя, самые старые вытесняются
+MAX_SESSIONS_PER_USER = int(os.environ.get('MAX_SESSIONS_PER_USER', '10'))
+
+# Режим токенов: opaque — случайный токен в user_sessions, signed — токен с HMAC-подписью без записи в БД
+SESSION_TOKEN_MODE = os.environ.get('SESSION_TOKEN_MODE', 'opaque')
+SESSION_SIGNING_KEY = os.environ.get('SESSION_SIGNING_KEY', '')
+SESSION_TTL = timedelta(days=30)
+
 def generate_session_token() -> str:
     """Генерация токена сессии"""
     return secrets.token_urlsafe(32)
 
+def hash_session_token(session_token: str) -> bytes:
+    """SHA-256 дайджест токена — в базе хранится только он"""
+    return hashlib.sha256(session_token.encode()).digest()
+
+def sign_session_payload(payload: str) -> str:
+    """HMAC-SHA256 подпись полезной нагрузки токена"""
+    digest = hmac.new(SESSION_SIGNING_KEY.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+def parse_signed_token(session_token: str) -> Optional[Tuple[int, int]]:
+    """Проверка подписи и срока действия токена, возвращает (user_id, generation)"""
+    parts = session_token.split('.')
+    if not SESSION_SIGNING_KEY or len(parts) != 5 or parts[0] != 'v1':
+        return None
+
+    if not hmac.compare_digest(sign_session_payload('.'.join(parts[:4])), parts[4]):
+        return None
+
+    try:
+        user_id, expires, generation = int(parts[1]), int(parts[2]), int(parts[3])
+    except ValueError:
+        return None
+
+    if expires <= time.time():
+        return None
+    return user_id, generation
+
+def issue_session_token(cursor, user_id: int, generation: int) -> str:
+    """Выдача токена в текущем режиме: подписанный или сессия в базе"""
+    if SESSION_TOKEN_MODE == 'signed' and SESSION_SIGNING_KEY:
+        expires = int(time.time() + SESSION_TTL.total_seconds())
+        payload = f'v1.{user_id}.{expires}.{generation}'
+        return f'{payload}.{sign_session_payload(payload)}'
+
+    return create_session(cursor, user_id)
+
+def create_session(cursor, user_id: int) -> str:
+    """Создание сессии с вытеснением самых старых сверх лимита"""
+    session_token = generate_session_token()
+    expires_at = datetime.now() + SESSION_TTL
+
+    cursor.execute("""
+        INSERT INTO user_sessions (user_id, token_hash, expires_at)
+        VALUES (%s, %s, %s)
+    """, (user_id, hash_session_token(session_token), expires_at))
+
+    cursor.execute("""
+        DELETE FROM user_sessions
+        WHERE id IN (
+            SELECT id FROM user_sessions
+            WHERE user_id = %s
+            ORDER BY created_at DESC, id DESC
+            OFFSET %s
+        )
+    """, (user_id, MAX_SESSIONS_PER_USER))
+
+    return session_token
+
 def serialize_user(user_data: Dict) -> Dict:
     """Сериализация данных пользователя для JSON"""
     result = {}
@@ -38,6 +195,86 @@ def serialize_user(user_data: Dict) -> Dict:
             result[key] = value
     return result
 
+def client_ip(event: Dict[str, Any]) -> str:
+    """IP клиента из контекста запроса (с запасным вариантом X-Forwarded-For)"""
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    if identity.get('sourceIp'):
+        return identity['sourceIp']
+    headers = event.get('headers') or {}
+    forwarded = headers.get('X-Forwarded-For') or headers.get('x-forwarded-for') or ''
+    return forwarded.split(',')[0].strip() or 'unknown'
+
+def prune_rate_buckets(now: float) -> None:
+    """Удаление корзин, успевших пополниться до конца: они равносильны отсутствующим (под _rate_buckets_lock)"""
+    for key, bucket in list(_rate_buckets.items()):
+        capacity, period = RATE_LIMITS[key.partition(':')[0]]
+        if not bucket[2] and bucket[0] + (now - bucket[1]) * capacity / period >= capacity:
+            _rate_buckets.pop(key, None)
+    if len(_rate_buckets) >= RATE_LIMIT_MAX_KEYS:
+        _rate_buckets.clear()
+
+def check_rate_limit(cursor, route: str, subject: Any) -> float:
+    """Списание токена из корзины маршрута; 0 — запрос разрешен, иначе секунды до появления токена"""
+    capacity, period = RATE_LIMITS[route]
+    rate = capacity / period
+    key = f'{route}:{subject}'
+    now = time.monotonic()
+
+    with _rate_buckets_lock:
+        bucket = _rate_buckets.get(key)
+        if bucket is None:
+            if len(_rate_buckets) >= RATE_LIMIT_MAX_KEYS:
+                prune_rate_buckets(now)
+            bucket = _rate_buckets[key] = [capacity, now, 0.0, float('-inf')]
+        else:
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        spent = None
+        if RATE_LIMIT_MODE == 'shared' and now - bucket[3] >= RATE_LIMIT_SYNC_INTERVAL:
+            # Сверку забирает один поток; запрос к базе идет без блокировки
+            spent, bucket[2], bucket[3] = bucket[2], 0.0, now
+
+    if spent is not None:
+        tokens = sync_rate_bucket(cursor, key, spent, capacity, rate)
+        with _rate_buckets_lock:
+            # Токены, потраченные другими потоками во время сверки, еще не учтены в общей корзине
+            bucket[0] = tokens - bucket[2]
+
+    with _rate_buckets_lock:
+        if bucket[0] < 1:
+            return (1 - bucket[0]) / rate
+        bucket[0] -= 1
+        bucket[2] += 1
+        return 0.0
+
+def sync_rate_bucket(cursor, key: str, spent: float, capacity: float, rate: float) -> float:
+    """Сверка с общей корзиной: списание потраченного здесь и получение остатка с учетом других экземпляров"""
+    cursor.execute("""
+        INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+        VALUES (%(key)s, %(capacity)s - %(spent)s, NOW())
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = GREATEST(-%(capacity)s, LEAST(%(capacity)s,
+                         b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at)::float8 * %(rate)s) - %(spent)s),
+            updated_at = NOW()
+        RETURNING tokens
+    """, {'key': key, 'capacity': capacity, 'rate': rate, 'spent': spent})
+    tokens = cursor.fetchone()['tokens']
+    # Отдельная короткая транзакция: строка корзины не остается заблокированной до конца запроса
+    cursor.connection.commit()
+    return tokens
+
+def rate_limited_response(retry_after: float) -> Dict[str, Any]:
+    return {
+        'statusCode': 429,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',
+            'Content-Type': 'application/json',
+            'Retry-After': str(math.ceil(retry_after))
+        },
+        'body': json.dumps({'error': 'Слишком много запросов, попробуйте позже'})
+    }
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Обработка запросов аутентификации
@@ -58,18 +295,24 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Auth-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Auth-Token, X-Min-Lsn',
                 'Access-Control-Max-Age': '86400'
             },
             'body': ''
         }
     
     try:
-        conn = get_db_connection()
+        readonly = (method, action) in READ_ROUTES
+        min_lsn = parse_lsn_hint(event.get('headers') or {}) if readonly else None
+        conn = get_db_connection(readonly, min_lsn)
         cursor = conn.cursor()
         
         if method == 'POST' and action == 'register':
             # Регистрация нового пользователя
+            retry_after = check_rate_limit(cursor, 'register', client_ip(event))
+            if retry_after:
+                return rate_limited_response(retry_after)
+            
             body_data = json.loads(event.get('body', '{}'))
             
             username = body_data.get('username', '').strip()
@@ -114,19 +357,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             user = cursor.fetchone()
             
             # Создание сессии
-            session_token = generate_session_token()
-            expires_at = datetime.now() + timedelta(days=30)
-            
-            cursor.execute("""
-                INSERT INTO user_sessions (user_id, session_token, expires_at)
-                VALUES (%s, %s, %s)
-            """, (user['id'], session_token, expires_at))
+            session_token = issue_session_token(cursor, user['id'], 0)
             
             conn.commit()
             
             return {
                 'statusCode': 201,
-                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json', **write_lsn_headers(cursor)},
                 'body': json.dumps({
                     'user': serialize_user(dict(user)),
                     'session_token': session_token,
@@ -136,6 +373,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         elif method == 'POST' and action == 'login':
             # Вход пользователя
+            retry_after = check_rate_limit(cursor, 'login', client_ip(event))
+            if retry_after:
+                return rate_limited_response(retry_after)
+            
             body_data = json.loads(event.get('body', '{}'))
             
             email = body_data.get('email', '').strip().lower()
@@ -148,10 +389,15 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Введите email и пароль'})
                 }
             
+            retry_after = check_rate_limit(cursor, 'login_account', email)
+            if retry_after:
+                return rate_limited_response(retry_after)
+            
             # Поиск пользователя
             password_hash = hash_password(password)
             cursor.execute("""
-                SELECT id, username, email, full_name, avatar_url, followers_count, following_count, posts_count
+                SELECT id, username, email, full_name, avatar_url, followers_count, following_count, posts_count,
+                       session_generation
                 FROM users 
                 WHERE email = %s AND password_hash = %s
             """, (email, password_hash))
@@ -165,21 +411,16 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 }
             
             # Создание новой сессии
-            session_token = generate_session_token()
-            expires_at = datetime.now() + timedelta(days=30)
-            
-            cursor.execute("""
-                INSERT INTO user_sessions (user_id, session_token, expires_at)
-                VALUES (%s, %s, %s)
-            """, (user['id'], session_token, expires_at))
+            user = dict(user)
+            session_token = issue_session_token(cursor, user['id'], user.pop('session_generation'))
             
             conn.commit()
             
             return {
                 'statusCode': 200,
-                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json', **write_lsn_headers(cursor)},
                 'body': json.dumps({
-                    'user': serialize_user(dict(user)),
+                    'user': serialize_user(user),
                     'session_token': session_token,
                     'message': 'Вход выполнен успешно'
                 })
@@ -190,16 +431,25 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             headers = event.get('headers', {})
             session_token = headers.get('X-Auth-Token') or headers.get('x-auth-token')
             
-            if session_token:
+            claims = parse_signed_token(session_token) if session_token else None
+            
+            if claims:
+                # Подписанный токен отзывается сменой поколения — вместе со всеми токенами пользователя
+                cursor.execute(
+                    "UPDATE users SET session_generation = session_generation + 1 WHERE id = %s AND session_generation = %s",
+                    claims
+                )
+                conn.commit()
+            elif session_token:
                 cursor.execute(
-                    "UPDATE user_sessions SET expires_at = NOW() WHERE session_token = %s",
-                    (session_token,)
+                    "DELETE FROM user_sessions WHERE token_hash = %s",
+                    (hash_session_token(session_token),)
                 )
                 conn.commit()
             
             return {
                 'statusCode': 200,
-                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json', **write_lsn_headers(cursor)},
                 'body': json.dumps({'message': 'Выход выполнен успешно'})
             }
         
@@ -216,13 +466,23 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 }
             
             # Проверка сессии
-            cursor.execute("""
-                SELECT u.id, u.username, u.email, u.full_name, u.avatar_url, u.bio,
-                       u.followers_count, u.following_count, u.posts_count, u.is_verified
-                FROM users u
-                JOIN user_sessions s ON u.id = s.user_id
-                WHERE s.session_token = %s AND s.expires_at > NOW()
-            """, (session_token,))
+            claims = parse_signed_token(session_token)
+            
+            if claims:
+                cursor.execute("""
+                    SELECT u.id, u.username, u.email, u.full_name, u.avatar_url, u.bio,
+                           u.followers_count, u.following_count, u.posts_count, u.is_verified
+                    FROM users u
+                    WHERE u.id = %s AND u.session_generation = %s
+                """, claims)
+            else:
+                cursor.execute("""
+                    SELECT u.id, u.username, u.email, u.full_name, u.avatar_url, u.bio,
+                           u.followers_count, u.following_count, u.posts_count, u.is_verified
+                    FROM users u
+                    JOIN user_sessions s ON u.id = s.user_id
+                    WHERE s.token_hash = %s AND s.expires_at > NOW()
+                """, (hash_session_token(session_token),))
             
             user = cursor.fetchone()
             if not user:
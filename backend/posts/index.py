@@ -4,38 +4,515 @@ API для работы с постами социальной сети
 '''
 
 import json
+import math
 import os
+import random
+import re
+import hashlib
+import hmac
+import base64
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
-def get_db_connection():
-    """Получение подключения к базе данных"""
+# Подписанные токены (SESSION_TOKEN_MODE=signed): v1.<user_id>.<expires>.<generation>.<hmac>
+SESSION_SIGNING_KEY = os.environ.get('SESSION_SIGNING_KEY', '')
+SIGNED_USER_CACHE_TTL = float(os.environ.get('SIGNED_USER_CACHE_TTL', '30'))
+SIGNED_USER_CACHE_SIZE = 10000
+
+# user_id -> (момент истечения, пользователь с session_generation)
+_signed_user_cache: Dict[int, Tuple[float, Dict]] = {}
+_signed_user_cache_lock = threading.Lock()
+
+# LRU-кэш компактных данных пользователей: id -> (момент истечения, кортеж полей).
+# Профили меняются вне этой функции, поэтому записи живут не дольше USER_CACHE_TTL
+USER_CACHE_FIELDS = ('id', 'username', 'full_name', 'avatar_url', 'is_verified')
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '5000'))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '60'))
+_user_cache: 'OrderedDict[int, Tuple[float, Tuple]]' = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+# Режим записи лайков: direct — сразу в post_likes, queue — в очередь like_intents для пакетного применения
+LIKE_WRITE_MODE = os.environ.get('LIKE_WRITE_MODE', 'direct')
+
+# Таблицы постов секционированы по месяцам (scripts/partitions.py swap): запросы передают время поста
+POSTS_PARTITIONED = os.environ.get('POSTS_PARTITIONED', '') == '1'
+
+# Режим рендеринга списков: python — строки в dict и json.dumps, db — готовый JSON из Postgres
+JSON_RENDER_MODE = os.environ.get('JSON_RENDER_MODE', 'python')
+
+# Хэштеги и упоминания: #тег и @username в начале слова (адреса e-mail и якоря ссылок не считаются)
+TAG_PATTERN = re.compile(r'(?<![\w#@/])([#@])(\w{1,64})(?!\w)')
+MAX_TAGS_PER_POST = 20
+
+# Поиск по постам: каждые 12.5 часов свежести стоят десятикратной релевантности, как в post_score(),
+# поэтому оценка не зависит от момента запроса и годится для keyset-пагинации
+SEARCH_RECENCY_SECONDS = 45000
+# Совпадения ранжируются окнами по SEARCH_CANDIDATES от новых к старым: частое слово не заставляет считать
+# ts_rank_cd по всей таблице. Когда окно пролистано, курсор переходит к следующему, более старому окну
+SEARCH_CANDIDATES = int(os.environ.get('SEARCH_CANDIDATES', '2000'))
+# Совпадения в фрагменте отмечаются управляющими символами и отдаются клиенту списком, а не разметкой
+SEARCH_HEADLINE_OPTIONS = 'StartSel=\x02, StopSel=\x03, MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=" ... "'
+HEADLINE_MATCH = re.compile('\x02(.*?)\x03')
+
+# Канал LISTEN/NOTIFY для scripts/realtime_server.py
+REALTIME_CHANNEL = 'social_events'
+
+# NOTIFY сериализует коммиты всех уведомляющих транзакций, поэтому прямые лайки не уведомляют каждый раз:
+# счетчики копятся в процессе и уходят одним событием likes не чаще раза в LIKE_NOTIFY_INTERVAL секунд
+# (с очередным лайком) или при LIKE_NOTIFY_MAX_POSTS постах. В режиме queue события шлет apply_like_intents.py
+LIKE_NOTIFY_INTERVAL = float(os.environ.get('LIKE_NOTIFY_INTERVAL', '1'))
+LIKE_NOTIFY_MAX_POSTS = 200
+_like_counts: Dict[int, int] = {}
+_like_counts_lock = threading.Lock()
+_like_notified_at = 0.0
+
+# Лимиты запросов: маршрут -> (емкость корзины, секунд на ее полное пополнение).
+# Переопределяются переменной RATE_LIMITS вида "like=120/60,comment=20/60"
+RATE_LIMIT_DEFAULTS: Dict[str, Tuple[float, float]] = {
+    'like': (120, 60),
+    'comment': (20, 60),
+}
+RATE_LIMIT_MAX_KEYS = 50000
+
+# Режим лимитов: local — корзины только в памяти экземпляра,
+# shared — корзины сверяются с таблицей rate_limit_buckets не чаще раза в RATE_LIMIT_SYNC_INTERVAL секунд
+RATE_LIMIT_MODE = os.environ.get('RATE_LIMIT_MODE', 'local')
+RATE_LIMIT_SYNC_INTERVAL = float(os.environ.get('RATE_LIMIT_SYNC_INTERVAL', '1'))
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Лимиты по умолчанию с переопределениями из строки вида route=capacity/seconds"""
+    limits = dict(RATE_LIMIT_DEFAULTS)
+    for item in spec.split(','):
+        route, _, value = item.strip().partition('=')
+        capacity, _, seconds = value.partition('/')
+        if route and capacity and seconds:
+            limits[route] = (float(capacity), float(seconds))
+    return limits
+
+RATE_LIMITS = parse_rate_limits(os.environ.get('RATE_LIMITS', ''))
+
+# "маршрут:субъект" -> [токены, момент пополнения, потрачено с последней сверки, момент сверки]
+_rate_buckets: Dict[str, List[float]] = {}
+_rate_buckets_lock = threading.Lock()
+
+# Склейка одновременных одинаковых чтений (для долгоживущего процесса с потоками):
+# один запрос к базе на всех, поля конкретного зрителя накладываются отдельно
+SINGLE_FLIGHT = os.environ.get('SINGLE_FLIGHT', '') == '1'
+SINGLE_FLIGHT_WAIT = 5.0
+
+# Реплики для чтения (через запятую) и окно, в течение которого действует подсказка read-your-writes
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+READ_YOUR_WRITES_WINDOW = 30
+# Текстовая форма pg_lsn: два шестнадцатеричных числа через "/"
+LSN_PATTERN = re.compile(r'[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}')
+
+# Маршруты только для чтения, которые можно обслуживать с реплики
+READ_ROUTES = {('GET', ''), ('GET', 'comments'), ('GET', 'tag'), ('GET', 'trending'), ('GET', 'search_posts')}
+
+def get_db_connection(readonly: bool = False, min_lsn: Optional[str] = None):
+    """Получение подключения к базе данных: чтения уходят на реплику, догнавшую min_lsn"""
     DATABASE_URL = os.environ.get('DATABASE_URL')
     if not DATABASE_URL:
         raise Exception('DATABASE_URL environment variable not set')
     
+    if readonly and DATABASE_REPLICA_URLS:
+        conn = None
+        try:
+            conn = psycopg2.connect(random.choice(DATABASE_REPLICA_URLS), cursor_factory=RealDictCursor)
+            if not min_lsn:
+                return conn
+            
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, false) AS caught_up", (min_lsn,))
+            caught_up = cursor.fetchone()['caught_up']
+            cursor.close()
+            if caught_up:
+                return conn
+            conn.close()
+        except psycopg2.Error:
+            # Недоступная или отстающая реплика — читаем с основного сервера
+            if conn is not None:
+                conn.close()
+    
     return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
 
+def parse_lsn_hint(headers: Dict) -> Optional[str]:
+    """LSN из подсказки X-Min-Lsn вида <lsn>@<unix-время записи>, если она еще не устарела"""
+    hint = headers.get('X-Min-Lsn') or headers.get('x-min-lsn')
+    if not hint:
+        return None
+    
+    lsn, _, written_at = hint.partition('@')
+    if not LSN_PATTERN.fullmatch(lsn):
+        return None
+    try:
+        if time.time() - float(written_at) > READ_YOUR_WRITES_WINDOW:
+            return None
+    except ValueError:
+        return None
+    return lsn
+
+def write_lsn_headers(cursor) -> Dict[str, str]:
+    """Заголовок с LSN только что закоммиченной записи для последующих чтений"""
+    if not DATABASE_REPLICA_URLS:
+        return {}
+    
+    cursor.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+    lsn = cursor.fetchone()['lsn']
+    return {'X-Write-Lsn': f'{lsn}@{int(time.time())}', 'Access-Control-Expose-Headers': 'X-Write-Lsn'}
+
+def parse_signed_token(session_token: str) -> Optional[Tuple[int, int]]:
+    """Проверка подписи и срока действия токена, возвращает (user_id, generation)"""
+    parts = session_token.split('.')
+    if not SESSION_SIGNING_KEY or len(parts) != 5 or parts[0] != 'v1':
+        return None
+
+    payload = '.'.join(parts[:4])
+    digest = hmac.new(SESSION_SIGNING_KEY.encode(), payload.encode(), hashlib.sha256).digest()
+    signature = base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+    if not hmac.compare_digest(signature, parts[4]):
+        return None
+
+    try:
+        user_id, expires, generation = int(parts[1]), int(parts[2]), int(parts[3])
+    except ValueError:
+        return None
+
+    if expires <= time.time():
+        return None
+    return user_id, generation
+
+def get_user_from_signed_token(cursor, session_token: str) -> Optional[Dict]:
+    """Пользователь по подписанному токену: проверка поколения идет по кэшу процесса"""
+    claims = parse_signed_token(session_token)
+    if not claims:
+        return None
+    user_id, generation = claims
+
+    now = time.monotonic()
+    cached = _signed_user_cache.get(user_id)
+    if not cached or cached[0] <= now:
+        cursor.execute("""
+            SELECT id, username, full_name, avatar_url, session_generation
+            FROM users
+            WHERE id = %s
+        """, (user_id,))
+        user = cursor.fetchone()
+        if not user:
+            return None
+        cached = (now + SIGNED_USER_CACHE_TTL, dict(user))
+        with _signed_user_cache_lock:
+            if len(_signed_user_cache) >= SIGNED_USER_CACHE_SIZE:
+                _signed_user_cache.clear()
+            _signed_user_cache[user_id] = cached
+
+    user = cached[1]
+    if user['session_generation'] != generation:
+        return None
+    return {key: value for key, value in user.items() if key != 'session_generation'}
+
 def get_user_from_token(cursor, session_token: str) -> Optional[Dict]:
     """Получение пользователя по токену сессии"""
+    if session_token.startswith('v1.'):
+        return get_user_from_signed_token(cursor, session_token)
+
     cursor.execute("""
         SELECT u.id, u.username, u.full_name, u.avatar_url
         FROM users u
         JOIN user_sessions s ON u.id = s.user_id
-        WHERE s.session_token = %s AND s.expires_at > NOW()
-    """, (session_token,))
+        WHERE s.token_hash = %s AND s.expires_at > NOW()
+    """, (hashlib.sha256(session_token.encode()).digest(),))
     return cursor.fetchone()
 
+def serialize_row(row: Dict) -> Dict:
+    """Сериализация строки результата для JSON (формат времени совпадает с to_char в SQL)"""
+    result = {}
+    for key, value in row.items():
+        if isinstance(value, datetime):
+            result[key] = value.isoformat(timespec='microseconds')
+        else:
+            result[key] = value
+    return result
+
+def hydrate_users(cursor, user_ids) -> Dict[str, Dict]:
+    """Компактные данные авторов по набору id: из LRU-кэша, промахи одним запросом"""
+    now = time.monotonic()
+    users: Dict[str, Dict] = {}
+    misses = []
+
+    # Порядок OrderedDict меняется при каждом попадании, поэтому и чтение идет под блокировкой
+    with _user_cache_lock:
+        for user_id in set(user_ids):
+            cached = _user_cache.get(user_id)
+            if cached and cached[0] > now:
+                _user_cache.move_to_end(user_id)
+                users[str(user_id)] = dict(zip(USER_CACHE_FIELDS, cached[1]))
+            else:
+                misses.append(user_id)
+
+    if misses:
+        cursor.execute("""
+            SELECT id, username, full_name, avatar_url, is_verified
+            FROM users
+            WHERE id = ANY(%s)
+        """, (misses,))
+        records = [tuple(user[field] for field in USER_CACHE_FIELDS) for user in cursor.fetchall()]
+
+        with _user_cache_lock:
+            for record in records:
+                _user_cache[record[0]] = (now + USER_CACHE_TTL, record)
+                _user_cache.move_to_end(record[0])
+            while len(_user_cache) > USER_CACHE_SIZE:
+                _user_cache.popitem(last=False)
+
+        for record in records:
+            users[str(record[0])] = dict(zip(USER_CACHE_FIELDS, record))
+
+    return users
+
+def render_json_page(cursor, query: str, params, order_by: str,
+                     user_column: Optional[str] = None) -> Tuple[str, str]:
+    """Рендеринг страницы списка в JSON на стороне Postgres: массив строк и карта пользователей.
+    json_agg не обязан сохранять порядок подзапроса, поэтому order_by повторяет его по колонкам page;
+    значения для %s в order_by передаются в конце params"""
+    users_sql = "'{}'::json"
+    if user_column:
+        users_sql = f"""(
+            SELECT COALESCE(json_object_agg(u.id, json_build_object(
+                'id', u.id, 'username', u.username, 'full_name', u.full_name,
+                'avatar_url', u.avatar_url, 'is_verified', u.is_verified
+            )), '{{}}'::json)
+            FROM users u
+            WHERE u.id IN (SELECT {user_column} FROM page)
+        )"""
+
+    cursor.execute(f"""
+        WITH page AS ({query})
+        SELECT (SELECT COALESCE(json_agg(row_to_json(page) ORDER BY {order_by}), '[]'::json) FROM page)::text AS rows,
+               {users_sql}::text AS users
+    """, params)
+    rendered = cursor.fetchone()
+    return rendered['rows'], rendered['users']
+
+def get_post_created_at(cursor, post_id) -> Optional[datetime]:
+    """Время создания поста — ключ секционирования для связанных запросов"""
+    cursor.execute("SELECT created_at FROM posts WHERE id = %s", (post_id,))
+    post = cursor.fetchone()
+    return post['created_at'] if post else None
+
+def partition_filter(column: str, post_created_at: datetime) -> Tuple[str, Tuple]:
+    """Условие на время поста для отсечения секций (пустое, пока таблицы не секционированы)"""
+    if not POSTS_PARTITIONED:
+        return '', ()
+    return f' AND {column} = %s', (post_created_at,)
+
+def likes_partition_join(post_alias: str) -> str:
+    """Условие на время поста для post_likes pl, чтобы проверка лайка читала одну месячную секцию.
+    До переключения у старых строк post_likes время поста не заполнено, поэтому условие пустое"""
+    if not POSTS_PARTITIONED:
+        return ''
+    return f' AND pl.post_created_at = {post_alias}.created_at'
+
+def extract_tags(content: str) -> Tuple[List[str], List[str]]:
+    """Хэштеги (в нижнем регистре) и упомянутые username за один проход по тексту, без повторов"""
+    tags: Dict[str, None] = {}
+    mentions: Dict[str, None] = {}
+    for sign, word in TAG_PATTERN.findall(content):
+        if sign == '#':
+            if len(tags) < MAX_TAGS_PER_POST:
+                tags[word.lower()] = None
+        elif len(mentions) < MAX_TAGS_PER_POST and len(word) <= 50:
+            mentions[word] = None
+    return list(tags), list(mentions)
+
+def save_tags(cursor, post_id: int, post_created_at: datetime, tags: List[str], mentions: List[str]) -> None:
+    """Запись тегов и упоминаний поста; упоминания несуществующих пользователей отбрасываются"""
+    if tags:
+        cursor.execute("""
+            INSERT INTO post_tags (tag, post_id, post_created_at)
+            SELECT unnest(%s::VARCHAR[]), %s, %s
+            ON CONFLICT DO NOTHING
+        """, (tags, post_id, post_created_at))
+    if mentions:
+        cursor.execute("""
+            INSERT INTO post_mentions (user_id, post_id, post_created_at)
+            SELECT id, %s, %s FROM users WHERE username = ANY(%s)
+            ON CONFLICT DO NOTHING
+        """, (post_id, post_created_at, mentions))
+
+def split_headline(headline: str) -> Tuple[str, List[str]]:
+    """Фрагмент текста без меток и совпавшие слова в порядке появления"""
+    terms = list(dict.fromkeys(match.lower() for match in HEADLINE_MATCH.findall(headline)))
+    return headline.replace('\x02', '').replace('\x03', ''), terms
+
+def notify_event(cursor, event_type: str, **payload) -> None:
+    """Событие для realtime-слушателя: доставляется подписчикам LISTEN после коммита"""
+    cursor.execute("SELECT pg_notify(%s, %s)", (REALTIME_CHANNEL, json.dumps({'type': event_type, **payload})))
+
+def notify_like_count(cursor, post_id: int, likes_count: int) -> None:
+    """Накопление счетчика лайков; уведомляет только транзакция, на которую пришелся конец интервала"""
+    global _like_notified_at
+    now = time.monotonic()
+    with _like_counts_lock:
+        _like_counts[post_id] = likes_count
+        if now - _like_notified_at < LIKE_NOTIFY_INTERVAL and len(_like_counts) < LIKE_NOTIFY_MAX_POSTS:
+            return
+        counts = {str(key): value for key, value in _like_counts.items()}
+        _like_counts.clear()
+        _like_notified_at = now
+    notify_event(cursor, 'likes', counts=counts)
+
+def prune_rate_buckets(now: float) -> None:
+    """Удаление корзин, успевших пополниться до конца: они равносильны отсутствующим (под _rate_buckets_lock)"""
+    for key, bucket in list(_rate_buckets.items()):
+        capacity, period = RATE_LIMITS[key.partition(':')[0]]
+        if not bucket[2] and bucket[0] + (now - bucket[1]) * capacity / period >= capacity:
+            _rate_buckets.pop(key, None)
+    if len(_rate_buckets) >= RATE_LIMIT_MAX_KEYS:
+        _rate_buckets.clear()
+
+def check_rate_limit(cursor, route: str, subject: Any) -> float:
+    """Списание токена из корзины маршрута; 0 — запрос разрешен, иначе секунды до появления токена"""
+    capacity, period = RATE_LIMITS[route]
+    rate = capacity / period
+    key = f'{route}:{subject}'
+    now = time.monotonic()
+
+    with _rate_buckets_lock:
+        bucket = _rate_buckets.get(key)
+        if bucket is None:
+            if len(_rate_buckets) >= RATE_LIMIT_MAX_KEYS:
+                prune_rate_buckets(now)
+            bucket = _rate_buckets[key] = [capacity, now, 0.0, float('-inf')]
+        else:
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        spent = None
+        if RATE_LIMIT_MODE == 'shared' and now - bucket[3] >= RATE_LIMIT_SYNC_INTERVAL:
+            # Сверку забирает один поток; запрос к базе идет без блокировки
+            spent, bucket[2], bucket[3] = bucket[2], 0.0, now
+
+    if spent is not None:
+        tokens = sync_rate_bucket(cursor, key, spent, capacity, rate)
+        with _rate_buckets_lock:
+            # Токены, потраченные другими потоками во время сверки, еще не учтены в общей корзине
+            bucket[0] = tokens - bucket[2]
+
+    with _rate_buckets_lock:
+        if bucket[0] < 1:
+            return (1 - bucket[0]) / rate
+        bucket[0] -= 1
+        bucket[2] += 1
+        return 0.0
+
+def sync_rate_bucket(cursor, key: str, spent: float, capacity: float, rate: float) -> float:
+    """Сверка с общей корзиной: списание потраченного здесь и получение остатка с учетом других экземпляров"""
+    cursor.execute("""
+        INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+        VALUES (%(key)s, %(capacity)s - %(spent)s, NOW())
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = GREATEST(-%(capacity)s, LEAST(%(capacity)s,
+                         b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at)::float8 * %(rate)s) - %(spent)s),
+            updated_at = NOW()
+        RETURNING tokens
+    """, {'key': key, 'capacity': capacity, 'rate': rate, 'spent': spent})
+    tokens = cursor.fetchone()['tokens']
+    # Отдельная короткая транзакция: строка корзины не остается заблокированной до конца запроса
+    cursor.connection.commit()
+    return tokens
+
+def rate_limited_response(retry_after: float) -> Dict[str, Any]:
+    return {
+        'statusCode': 429,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',
+            'Content-Type': 'application/json',
+            'Retry-After': str(math.ceil(retry_after))
+        },
+        'body': json.dumps({'error': 'Слишком много запросов, попробуйте позже'})
+    }
+
+def viewer_like_state(cursor, viewer_id: int, posts: List[Dict]) -> Dict[int, Tuple[bool, int]]:
+    """Лайк зрителя по постам набора и поправка к likes_count на его еще не примененное намерение"""
+    cursor.execute("""
+        SELECT p.id,
+               COALESCE(li.liked, own.applied) AS is_liked,
+               COALESCE(li.liked::int - own.applied::int, 0) AS likes_delta
+        FROM unnest(%(post_ids)s::INTEGER[], %(created_at)s::TIMESTAMP[]) AS p(id, created_at)
+        CROSS JOIN LATERAL (
+            SELECT EXISTS (
+                SELECT 1 FROM post_likes pl WHERE pl.post_id = p.id AND pl.user_id = %(viewer_id)s""" + likes_partition_join('p') + """
+            ) AS applied
+        ) own
+        LEFT JOIN LATERAL (
+            SELECT li.liked FROM like_intents li
+            WHERE li.user_id = %(viewer_id)s AND li.post_id = p.id
+            ORDER BY li.id DESC LIMIT 1
+        ) li ON true
+    """, {
+        'viewer_id': viewer_id,
+        'post_ids': [post['id'] for post in posts],
+        'created_at': [post['created_at'] for post in posts]
+    })
+    return {row['id']: (row['is_liked'], row['likes_delta']) for row in cursor.fetchall()}
+
+class Flight:
+    """Выполняющееся чтение, результат которого ждут остальные запросы с тем же ключом"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[Exception] = None
+
+_flights: Dict[str, Flight] = {}
+_flights_lock = threading.Lock()
+
+def single_flight(key: str, load):
+    """Результат load() для ключа: первый запрос выполняет его, одновременные с ним ждут и получают тот же результат"""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Flight()
+
+    if not leader:
+        # Зависший лидер не должен держать остальных: по таймауту читаем сами
+        if not flight.done.wait(SINGLE_FLIGHT_WAIT):
+            return load()
+        if flight.error:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = load()
+        return flight.result
+    except Exception as error:
+        flight.error = error
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Обработка запросов для работы с постами
-    GET / - получение ленты постов
+    GET / - получение ленты постов (sort=top - популярные, before=ISO-время - курсор)
     POST /?action=create - создание нового поста
     POST /?action=like - лайк/дизлайк поста
     POST /?action=comment - добавление комментария
     GET /?action=comments&post_id=X - получение комментариев поста
+    GET /?action=tag&tag=X - лента постов по хэштегу (before, before_id - курсор)
+    GET /?action=trending - популярные хэштеги за последние часы
+    GET /?action=search_posts&q=X - полнотекстовый поиск постов (next_cursor: before_score, before_id
+        и window_before, window_before_id - граница окна из SEARCH_CANDIDATES совпадений)
     '''
     
     method: str = event.get('httpMethod', 'GET')
@@ -49,14 +526,16 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Auth-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Auth-Token, X-Min-Lsn',
                 'Access-Control-Max-Age': '86400'
             },
             'body': ''
         }
     
     try:
-        conn = get_db_connection()
+        readonly = (method, action) in READ_ROUTES
+        min_lsn = parse_lsn_hint(event.get('headers') or {}) if readonly else None
+        conn = get_db_connection(readonly, min_lsn)
         cursor = conn.cursor()
         
         # Получение токена авторизации
@@ -72,26 +551,102 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             page = int(query_params.get('page', 1))
             limit = min(int(query_params.get('limit', 20)), 50)
             offset = (page - 1) * limit
+            sort = query_params.get('sort', 'new')
+            # Курсор по времени: глубокие страницы читают только нужные месячные секции
+            before = query_params.get('before')
             
-            cursor.execute("""
-                SELECT p.id, p.content, p.image_url, p.likes_count, p.comments_count, 
-                       p.shares_count, p.created_at,
-                       u.id as user_id, u.username, u.full_name, u.avatar_url, u.is_verified,
-                       CASE WHEN pl.user_id IS NOT NULL THEN true ELSE false END as is_liked
-                FROM posts p
-                JOIN users u ON p.user_id = u.id
-                LEFT JOIN post_likes pl ON p.id = pl.post_id AND pl.user_id = %s
-                ORDER BY p.created_at DESC
-                LIMIT %s OFFSET %s
-            """, (current_user['id'] if current_user else None, limit, offset))
+            if sort == 'top':
+                # Популярные посты: диапазонное сканирование idx_post_scores_score
+                query = """
+                    SELECT p.id, p.user_id, p.content, p.image_url,
+                           p.likes_count + COALESCE(li.liked::int - (pl.user_id IS NOT NULL)::int, 0) as likes_count,
+                           p.comments_count, p.shares_count,
+                           to_char(p.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') as created_at,
+                           COALESCE(li.liked, pl.user_id IS NOT NULL) as is_liked
+                    FROM post_scores ps
+                    JOIN posts p ON p.id = ps.post_id AND p.created_at = ps.post_created_at
+                    LEFT JOIN post_likes pl ON p.id = pl.post_id AND pl.user_id = %s""" + likes_partition_join('p') + """
+                    LEFT JOIN LATERAL (
+                        SELECT li.liked FROM like_intents li
+                        WHERE li.user_id = %s AND li.post_id = p.id
+                        ORDER BY li.id DESC LIMIT 1
+                    ) li ON true
+                    ORDER BY ps.score DESC, ps.post_id DESC
+                    LIMIT %s OFFSET %s
+                """
+            else:
+                query = """
+                    SELECT p.id, p.user_id, p.content, p.image_url,
+                           p.likes_count + COALESCE(li.liked::int - (pl.user_id IS NOT NULL)::int, 0) as likes_count,
+                           p.comments_count, p.shares_count,
+                           to_char(p.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') as created_at,
+                           COALESCE(li.liked, pl.user_id IS NOT NULL) as is_liked
+                    FROM posts p
+                    LEFT JOIN post_likes pl ON p.id = pl.post_id AND pl.user_id = %s""" + likes_partition_join('p') + """
+                    LEFT JOIN LATERAL (
+                        SELECT li.liked FROM like_intents li
+                        WHERE li.user_id = %s AND li.post_id = p.id
+                        ORDER BY li.id DESC LIMIT 1
+                    ) li ON true
+                """ + ("WHERE p.created_at < %s" if before else "") + """
+                    ORDER BY p.created_at DESC, p.id DESC
+                    LIMIT %s OFFSET %s
+                """
+            viewer_id = current_user['id'] if current_user else None
+            if sort != 'top' and before:
+                params = (viewer_id, viewer_id, before, limit, offset)
+            else:
+                params = (viewer_id, viewer_id, limit, offset)
+            
+            if SINGLE_FLIGHT and not min_lsn:
+                # Страница без полей зрителя — общая для одновременных запросов, is_liked накладывается после
+                def load_page():
+                    cursor.execute(query, (None, None) + params[2:])
+                    rows = [serialize_row(post) for post in cursor.fetchall()]
+                    return rows, hydrate_users(cursor, [post['user_id'] for post in rows])
+                
+                sort_key = 'top' if sort == 'top' else 'new'
+                posts, users = single_flight(f'feed:{sort_key}:{before}:{limit}:{offset}', load_page)
+                if viewer_id:
+                    state = viewer_like_state(cursor, viewer_id, posts)
+                    posts = [
+                        {**post, 'is_liked': state[post['id']][0], 'likes_count': post['likes_count'] + state[post['id']][1]}
+                        for post in posts
+                    ]
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': json.dumps({
+                        'posts': posts,
+                        'users': users,
+                        'page': page,
+                        'limit': limit
+                    })
+                }
             
+            if JSON_RENDER_MODE == 'db':
+                if sort == 'top':
+                    order_by = "(SELECT ps.score FROM post_scores ps WHERE ps.post_id = page.id) DESC, page.id DESC"
+                else:
+                    order_by = 'page.created_at DESC, page.id DESC'
+                posts_json, users_json = render_json_page(cursor, query, params, order_by, 'user_id')
+                return {
+                    'statusCode': 200,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': f'{{"posts": {posts_json}, "users": {users_json}, "page": {page}, "limit": {limit}}}'
+                }
+            
+            cursor.execute(query, params)
             posts = cursor.fetchall()
+            users = hydrate_users(cursor, [post['user_id'] for post in posts])
             
             return {
                 'statusCode': 200,
                 'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
                 'body': json.dumps({
-                    'posts': [dict(post) for post in posts],
+                    'posts': [serialize_row(post) for post in posts],
+                    'users': users,
                     'page': page,
                     'limit': limit
                 })
@@ -126,19 +681,23 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             
             post = cursor.fetchone()
             
+            tags, mentions = extract_tags(content)
+            save_tags(cursor, post['id'], post['created_at'], tags, mentions)
+            
             # Обновление счетчика постов пользователя
             cursor.execute("""
                 UPDATE users SET posts_count = posts_count + 1 
                 WHERE id = %s
             """, (current_user['id'],))
             
+            notify_event(cursor, 'post_created', post_id=post['id'], user_id=current_user['id'])
             conn.commit()
             
             return {
                 'statusCode': 201,
-                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json', **write_lsn_headers(cursor)},
                 'body': json.dumps({
-                    'post': dict(post),
+                    'post': serialize_row(post),
                     'user': dict(current_user),
                     'message': 'Пост создан успешно'
                 })
@@ -153,6 +712,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Требуется авторизация'})
                 }
             
+            retry_after = check_rate_limit(cursor, 'like', current_user['id'])
+            if retry_after:
+                return rate_limited_response(retry_after)
+            
             body_data = json.loads(event.get('body', '{}'))
             post_id = body_data.get('post_id')
             
@@ -163,11 +726,63 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'ID поста не указан'})
                 }
             
+            if LIKE_WRITE_MODE == 'queue':
+                # Текущее состояние с учетом еще не примененных намерений
+                cursor.execute("""
+                    SELECT p.likes_count,
+                           EXISTS (
+                               SELECT 1 FROM post_likes pl WHERE pl.post_id = p.id AND pl.user_id = %(user_id)s""" + likes_partition_join('p') + """
+                           ) AS applied,
+                           (SELECT li.liked FROM like_intents li
+                            WHERE li.user_id = %(user_id)s AND li.post_id = p.id
+                            ORDER BY li.id DESC LIMIT 1) AS pending
+                    FROM posts p
+                    WHERE p.id = %(post_id)s
+                """, {'user_id': current_user['id'], 'post_id': post_id})
+                
+                state = cursor.fetchone()
+                if not state:
+                    return {
+                        'statusCode': 404,
+                        'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                        'body': json.dumps({'error': 'Пост не найден'})
+                    }
+                
+                is_liked = not (state['applied'] if state['pending'] is None else state['pending'])
+                
+                cursor.execute("""
+                    INSERT INTO like_intents (user_id, post_id, liked)
+                    VALUES (%s, %s, %s)
+                """, (current_user['id'], post_id, is_liked))
+                conn.commit()
+                
+                # Счетчик с учетом собственного еще не примененного лайка
+                likes_count = state['likes_count'] + int(is_liked) - int(state['applied'])
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json', **write_lsn_headers(cursor)},
+                    'body': json.dumps({
+                        'is_liked': is_liked,
+                        'likes_count': likes_count
+                    })
+                }
+            
+            post_created_at = get_post_created_at(cursor, post_id)
+            if not post_created_at:
+                return {
+                    'statusCode': 404,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': json.dumps({'error': 'Пост не найден'})
+                }
+            post_filter, post_params = partition_filter('created_at', post_created_at)
+            like_filter, like_params = partition_filter('post_created_at', post_created_at)
+            
             # Проверка существования лайка
             cursor.execute("""
                 SELECT id FROM post_likes 
                 WHERE post_id = %s AND user_id = %s
-            """, (post_id, current_user['id']))
+            """ + like_filter, (post_id, current_user['id']) + like_params)
             
             existing_like = cursor.fetchone()
             
@@ -176,39 +791,35 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 cursor.execute("""
                     DELETE FROM post_likes 
                     WHERE post_id = %s AND user_id = %s
-                """, (post_id, current_user['id']))
-                
-                cursor.execute("""
-                    UPDATE posts SET likes_count = likes_count - 1 
-                    WHERE id = %s
-                """, (post_id,))
+                """ + like_filter, (post_id, current_user['id']) + like_params)
                 
+                likes_delta = -1
                 is_liked = False
             else:
                 # Добавление лайка
                 cursor.execute("""
-                    INSERT INTO post_likes (post_id, user_id) 
-                    VALUES (%s, %s)
-                """, (post_id, current_user['id']))
-                
-                cursor.execute("""
-                    UPDATE posts SET likes_count = likes_count + 1 
-                    WHERE id = %s
-                """, (post_id,))
+                    INSERT INTO post_likes (post_id, user_id, post_created_at) 
+                    VALUES (%s, %s, %s)
+                """, (post_id, current_user['id'], post_created_at))
                 
+                likes_delta = 1
                 is_liked = True
             
-            # Получение нового количества лайков
+            # Обновление счетчика и получение нового количества лайков
             cursor.execute("""
-                SELECT likes_count FROM posts WHERE id = %s
-            """, (post_id,))
+                UPDATE posts SET likes_count = likes_count + %s 
+                WHERE id = %s
+            """ + post_filter + """
+                RETURNING likes_count
+            """, (likes_delta, post_id) + post_params)
             
             result = cursor.fetchone()
+            notify_like_count(cursor, int(post_id), result['likes_count'])
             conn.commit()
             
             return {
                 'statusCode': 200,
-                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json', **write_lsn_headers(cursor)},
                 'body': json.dumps({
                     'is_liked': is_liked,
                     'likes_count': result['likes_count']
@@ -224,6 +835,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Требуется авторизация'})
                 }
             
+            retry_after = check_rate_limit(cursor, 'comment', current_user['id'])
+            if retry_after:
+                return rate_limited_response(retry_after)
+            
             body_data = json.loads(event.get('body', '{}'))
             post_id = body_data.get('post_id')
             content = body_data.get('content', '').strip()
@@ -236,12 +851,21 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'ID поста и содержание комментария обязательны'})
                 }
             
+            post_created_at = get_post_created_at(cursor, post_id)
+            if not post_created_at:
+                return {
+                    'statusCode': 404,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': json.dumps({'error': 'Пост не найден'})
+                }
+            post_filter, post_params = partition_filter('created_at', post_created_at)
+            
             # Создание комментария
             cursor.execute("""
-                INSERT INTO post_comments (post_id, user_id, content, parent_comment_id)
-                VALUES (%s, %s, %s, %s)
+                INSERT INTO post_comments (post_id, user_id, content, parent_comment_id, post_created_at)
+                VALUES (%s, %s, %s, %s, %s)
                 RETURNING id, content, likes_count, created_at
-            """, (post_id, current_user['id'], content, parent_comment_id))
+            """, (post_id, current_user['id'], content, parent_comment_id, post_created_at))
             
             comment = cursor.fetchone()
             
@@ -249,15 +873,19 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             cursor.execute("""
                 UPDATE posts SET comments_count = comments_count + 1 
                 WHERE id = %s
-            """, (post_id,))
+            """ + post_filter + """
+                RETURNING comments_count
+            """, (post_id,) + post_params)
             
+            notify_event(cursor, 'comment', post_id=post_id, comment_id=comment['id'],
+                         comments_count=cursor.fetchone()['comments_count'])
             conn.commit()
             
             return {
                 'statusCode': 201,
-                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json', **write_lsn_headers(cursor)},
                 'body': json.dumps({
-                    'comment': dict(comment),
+                    'comment': serialize_row(comment),
                     'user': dict(current_user),
                     'message': 'Комментарий добавлен'
                 })
@@ -274,22 +902,232 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'ID поста не указан'})
                 }
             
-            cursor.execute("""
-                SELECT c.id, c.content, c.likes_count, c.created_at, c.parent_comment_id,
-                       u.id as user_id, u.username, u.full_name, u.avatar_url
+            query = """
+                SELECT c.id, c.user_id, c.content, c.likes_count,
+                       to_char(c.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') as created_at, c.parent_comment_id
                 FROM post_comments c
-                JOIN users u ON c.user_id = u.id
                 WHERE c.post_id = %s
-                ORDER BY c.created_at ASC
-            """, (post_id,))
+            """ + ("AND c.post_created_at = (SELECT created_at FROM posts WHERE id = %s)" if POSTS_PARTITIONED else "") + """
+                ORDER BY c.created_at ASC, c.id ASC
+            """
+            params = (post_id, post_id) if POSTS_PARTITIONED else (post_id,)
             
+            if JSON_RENDER_MODE == 'db':
+                comments_json, users_json = render_json_page(
+                    cursor, query, params, 'page.created_at ASC, page.id ASC', 'user_id'
+                )
+                return {
+                    'statusCode': 200,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': f'{{"comments": {comments_json}, "users": {users_json}}}'
+                }
+            
+            cursor.execute(query, params)
             comments = cursor.fetchall()
+            users = hydrate_users(cursor, [comment['user_id'] for comment in comments])
+            
+            return {
+                'statusCode': 200,
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'body': json.dumps({
+                    'comments': [serialize_row(comment) for comment in comments],
+                    'users': users
+                })
+            }
+        
+        elif method == 'GET' and action == 'tag':
+            # Лента постов по хэштегу: keyset-пагинация по первичному ключу post_tags
+            tag = query_params.get('tag', '').strip().lstrip('#').lower()
+            limit = min(int(query_params.get('limit', 20)), 50)
+            before = query_params.get('before')
+            before_id = query_params.get('before_id')
+            
+            if not re.fullmatch(r'\w{1,64}', tag):
+                return {
+                    'statusCode': 400,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': json.dumps({'error': 'Некорректный хэштег'})
+                }
+            
+            viewer_id = current_user['id'] if current_user else None
+            cursor.execute("""
+                SELECT p.id, p.user_id, p.content, p.image_url,
+                       p.likes_count + COALESCE(li.liked::int - (pl.user_id IS NOT NULL)::int, 0) as likes_count,
+                       p.comments_count, p.shares_count,
+                       to_char(p.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') as created_at,
+                       COALESCE(li.liked, pl.user_id IS NOT NULL) as is_liked
+                FROM post_tags t
+                JOIN posts p ON p.id = t.post_id AND p.created_at = t.post_created_at
+                LEFT JOIN post_likes pl ON p.id = pl.post_id AND pl.user_id = %s""" + likes_partition_join('p') + """
+                LEFT JOIN LATERAL (
+                    SELECT li.liked FROM like_intents li
+                    WHERE li.user_id = %s AND li.post_id = p.id
+                    ORDER BY li.id DESC LIMIT 1
+                ) li ON true
+                WHERE t.tag = %s
+            """ + ("AND (t.post_created_at, t.post_id) < (%s, %s)" if before and before_id else "") + """
+                ORDER BY t.post_created_at DESC, t.post_id DESC
+                LIMIT %s
+            """, (viewer_id, viewer_id, tag) + ((before, int(before_id)) if before and before_id else ()) + (limit,))
+            
+            posts = cursor.fetchall()
+            users = hydrate_users(cursor, [post['user_id'] for post in posts])
+            next_cursor = None
+            if len(posts) == limit:
+                next_cursor = {'before': posts[-1]['created_at'], 'before_id': posts[-1]['id']}
+            
+            return {
+                'statusCode': 200,
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'body': json.dumps({
+                    'tag': tag,
+                    'posts': [serialize_row(post) for post in posts],
+                    'users': users,
+                    'next_cursor': next_cursor
+                })
+            }
+        
+        elif method == 'GET' and action == 'trending':
+            # Популярные хэштеги по почасовым счетчикам (scripts/rollup_trending_tags.py)
+            hours = min(max(int(query_params.get('hours', 24)), 1), 168)
+            limit = min(int(query_params.get('limit', 20)), 50)
+            
+            cursor.execute("""
+                SELECT tag, SUM(posts_count)::INTEGER AS posts_count
+                FROM tag_counts_hourly
+                WHERE hour >= date_trunc('hour', NOW()) - %s * INTERVAL '1 hour'
+                GROUP BY tag
+                ORDER BY posts_count DESC, tag
+                LIMIT %s
+            """, (hours, limit))
+            
+            return {
+                'statusCode': 200,
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'body': json.dumps({
+                    'tags': [dict(row) for row in cursor.fetchall()],
+                    'hours': hours
+                })
+            }
+        
+        elif method == 'GET' and action == 'search_posts':
+            # Полнотекстовый поиск: совпадения по GIN-индексу idx_posts_search_vector,
+            # окно из SEARCH_CANDIDATES самых свежих (idx_posts_created_at) ранжируется
+            # по релевантности и свежести, keyset-курсор по (оценка, id) внутри окна,
+            # затем по (created_at, id) к следующему окну
+            search_query = query_params.get('q', '').strip()
+            limit = min(int(query_params.get('limit', 20)), 50)
+            before_score = query_params.get('before_score')
+            before_id = query_params.get('before_id')
+            window_before = query_params.get('window_before')
+            window_before_id = query_params.get('window_before_id')
+            
+            if not search_query:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': json.dumps({'error': 'Поисковый запрос не указан'})
+                }
+            
+            keyset = bool(before_score and before_id)
+            window = bool(window_before and window_before_id)
+            cursor.execute("""
+                WITH q AS (
+                    SELECT websearch_to_tsquery('russian', %(q)s) || websearch_to_tsquery('english', %(q)s) AS tsq
+                ),
+                candidates AS (
+                    SELECT p.id, p.user_id, p.content, p.image_url, p.likes_count, p.comments_count,
+                           p.shares_count, p.created_at, p.search_vector
+                    FROM posts p, q
+                    WHERE p.search_vector @@ q.tsq
+            """ + ("AND (p.created_at, p.id) < (%(window_before)s::timestamp, %(window_before_id)s)" if window else "") + """
+                    ORDER BY p.created_at DESC, p.id DESC
+                    LIMIT %(candidates)s
+                ),
+                oldest AS (
+                    SELECT to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') AS created_at, id,
+                           (SELECT COUNT(*) FROM candidates) AS window_size
+                    FROM candidates
+                    ORDER BY candidates.created_at, id
+                    LIMIT 1
+                ),
+                hits AS (
+                    SELECT c.id, c.user_id, c.content, c.image_url, c.likes_count, c.comments_count,
+                           c.shares_count, c.created_at,
+                           LOG(GREATEST(ts_rank_cd(c.search_vector, q.tsq, 32), 1e-6))
+                           + EXTRACT(EPOCH FROM c.created_at)::float8 / %(recency)s AS score
+                    FROM candidates c, q
+                ),
+                page AS (
+                    SELECT * FROM hits
+            """ + ("WHERE (score, id) < (%(before_score)s::float8, %(before_id)s)" if keyset else "") + """
+                    ORDER BY score DESC, id DESC
+                    LIMIT %(limit)s + 1
+                )
+                SELECT h.id, h.user_id, h.content, h.image_url,
+                       h.likes_count + COALESCE(li.liked::int - own.applied::int, 0) as likes_count,
+                       h.comments_count, h.shares_count,
+                       to_char(h.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') as created_at,
+                       h.score,
+                       ts_headline('russian', h.content, q.tsq, %(headline_options)s) AS headline,
+                       COALESCE(li.liked, own.applied) as is_liked,
+                       o.window_size, o.created_at AS window_oldest_at, o.id AS window_oldest_id
+                FROM page h
+                CROSS JOIN q
+                CROSS JOIN oldest o
+                CROSS JOIN LATERAL (
+                    SELECT EXISTS (
+                        SELECT 1 FROM post_likes pl
+                        WHERE pl.post_id = h.id AND pl.user_id = %(viewer_id)s""" + likes_partition_join('h') + """
+                    ) AS applied
+                ) own
+                LEFT JOIN LATERAL (
+                    SELECT li.liked FROM like_intents li
+                    WHERE li.user_id = %(viewer_id)s AND li.post_id = h.id
+                    ORDER BY li.id DESC LIMIT 1
+                ) li ON true
+                ORDER BY h.score DESC, h.id DESC
+            """, {
+                'q': search_query,
+                'recency': SEARCH_RECENCY_SECONDS,
+                'candidates': SEARCH_CANDIDATES,
+                'before_score': float(before_score) if keyset else None,
+                'before_id': int(before_id) if keyset else None,
+                'window_before': window_before if window else None,
+                'window_before_id': int(window_before_id) if window else None,
+                'limit': limit,
+                'headline_options': SEARCH_HEADLINE_OPTIONS,
+                'viewer_id': current_user['id'] if current_user else None
+            })
+            
+            rows = cursor.fetchall()
+            posts = []
+            for row in rows[:limit]:
+                post = serialize_row(row)
+                for key in ('score', 'window_size', 'window_oldest_at', 'window_oldest_id'):
+                    post.pop(key)
+                post['headline'], post['matched_terms'] = split_headline(post['headline'])
+                posts.append(post)
+            
+            next_cursor = None
+            if len(rows) > limit:
+                # В текущем окне есть еще совпадения
+                next_cursor = {'before_score': rows[limit - 1]['score'], 'before_id': rows[limit - 1]['id']}
+                if window:
+                    next_cursor.update({'window_before': window_before, 'window_before_id': int(window_before_id)})
+            elif rows and rows[0]['window_size'] == SEARCH_CANDIDATES:
+                # Окно пролистано целиком, но за ним могут быть более старые совпадения
+                next_cursor = {'window_before': rows[0]['window_oldest_at'], 'window_before_id': rows[0]['window_oldest_id']}
+            
+            users = hydrate_users(cursor, [post['user_id'] for post in posts])
             
             return {
                 'statusCode': 200,
                 'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
                 'body': json.dumps({
-                    'comments': [dict(comment) for comment in comments]
+                    'posts': posts,
+                    'users': users,
+                    'next_cursor': next_cursor
                 })
             }
         
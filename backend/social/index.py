@@ -5,28 +5,300 @@ API для социальных функций - подписки, друзья,
 
 import json
 import os
-from typing import Dict, Any, Optional
+import random
+import re
+import hashlib
+import hmac
+import base64
+import threading
+import time
+from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
-def get_db_connection():
-    """Получение подключения к базе данных"""
+# Подписанные токены (SESSION_TOKEN_MODE=signed): v1.<user_id>.<expires>.<generation>.<hmac>
+SESSION_SIGNING_KEY = os.environ.get('SESSION_SIGNING_KEY', '')
+SIGNED_USER_CACHE_TTL = float(os.environ.get('SIGNED_USER_CACHE_TTL', '30'))
+SIGNED_USER_CACHE_SIZE = 10000
+
+# user_id -> (момент истечения, пользователь с session_generation)
+_signed_user_cache: Dict[int, Tuple[float, Dict]] = {}
+_signed_user_cache_lock = threading.Lock()
+
+# LRU-кэш компактных данных пользователей: id -> (момент истечения, кортеж полей).
+# Профили меняются вне этой функции, поэтому записи живут не дольше USER_CACHE_TTL
+USER_CACHE_FIELDS = ('id', 'username', 'full_name', 'avatar_url', 'is_verified')
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '5000'))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '60'))
+_user_cache: 'OrderedDict[int, Tuple[float, Tuple]]' = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+# Таблицы постов секционированы по месяцам (scripts/partitions.py swap): запросы передают время поста
+POSTS_PARTITIONED = os.environ.get('POSTS_PARTITIONED', '') == '1'
+
+# Наибольшее число рекомендаций в ответе; scripts/build_suggestions.py сохраняет столько же (--limit)
+SUGGESTIONS_MAX_LIMIT = 50
+
+# Режим рендеринга списков: python — строки в dict и json.dumps, db — готовый JSON из Postgres
+JSON_RENDER_MODE = os.environ.get('JSON_RENDER_MODE', 'python')
+
+# Канал LISTEN/NOTIFY для scripts/realtime_server.py
+REALTIME_CHANNEL = 'social_events'
+
+# Склейка одновременных одинаковых чтений (для долгоживущего процесса с потоками):
+# один запрос к базе на всех, поля конкретного зрителя накладываются отдельно
+SINGLE_FLIGHT = os.environ.get('SINGLE_FLIGHT', '') == '1'
+SINGLE_FLIGHT_WAIT = 5.0
+
+# Реплики для чтения (через запятую) и окно, в течение которого действует подсказка read-your-writes
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+READ_YOUR_WRITES_WINDOW = 30
+# Текстовая форма pg_lsn: два шестнадцатеричных числа через "/"
+LSN_PATTERN = re.compile(r'[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}')
+
+# Маршруты только для чтения, которые можно обслуживать с реплики
+READ_ROUTES = {
+    ('GET', 'followers'), ('GET', 'following'), ('GET', 'search'),
+    ('GET', 'profile'), ('GET', 'profiles'), ('GET', 'suggestions'),
+}
+
+def get_db_connection(readonly: bool = False, min_lsn: Optional[str] = None):
+    """Получение подключения к базе данных: чтения уходят на реплику, догнавшую min_lsn"""
     DATABASE_URL = os.environ.get('DATABASE_URL')
     if not DATABASE_URL:
         raise Exception('DATABASE_URL environment variable not set')
     
+    if readonly and DATABASE_REPLICA_URLS:
+        conn = None
+        try:
+            conn = psycopg2.connect(random.choice(DATABASE_REPLICA_URLS), cursor_factory=RealDictCursor)
+            if not min_lsn:
+                return conn
+            
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, false) AS caught_up", (min_lsn,))
+            caught_up = cursor.fetchone()['caught_up']
+            cursor.close()
+            if caught_up:
+                return conn
+            conn.close()
+        except psycopg2.Error:
+            # Недоступная или отстающая реплика — читаем с основного сервера
+            if conn is not None:
+                conn.close()
+    
     return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
 
+def parse_lsn_hint(headers: Dict) -> Optional[str]:
+    """LSN из подсказки X-Min-Lsn вида <lsn>@<unix-время записи>, если она еще не устарела"""
+    hint = headers.get('X-Min-Lsn') or headers.get('x-min-lsn')
+    if not hint:
+        return None
+    
+    lsn, _, written_at = hint.partition('@')
+    if not LSN_PATTERN.fullmatch(lsn):
+        return None
+    try:
+        if time.time() - float(written_at) > READ_YOUR_WRITES_WINDOW:
+            return None
+    except ValueError:
+        return None
+    return lsn
+
+def write_lsn_headers(cursor) -> Dict[str, str]:
+    """Заголовок с LSN только что закоммиченной записи для последующих чтений"""
+    if not DATABASE_REPLICA_URLS:
+        return {}
+    
+    cursor.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+    lsn = cursor.fetchone()['lsn']
+    return {'X-Write-Lsn': f'{lsn}@{int(time.time())}', 'Access-Control-Expose-Headers': 'X-Write-Lsn'}
+
+def parse_signed_token(session_token: str) -> Optional[Tuple[int, int]]:
+    """Проверка подписи и срока действия токена, возвращает (user_id, generation)"""
+    parts = session_token.split('.')
+    if not SESSION_SIGNING_KEY or len(parts) != 5 or parts[0] != 'v1':
+        return None
+
+    payload = '.'.join(parts[:4])
+    digest = hmac.new(SESSION_SIGNING_KEY.encode(), payload.encode(), hashlib.sha256).digest()
+    signature = base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+    if not hmac.compare_digest(signature, parts[4]):
+        return None
+
+    try:
+        user_id, expires, generation = int(parts[1]), int(parts[2]), int(parts[3])
+    except ValueError:
+        return None
+
+    if expires <= time.time():
+        return None
+    return user_id, generation
+
+def get_user_from_signed_token(cursor, session_token: str) -> Optional[Dict]:
+    """Пользователь по подписанному токену: проверка поколения идет по кэшу процесса"""
+    claims = parse_signed_token(session_token)
+    if not claims:
+        return None
+    user_id, generation = claims
+
+    now = time.monotonic()
+    cached = _signed_user_cache.get(user_id)
+    if not cached or cached[0] <= now:
+        cursor.execute("""
+            SELECT id, username, full_name, avatar_url, session_generation
+            FROM users
+            WHERE id = %s
+        """, (user_id,))
+        user = cursor.fetchone()
+        if not user:
+            return None
+        cached = (now + SIGNED_USER_CACHE_TTL, dict(user))
+        with _signed_user_cache_lock:
+            if len(_signed_user_cache) >= SIGNED_USER_CACHE_SIZE:
+                _signed_user_cache.clear()
+            _signed_user_cache[user_id] = cached
+
+    user = cached[1]
+    if user['session_generation'] != generation:
+        return None
+    return {key: value for key, value in user.items() if key != 'session_generation'}
+
 def get_user_from_token(cursor, session_token: str) -> Optional[Dict]:
     """Получение пользователя по токену сессии"""
+    if session_token.startswith('v1.'):
+        return get_user_from_signed_token(cursor, session_token)
+
     cursor.execute("""
         SELECT u.id, u.username, u.full_name, u.avatar_url
         FROM users u
         JOIN user_sessions s ON u.id = s.user_id
-        WHERE s.session_token = %s AND s.expires_at > NOW()
-    """, (session_token,))
+        WHERE s.token_hash = %s AND s.expires_at > NOW()
+    """, (hashlib.sha256(session_token.encode()).digest(),))
     return cursor.fetchone()
 
+def serialize_row(row: Dict) -> Dict:
+    """Сериализация строки результата для JSON (формат времени совпадает с to_char в SQL)"""
+    result = {}
+    for key, value in row.items():
+        if isinstance(value, datetime):
+            result[key] = value.isoformat(timespec='microseconds')
+        else:
+            result[key] = value
+    return result
+
+def hydrate_users(cursor, user_ids) -> Dict[str, Dict]:
+    """Компактные данные авторов по набору id: из LRU-кэша, промахи одним запросом"""
+    now = time.monotonic()
+    users: Dict[str, Dict] = {}
+    misses = []
+
+    # Порядок OrderedDict меняется при каждом попадании, поэтому и чтение идет под блокировкой
+    with _user_cache_lock:
+        for user_id in set(user_ids):
+            cached = _user_cache.get(user_id)
+            if cached and cached[0] > now:
+                _user_cache.move_to_end(user_id)
+                users[str(user_id)] = dict(zip(USER_CACHE_FIELDS, cached[1]))
+            else:
+                misses.append(user_id)
+
+    if misses:
+        cursor.execute("""
+            SELECT id, username, full_name, avatar_url, is_verified
+            FROM users
+            WHERE id = ANY(%s)
+        """, (misses,))
+        records = [tuple(user[field] for field in USER_CACHE_FIELDS) for user in cursor.fetchall()]
+
+        with _user_cache_lock:
+            for record in records:
+                _user_cache[record[0]] = (now + USER_CACHE_TTL, record)
+                _user_cache.move_to_end(record[0])
+            while len(_user_cache) > USER_CACHE_SIZE:
+                _user_cache.popitem(last=False)
+
+        for record in records:
+            users[str(record[0])] = dict(zip(USER_CACHE_FIELDS, record))
+
+    return users
+
+def render_json_page(cursor, query: str, params, order_by: str,
+                     user_column: Optional[str] = None) -> Tuple[str, str]:
+    """Рендеринг страницы списка в JSON на стороне Postgres: массив строк и карта пользователей.
+    json_agg не обязан сохранять порядок подзапроса, поэтому order_by повторяет его по колонкам page;
+    значения для %s в order_by передаются в конце params"""
+    users_sql = "'{}'::json"
+    if user_column:
+        users_sql = f"""(
+            SELECT COALESCE(json_object_agg(u.id, json_build_object(
+                'id', u.id, 'username', u.username, 'full_name', u.full_name,
+                'avatar_url', u.avatar_url, 'is_verified', u.is_verified
+            )), '{{}}'::json)
+            FROM users u
+            WHERE u.id IN (SELECT {user_column} FROM page)
+        )"""
+
+    cursor.execute(f"""
+        WITH page AS ({query})
+        SELECT (SELECT COALESCE(json_agg(row_to_json(page) ORDER BY {order_by}), '[]'::json) FROM page)::text AS rows,
+               {users_sql}::text AS users
+    """, params)
+    rendered = cursor.fetchone()
+    return rendered['rows'], rendered['users']
+
+def likes_partition_join(post_alias: str) -> str:
+    """Условие на время поста для post_likes pl, чтобы проверка лайка читала одну месячную секцию.
+    До переключения у старых строк post_likes время поста не заполнено, поэтому условие пустое"""
+    if not POSTS_PARTITIONED:
+        return ''
+    return f' AND pl.post_created_at = {post_alias}.created_at'
+
+def notify_event(cursor, event_type: str, **payload) -> None:
+    """Событие для realtime-слушателя: доставляется подписчикам LISTEN после коммита"""
+    cursor.execute("SELECT pg_notify(%s, %s)", (REALTIME_CHANNEL, json.dumps({'type': event_type, **payload})))
+
+class Flight:
+    """Выполняющееся чтение, результат которого ждут остальные запросы с тем же ключом"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[Exception] = None
+
+_flights: Dict[str, Flight] = {}
+_flights_lock = threading.Lock()
+
+def single_flight(key: str, load):
+    """Результат load() для ключа: первый запрос выполняет его, одновременные с ним ждут и получают тот же результат"""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Flight()
+
+    if not leader:
+        # Зависший лидер не должен держать остальных: по таймауту читаем сами
+        if not flight.done.wait(SINGLE_FLIGHT_WAIT):
+            return load()
+        if flight.error:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = load()
+        return flight.result
+    except Exception as error:
+        flight.error = error
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Обработка социальных запросов
@@ -36,6 +308,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     GET /?action=following&user_id=X - получение подписок
     GET /?action=search&q=query - поиск пользователей
     GET /?action=profile&user_id=X - получение профиля пользователя
+    GET /?action=profiles&user_ids=1,2,3 - получение до 100 профилей за запрос
+    GET /?action=suggestions - рекомендации "Возможно, вы знакомы"
     '''
     
     method: str = event.get('httpMethod', 'GET')
@@ -49,14 +323,16 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Auth-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Auth-Token, X-Min-Lsn',
                 'Access-Control-Max-Age': '86400'
             },
             'body': ''
         }
     
     try:
-        conn = get_db_connection()
+        readonly = (method, action) in READ_ROUTES
+        min_lsn = parse_lsn_hint(event.get('headers') or {}) if readonly else None
+        conn = get_db_connection(readonly, min_lsn)
         cursor = conn.cursor()
         
         # Получение токена авторизации
@@ -123,11 +399,12 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 WHERE id = %s
             """, (following_id,))
             
+            notify_event(cursor, 'follow', follower_id=current_user['id'], following_id=following_id, is_following=True)
             conn.commit()
             
             return {
                 'statusCode': 200,
-                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json', **write_lsn_headers(cursor)},
                 'body': json.dumps({'message': 'Подписка оформлена', 'is_following': True})
             }
         
@@ -168,11 +445,12 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     WHERE id = %s
                 """, (following_id,))
                 
+                notify_event(cursor, 'follow', follower_id=current_user['id'], following_id=following_id, is_following=False)
                 conn.commit()
                 
                 return {
                     'statusCode': 200,
-                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json', **write_lsn_headers(cursor)},
                     'body': json.dumps({'message': 'Отписка выполнена', 'is_following': False})
                 }
             else:
@@ -193,23 +471,39 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'ID пользователя не указан'})
                 }
             
-            cursor.execute("""
-                SELECT u.id, u.username, u.full_name, u.avatar_url, u.is_verified,
+            query = """
+                SELECT f1.follower_id as id,
                        CASE WHEN f2.follower_id IS NOT NULL THEN true ELSE false END as is_following
                 FROM user_follows f1
-                JOIN users u ON f1.follower_id = u.id
-                LEFT JOIN user_follows f2 ON u.id = f2.following_id AND f2.follower_id = %s
+                LEFT JOIN user_follows f2 ON f1.follower_id = f2.following_id AND f2.follower_id = %s
                 WHERE f1.following_id = %s
-                ORDER BY f1.created_at DESC
-            """, (current_user['id'] if current_user else None, user_id))
+                ORDER BY f1.created_at DESC, f1.follower_id DESC
+            """
+            params = (current_user['id'] if current_user else None, user_id)
+            
+            if JSON_RENDER_MODE == 'db':
+                followers_json, users_json = render_json_page(
+                    cursor, query, params + (user_id,),
+                    """(SELECT f.created_at FROM user_follows f
+                        WHERE f.follower_id = page.id AND f.following_id = %s) DESC, page.id DESC""",
+                    'id'
+                )
+                return {
+                    'statusCode': 200,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': f'{{"followers": {followers_json}, "users": {users_json}}}'
+                }
             
+            cursor.execute(query, params)
             followers = cursor.fetchall()
+            users = hydrate_users(cursor, [follower['id'] for follower in followers])
             
             return {
                 'statusCode': 200,
                 'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
                 'body': json.dumps({
-                    'followers': [dict(follower) for follower in followers]
+                    'followers': [dict(follower) for follower in followers],
+                    'users': users
                 })
             }
         
@@ -224,23 +518,39 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'ID пользователя не указан'})
                 }
             
-            cursor.execute("""
-                SELECT u.id, u.username, u.full_name, u.avatar_url, u.is_verified,
+            query = """
+                SELECT f1.following_id as id,
                        CASE WHEN f2.follower_id IS NOT NULL THEN true ELSE false END as is_following
                 FROM user_follows f1
-                JOIN users u ON f1.following_id = u.id
-                LEFT JOIN user_follows f2 ON u.id = f2.following_id AND f2.follower_id = %s
+                LEFT JOIN user_follows f2 ON f1.following_id = f2.following_id AND f2.follower_id = %s
                 WHERE f1.follower_id = %s
-                ORDER BY f1.created_at DESC
-            """, (current_user['id'] if current_user else None, user_id))
+                ORDER BY f1.created_at DESC, f1.following_id DESC
+            """
+            params = (current_user['id'] if current_user else None, user_id)
+            
+            if JSON_RENDER_MODE == 'db':
+                following_json, users_json = render_json_page(
+                    cursor, query, params + (user_id,),
+                    """(SELECT f.created_at FROM user_follows f
+                        WHERE f.following_id = page.id AND f.follower_id = %s) DESC, page.id DESC""",
+                    'id'
+                )
+                return {
+                    'statusCode': 200,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': f'{{"following": {following_json}, "users": {users_json}}}'
+                }
             
+            cursor.execute(query, params)
             following = cursor.fetchall()
+            users = hydrate_users(cursor, [follow['id'] for follow in following])
             
             return {
                 'statusCode': 200,
                 'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
                 'body': json.dumps({
-                    'following': [dict(follow) for follow in following]
+                    'following': [dict(follow) for follow in following],
+                    'users': users
                 })
             }
         
@@ -255,7 +565,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Поисковый запрос не указан'})
                 }
             
-            cursor.execute("""
+            search_query = """
                 SELECT u.id, u.username, u.full_name, u.avatar_url, u.is_verified,
                        u.followers_count, u.posts_count,
                        CASE WHEN f.follower_id IS NOT NULL THEN true ELSE false END as is_following
@@ -264,8 +574,20 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 WHERE u.username ILIKE %s OR u.full_name ILIKE %s
                 ORDER BY u.followers_count DESC, u.username ASC
                 LIMIT 20
-            """, (current_user['id'] if current_user else None, f'%{query}%', f'%{query}%'))
+            """
+            params = (current_user['id'] if current_user else None, f'%{query}%', f'%{query}%')
             
+            if JSON_RENDER_MODE == 'db':
+                users_json, _ = render_json_page(
+                    cursor, search_query, params, 'page.followers_count DESC, page.username ASC'
+                )
+                return {
+                    'statusCode': 200,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': f'{{"users": {users_json}}}'
+                }
+            
+            cursor.execute(search_query, params)
             users = cursor.fetchall()
             
             return {
@@ -276,6 +598,89 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 })
             }
         
+        elif method == 'GET' and action == 'suggestions':
+            # Рекомендации "Возможно, вы знакомы"
+            if not current_user:
+                return {
+                    'statusCode': 401,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': json.dumps({'error': 'Требуется авторизация'})
+                }
+            
+            limit = min(int(query_params.get('limit', 20)), SUGGESTIONS_MAX_LIMIT)
+            
+            # Готовый список из пакетного расчета
+            cursor.execute("""
+                SELECT suggested_ids, shared_counts FROM user_suggestions WHERE user_id = %s
+            """, (current_user['id'],))
+            stored = cursor.fetchone()
+            
+            if stored and stored['suggested_ids']:
+                candidates = list(zip(stored['suggested_ids'], stored['shared_counts']))
+            else:
+                # Новый пользователь: расчет по его подпискам на лету с тем же ограниченным обходом
+                cursor.execute("""
+                    SELECT c.following_id AS id, COUNT(*) AS shared_count
+                    FROM (
+                        SELECT f.following_id FROM user_follows f
+                        WHERE f.follower_id = %(user_id)s
+                        ORDER BY f.created_at DESC
+                        LIMIT 200
+                    ) via
+                    CROSS JOIN LATERAL (
+                        SELECT f2.following_id FROM user_follows f2
+                        WHERE f2.follower_id = via.following_id
+                        ORDER BY f2.created_at DESC
+                        LIMIT 100
+                    ) c
+                    WHERE c.following_id <> %(user_id)s
+                      AND NOT EXISTS (
+                          SELECT 1 FROM user_follows x
+                          WHERE x.follower_id = %(user_id)s AND x.following_id = c.following_id
+                      )
+                    GROUP BY c.following_id
+                    ORDER BY shared_count DESC, c.following_id
+                    LIMIT %(limit)s
+                """, {'user_id': current_user['id'], 'limit': limit})
+                candidates = [(row['id'], row['shared_count']) for row in cursor.fetchall()]
+                
+                if not candidates:
+                    # Нет подписок — популярные пользователи
+                    cursor.execute("""
+                        SELECT u.id FROM users u
+                        WHERE u.id <> %(user_id)s
+                          AND NOT EXISTS (
+                              SELECT 1 FROM user_follows x
+                              WHERE x.follower_id = %(user_id)s AND x.following_id = u.id
+                          )
+                        ORDER BY u.followers_count DESC, u.id
+                        LIMIT %(limit)s
+                    """, {'user_id': current_user['id'], 'limit': limit})
+                    candidates = [(row['id'], 0) for row in cursor.fetchall()]
+            
+            # Исключение тех, на кого пользователь подписался после пакетного расчета
+            cursor.execute("""
+                SELECT following_id FROM user_follows
+                WHERE follower_id = %s AND following_id = ANY(%s)
+            """, (current_user['id'], [candidate_id for candidate_id, _ in candidates]))
+            followed = {row['following_id'] for row in cursor.fetchall()}
+            
+            suggestions = [
+                {'id': candidate_id, 'shared_count': shared_count}
+                for candidate_id, shared_count in candidates
+                if candidate_id not in followed
+            ][:limit]
+            users = hydrate_users(cursor, [suggestion['id'] for suggestion in suggestions])
+            
+            return {
+                'statusCode': 200,
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'body': json.dumps({
+                    'suggestions': suggestions,
+                    'users': users
+                })
+            }
+        
         elif method == 'GET' and action == 'profile':
             # Получение профиля пользователя
             user_id = query_params.get('user_id')
@@ -287,45 +692,177 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'ID пользователя не указан'})
                 }
             
-            # Получение данных пользователя
-            cursor.execute("""
-                SELECT u.id, u.username, u.full_name, u.bio, u.avatar_url, u.is_verified,
-                       u.followers_count, u.following_count, u.posts_count, u.created_at,
-                       CASE WHEN f.follower_id IS NOT NULL THEN true ELSE false END as is_following
+            # Профиль и последние посты одним запросом, Postgres возвращает готовый JSON
+            profile_query = """
+                SELECT json_build_object(
+                    'user', json_build_object(
+                        'id', u.id, 'username', u.username, 'full_name', u.full_name, 'bio', u.bio,
+                        'avatar_url', u.avatar_url, 'is_verified', u.is_verified,
+                        'followers_count', u.followers_count, 'following_count', u.following_count,
+                        'posts_count', u.posts_count,
+                        'created_at', to_char(u.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+                        'is_following', EXISTS (
+                            SELECT 1 FROM user_follows f
+                            WHERE f.following_id = u.id AND f.follower_id = %(viewer_id)s
+                        )
+                    ),
+                    'posts', COALESCE(lp.posts, '[]'::json)
+                )::text AS profile
                 FROM users u
-                LEFT JOIN user_follows f ON u.id = f.following_id AND f.follower_id = %s
-                WHERE u.id = %s
-            """, (current_user['id'] if current_user else None, user_id))
+                LEFT JOIN LATERAL (
+                    SELECT json_agg(p ORDER BY p.created_at DESC, p.id DESC) AS posts
+                    FROM (
+                        SELECT p.id, p.content, p.image_url,
+                               p.likes_count + COALESCE(li.liked::int - own.applied::int, 0) AS likes_count,
+                               p.comments_count, p.shares_count,
+                               to_char(p.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US') as created_at,
+                               COALESCE(li.liked, own.applied) AS is_liked
+                        FROM posts p
+                        CROSS JOIN LATERAL (
+                            SELECT EXISTS (
+                                SELECT 1 FROM post_likes pl
+                                WHERE pl.post_id = p.id AND pl.user_id = %(viewer_id)s""" + likes_partition_join('p') + """
+                            ) AS applied
+                        ) own
+                        LEFT JOIN LATERAL (
+                            SELECT li.liked FROM like_intents li
+                            WHERE li.user_id = %(viewer_id)s AND li.post_id = p.id
+                            ORDER BY li.id DESC LIMIT 1
+                        ) li ON true
+                        WHERE p.user_id = u.id
+                        ORDER BY p.created_at DESC, p.id DESC
+                        LIMIT 12
+                    ) p
+                ) lp ON true
+                WHERE u.id = %(user_id)s
+            """
+            
+            if SINGLE_FLIGHT and not min_lsn:
+                # Профиль без полей зрителя — общий для одновременных запросов,
+                # is_following и is_liked накладываются отдельным легким запросом
+                def load_profile():
+                    cursor.execute(profile_query, {'viewer_id': None, 'user_id': user_id})
+                    row = cursor.fetchone()
+                    return (row['profile'], json.loads(row['profile'])) if row else None
+                
+                shared = single_flight(f'profile:{user_id.strip()}', load_profile)
+                if not shared:
+                    return {
+                        'statusCode': 404,
+                        'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                        'body': json.dumps({'error': 'Пользователь не найден'})
+                    }
+                
+                body, base = shared
+                if current_user:
+                    cursor.execute("""
+                        WITH state AS (
+                            SELECT p.id,
+                                   COALESCE(li.liked, own.applied) AS is_liked,
+                                   COALESCE(li.liked::int - own.applied::int, 0) AS likes_delta
+                            FROM unnest(%(post_ids)s::INTEGER[], %(created_at)s::TIMESTAMP[]) AS p(id, created_at)
+                            CROSS JOIN LATERAL (
+                                SELECT EXISTS (
+                                    SELECT 1 FROM post_likes pl
+                                    WHERE pl.post_id = p.id AND pl.user_id = %(viewer_id)s""" + likes_partition_join('p') + """
+                                ) AS applied
+                            ) own
+                            LEFT JOIN LATERAL (
+                                SELECT li.liked FROM like_intents li
+                                WHERE li.user_id = %(viewer_id)s AND li.post_id = p.id
+                                ORDER BY li.id DESC LIMIT 1
+                            ) li ON true
+                        )
+                        SELECT EXISTS (
+                                   SELECT 1 FROM user_follows f
+                                   WHERE f.following_id = %(user_id)s AND f.follower_id = %(viewer_id)s
+                               ) AS is_following,
+                               ARRAY(SELECT id FROM state WHERE is_liked) AS liked_ids,
+                               (SELECT COALESCE(json_object_agg(id, likes_delta), '{}'::json)
+                                FROM state WHERE likes_delta <> 0) AS likes_deltas
+                    """, {
+                        'viewer_id': current_user['id'],
+                        'user_id': base['user']['id'],
+                        'post_ids': [post['id'] for post in base['posts']],
+                        'created_at': [post['created_at'] for post in base['posts']]
+                    })
+                    viewer = cursor.fetchone()
+                    liked = set(viewer['liked_ids'])
+                    # Поправка к счетчику на еще не примененное намерение зрителя, как в общем запросе профиля
+                    deltas = viewer['likes_deltas']
+                    body = json.dumps({
+                        'user': {**base['user'], 'is_following': viewer['is_following']},
+                        'posts': [
+                            {**post, 'is_liked': post['id'] in liked,
+                             'likes_count': post['likes_count'] + deltas.get(str(post['id']), 0)}
+                            for post in base['posts']
+                        ]
+                    })
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': body
+                }
+            
+            cursor.execute(profile_query, {'viewer_id': current_user['id'] if current_user else None, 'user_id': user_id})
             
-            user = cursor.fetchone()
+            profile = cursor.fetchone()
             
-            if not user:
+            if not profile:
                 return {
                     'statusCode': 404,
                     'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
                     'body': json.dumps({'error': 'Пользователь не найден'})
                 }
             
-            # Получение последних постов пользователя
+            return {
+                'statusCode': 200,
+                'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                'body': profile['profile']
+            }
+        
+        elif method == 'GET' and action == 'profiles':
+            # Пакетное получение профилей (карточки, списки упоминаний)
+            try:
+                user_ids = [int(user_id) for user_id in query_params.get('user_ids', '').split(',') if user_id.strip()]
+            except ValueError:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': json.dumps({'error': 'Некорректный список ID пользователей'})
+                }
+            
+            if not user_ids:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': json.dumps({'error': 'ID пользователей не указаны'})
+                }
+            
+            if len(user_ids) > 100:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
+                    'body': json.dumps({'error': 'Не больше 100 пользователей за запрос'})
+                }
+            
             cursor.execute("""
-                SELECT p.id, p.content, p.image_url, p.likes_count, p.comments_count, 
-                       p.shares_count, p.created_at,
-                       CASE WHEN pl.user_id IS NOT NULL THEN true ELSE false END as is_liked
-                FROM posts p
-                LEFT JOIN post_likes pl ON p.id = pl.post_id AND pl.user_id = %s
-                WHERE p.user_id = %s
-                ORDER BY p.created_at DESC
-                LIMIT 12
-            """, (current_user['id'] if current_user else None, user_id))
-            
-            posts = cursor.fetchall()
+                SELECT u.id, u.username, u.full_name, u.bio, u.avatar_url, u.is_verified,
+                       u.followers_count, u.following_count, u.posts_count, u.created_at,
+                       CASE WHEN f.follower_id IS NOT NULL THEN true ELSE false END as is_following
+                FROM users u
+                LEFT JOIN user_follows f ON u.id = f.following_id AND f.follower_id = %s
+                WHERE u.id = ANY(%s)
+            """, (current_user['id'] if current_user else None, user_ids))
+            
+            found = {user['id']: serialize_row(user) for user in cursor.fetchall()}
             
             return {
                 'statusCode': 200,
                 'headers': {'Access-Control-Allow-Origin': '*', 'Content-Type': 'application/json'},
                 'body': json.dumps({
-                    'user': dict(user),
-                    'posts': [dict(post) for post in posts]
+                    'users': [found[user_id] for user_id in dict.fromkeys(user_ids) if user_id in found]
                 })
             }
         
@@ -4,13 +4,55 @@ API для загрузки изображений
 '''
 
 import json
+import math
 import os
+import hashlib
+import hmac
+import threading
+import time
 import base64
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+# Подписанные токены (SESSION_TOKEN_MODE=signed): v1.<user_id>.<expires>.<generation>.<hmac>
+SESSION_SIGNING_KEY = os.environ.get('SESSION_SIGNING_KEY', '')
+SIGNED_USER_CACHE_TTL = float(os.environ.get('SIGNED_USER_CACHE_TTL', '30'))
+SIGNED_USER_CACHE_SIZE = 10000
+
+# user_id -> (момент истечения, пользователь с session_generation)
+_signed_user_cache: Dict[int, Tuple[float, Dict]] = {}
+_signed_user_cache_lock = threading.Lock()
+
+# Лимиты запросов: маршрут -> (емкость корзины, секунд на ее полное пополнение).
+# Переопределяются переменной RATE_LIMITS вида "upload=30/3600"
+RATE_LIMIT_DEFAULTS: Dict[str, Tuple[float, float]] = {
+    'upload': (30, 3600),
+}
+RATE_LIMIT_MAX_KEYS = 50000
+
+# Режим лимитов: local — корзины только в памяти экземпляра,
+# shared — корзины сверяются с таблицей rate_limit_buckets не чаще раза в RATE_LIMIT_SYNC_INTERVAL секунд
+RATE_LIMIT_MODE = os.environ.get('RATE_LIMIT_MODE', 'local')
+RATE_LIMIT_SYNC_INTERVAL = float(os.environ.get('RATE_LIMIT_SYNC_INTERVAL', '1'))
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Лимиты по умолчанию с переопределениями из строки вида route=capacity/seconds"""
+    limits = dict(RATE_LIMIT_DEFAULTS)
+    for item in spec.split(','):
+        route, _, value = item.strip().partition('=')
+        capacity, _, seconds = value.partition('/')
+        if route and capacity and seconds:
+            limits[route] = (float(capacity), float(seconds))
+    return limits
+
+RATE_LIMITS = parse_rate_limits(os.environ.get('RATE_LIMITS', ''))
+
+# "маршрут:субъект" -> [токены, момент пополнения, потрачено с последней сверки, момент сверки]
+_rate_buckets: Dict[str, List[float]] = {}
+_rate_buckets_lock = threading.Lock()
+
 def get_db_connection():
     """Получение подключения к базе данных"""
     DATABASE_URL = os.environ.get('DATABASE_URL')
@@ -19,14 +61,67 @@ def get_db_connection():
     
     return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
 
+def parse_signed_token(session_token: str) -> Optional[Tuple[int, int]]:
+    """Проверка подписи и срока действия токена, возвращает (user_id, generation)"""
+    parts = session_token.split('.')
+    if not SESSION_SIGNING_KEY or len(parts) != 5 or parts[0] != 'v1':
+        return None
+
+    payload = '.'.join(parts[:4])
+    digest = hmac.new(SESSION_SIGNING_KEY.encode(), payload.encode(), hashlib.sha256).digest()
+    signature = base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+    if not hmac.compare_digest(signature, parts[4]):
+        return None
+
+    try:
+        user_id, expires, generation = int(parts[1]), int(parts[2]), int(parts[3])
+    except ValueError:
+        return None
+
+    if expires <= time.time():
+        return None
+    return user_id, generation
+
+def get_user_from_signed_token(cursor, session_token: str) -> Optional[Dict]:
+    """Пользователь по подписанному токену: проверка поколения идет по кэшу процесса"""
+    claims = parse_signed_token(session_token)
+    if not claims:
+        return None
+    user_id, generation = claims
+
+    now = time.monotonic()
+    cached = _signed_user_cache.get(user_id)
+    if not cached or cached[0] <= now:
+        cursor.execute("""
+            SELECT id, username, full_name, avatar_url, session_generation
+            FROM users
+            WHERE id = %s
+        """, (user_id,))
+        user = cursor.fetchone()
+        if not user:
+            return None
+        cached = (now + SIGNED_USER_CACHE_TTL, dict(user))
+        with _signed_user_cache_lock:
+            if len(_signed_user_cache) >= SIGNED_USER_CACHE_SIZE:
+                _signed_user_cache.clear()
+            _signed_user_cache[user_id] = cached
+
+    user = cached[1]
+    if user['session_generation'] != generation:
+        return None
+    return {key: value for key, value in user.items() if key != 'session_generation'}
+
 def get_user_from_token(cursor, session_token: str) -> Optional[Dict]:
     """Получение пользователя по токену сессии"""
+    if session_token.startswith('v1.'):
+        return get_user_from_signed_token(cursor, session_token)
+
     cursor.execute("""
         SELECT u.id, u.username, u.full_name, u.avatar_url
         FROM users u
         JOIN user_sessions s ON u.id = s.user_id
-        WHERE s.session_token = %s AND s.expires_at > NOW()
-    """, (session_token,))
+        WHERE s.token_hash = %s AND s.expires_at > NOW()
+    """, (hashlib.sha256(session_token.encode()).digest(),))
     return cursor.fetchone()
 
 def save_image_to_storage(image_data: str, filename: str) -> str:
@@ -36,6 +131,77 @@ def save_image_to_storage(image_data: str, filename: str) -> str:
     image_id = str(uuid.uuid4())
     return f"https://via.placeholder.com/600x400/4F46E5/FFFFFF?text=Image+{image_id[:8]}"
 
+def prune_rate_buckets(now: float) -> None:
+    """Удаление корзин, успевших пополниться до конца: они равносильны отсутствующим (под _rate_buckets_lock)"""
+    for key, bucket in list(_rate_buckets.items()):
+        capacity, period = RATE_LIMITS[key.partition(':')[0]]
+        if not bucket[2] and bucket[0] + (now - bucket[1]) * capacity / period >= capacity:
+            _rate_buckets.pop(key, None)
+    if len(_rate_buckets) >= RATE_LIMIT_MAX_KEYS:
+        _rate_buckets.clear()
+
+def check_rate_limit(cursor, route: str, subject: Any) -> float:
+    """Списание токена из корзины маршрута; 0 — запрос разрешен, иначе секунды до появления токена"""
+    capacity, period = RATE_LIMITS[route]
+    rate = capacity / period
+    key = f'{route}:{subject}'
+    now = time.monotonic()
+
+    with _rate_buckets_lock:
+        bucket = _rate_buckets.get(key)
+        if bucket is None:
+            if len(_rate_buckets) >= RATE_LIMIT_MAX_KEYS:
+                prune_rate_buckets(now)
+            bucket = _rate_buckets[key] = [capacity, now, 0.0, float('-inf')]
+        else:
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        spent = None
+        if RATE_LIMIT_MODE == 'shared' and now - bucket[3] >= RATE_LIMIT_SYNC_INTERVAL:
+            # Сверку забирает один поток; запрос к базе идет без блокировки
+            spent, bucket[2], bucket[3] = bucket[2], 0.0, now
+
+    if spent is not None:
+        tokens = sync_rate_bucket(cursor, key, spent, capacity, rate)
+        with _rate_buckets_lock:
+            # Токены, потраченные другими потоками во время сверки, еще не учтены в общей корзине
+            bucket[0] = tokens - bucket[2]
+
+    with _rate_buckets_lock:
+        if bucket[0] < 1:
+            return (1 - bucket[0]) / rate
+        bucket[0] -= 1
+        bucket[2] += 1
+        return 0.0
+
+def sync_rate_bucket(cursor, key: str, spent: float, capacity: float, rate: float) -> float:
+    """Сверка с общей корзиной: списание потраченного здесь и получение остатка с учетом других экземпляров"""
+    cursor.execute("""
+        INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+        VALUES (%(key)s, %(capacity)s - %(spent)s, NOW())
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = GREATEST(-%(capacity)s, LEAST(%(capacity)s,
+                         b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at)::float8 * %(rate)s) - %(spent)s),
+            updated_at = NOW()
+        RETURNING tokens
+    """, {'key': key, 'capacity': capacity, 'rate': rate, 'spent': spent})
+    tokens = cursor.fetchone()['tokens']
+    # Отдельная короткая транзакция: строка корзины не остается заблокированной до конца запроса
+    cursor.connection.commit()
+    return tokens
+
+def rate_limited_response(retry_after: float) -> Dict[str, Any]:
+    return {
+        'statusCode': 429,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',
+            'Content-Type': 'application/json',
+            'Retry-After': str(math.ceil(retry_after))
+        },
+        'body': json.dumps({'error': 'Слишком много запросов, попробуйте позже'})
+    }
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Обработка загрузки изображений
@@ -80,6 +246,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({'error': 'Недействительный токен'})
             }
         
+        retry_after = check_rate_limit(cursor, 'upload', current_user['id'])
+        if retry_after:
+            return rate_limited_response(retry_after)
+        
         if method == 'POST':
             body_data = json.loads(event.get('body', '{}'))
             
@@ -0,0 +1,47 @@
+-- Журнал изменений для инкрементальной сверки денормализованных счетчиков
+CREATE TABLE IF NOT EXISTS counter_changes (
+    id BIGSERIAL PRIMARY KEY,
+    entity VARCHAR(10) NOT NULL,
+    entity_id INTEGER NOT NULL,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Запись затронутых пользователей и постов при вставке/удалении связанных строк
+CREATE OR REPLACE FUNCTION log_counter_change() RETURNS trigger AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        r := OLD;
+    ELSE
+        r := NEW;
+    END IF;
+
+    IF TG_TABLE_NAME = 'user_follows' THEN
+        INSERT INTO counter_changes (entity, entity_id)
+        VALUES ('user', r.follower_id), ('user', r.following_id);
+    ELSIF TG_TABLE_NAME = 'posts' THEN
+        INSERT INTO counter_changes (entity, entity_id) VALUES ('user', r.user_id);
+    ELSE
+        INSERT INTO counter_changes (entity, entity_id) VALUES ('post', r.post_id);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_user_follows_counter_change
+    AFTER INSERT OR DELETE ON user_follows
+    FOR EACH ROW EXECUTE FUNCTION log_counter_change();
+
+CREATE TRIGGER trg_posts_counter_change
+    AFTER INSERT OR DELETE ON posts
+    FOR EACH ROW EXECUTE FUNCTION log_counter_change();
+
+CREATE TRIGGER trg_post_likes_counter_change
+    AFTER INSERT OR DELETE ON post_likes
+    FOR EACH ROW EXECUTE FUNCTION log_counter_change();
+
+CREATE TRIGGER trg_post_comments_counter_change
+    AFTER INSERT OR DELETE ON post_comments
+    FOR EACH ROW EXECUTE FUNCTION log_counter_change();
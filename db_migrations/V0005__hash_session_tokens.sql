@@ -0,0 +1,20 @@
+-- Хранение токенов сессий в виде SHA-256 дайджеста фиксированной длины
+ALTER TABLE user_sessions ADD COLUMN IF NOT EXISTS token_hash BYTEA;
+
+-- Истекшие сессии не переносим
+DELETE FROM user_sessions WHERE expires_at <= NOW();
+
+UPDATE user_sessions
+SET token_hash = sha256(convert_to(session_token, 'UTF8'))
+WHERE token_hash IS NULL;
+
+ALTER TABLE user_sessions ALTER COLUMN token_hash SET NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_user_sessions_token_hash ON user_sessions(token_hash);
+
+-- Для ограничения числа активных сессий пользователя
+CREATE INDEX IF NOT EXISTS idx_user_sessions_user_created ON user_sessions(user_id, created_at DESC);
+
+-- Открытые токены больше не хранятся
+DROP INDEX IF EXISTS idx_user_sessions_token;
+ALTER TABLE user_sessions DROP COLUMN IF EXISTS session_token;
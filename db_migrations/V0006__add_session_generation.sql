@@ -0,0 +1,2 @@
+-- Номер поколения сессий для подписанных токенов: увеличение отзывает все выданные токены пользователя
+ALTER TABLE users ADD COLUMN IF NOT EXISTS session_generation INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,21 @@
+-- Оценка популярности поста: логарифм вовлеченности плюс время публикации.
+-- Каждые 12.5 часов свежести стоят десятикратной вовлеченности, поэтому оценка
+-- не стареет сама по себе и пересчитывается только при изменении счетчиков
+CREATE OR REPLACE FUNCTION post_score(likes INTEGER, comments INTEGER, created TIMESTAMP)
+RETURNS DOUBLE PRECISION AS $$
+    SELECT LOG(GREATEST(COALESCE(likes, 0) + 2 * COALESCE(comments, 0), 1))
+           + EXTRACT(EPOCH FROM created) / 45000
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Оценки постов за последнее окно, обновляются scripts/refresh_post_scores.py
+CREATE TABLE IF NOT EXISTS post_scores (
+    post_id INTEGER PRIMARY KEY REFERENCES posts(id),
+    score DOUBLE PRECISION NOT NULL,
+    likes_count INTEGER NOT NULL,
+    comments_count INTEGER NOT NULL,
+    post_created_at TIMESTAMP NOT NULL,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_post_scores_score ON post_scores(score DESC, post_id DESC);
+CREATE INDEX IF NOT EXISTS idx_post_scores_created ON post_scores(post_created_at);
@@ -0,0 +1,10 @@
+-- Рекомендации "Возможно, вы знакомы": готовый ранжированный список на пользователя
+CREATE TABLE IF NOT EXISTS user_suggestions (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    suggested_ids INTEGER[] NOT NULL,
+    shared_counts INTEGER[] NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Ограниченный обход последних подписок пользователя
+CREATE INDEX IF NOT EXISTS idx_user_follows_follower_created ON user_follows(follower_id, created_at DESC);
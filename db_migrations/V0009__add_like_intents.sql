@@ -0,0 +1,12 @@
+-- Очередь намерений лайк/анлайк для режима отложенной записи (LIKE_WRITE_MODE=queue).
+-- Без внешних ключей: запись в очередь должна быть дешевой, целостность проверяет воркер при применении
+CREATE TABLE IF NOT EXISTS like_intents (
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    post_id INTEGER NOT NULL,
+    liked BOOLEAN NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Последнее намерение пользователя по посту для чтения "своего" лайка
+CREATE INDEX IF NOT EXISTS idx_like_intents_user_post ON like_intents(user_id, post_id, id DESC);
@@ -0,0 +1,110 @@
+-- Подготовка перехода posts, post_likes и post_comments на помесячное секционирование по времени поста.
+-- Лайки и комментарии секционируются по времени создания поста (post_created_at),
+-- чтобы пост и все связанные с ним строки лежали в одной месячной секции
+
+-- Время поста в связанных таблицах: новые строки заполняют обработчики, старые — scripts/partitions.py copy
+ALTER TABLE post_likes ADD COLUMN IF NOT EXISTS post_created_at TIMESTAMP;
+ALTER TABLE post_comments ADD COLUMN IF NOT EXISTS post_created_at TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS posts_partitioned (
+    id INTEGER NOT NULL DEFAULT nextval('posts_id_seq'),
+    user_id INTEGER REFERENCES users(id),
+    content TEXT NOT NULL,
+    image_url VARCHAR(500),
+    likes_count INTEGER DEFAULT 0,
+    comments_count INTEGER DEFAULT 0,
+    shares_count INTEGER DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_posts_partitioned_created_at ON posts_partitioned(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_posts_partitioned_user ON posts_partitioned(user_id, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS post_likes_partitioned (
+    id INTEGER NOT NULL DEFAULT nextval('post_likes_id_seq'),
+    post_id INTEGER NOT NULL,
+    user_id INTEGER REFERENCES users(id),
+    post_created_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, post_created_at),
+    UNIQUE (post_id, user_id, post_created_at)
+) PARTITION BY RANGE (post_created_at);
+
+CREATE INDEX IF NOT EXISTS idx_post_likes_partitioned_user ON post_likes_partitioned(user_id);
+
+CREATE TABLE IF NOT EXISTS post_comments_partitioned (
+    id INTEGER NOT NULL DEFAULT nextval('post_comments_id_seq'),
+    post_id INTEGER NOT NULL,
+    user_id INTEGER REFERENCES users(id),
+    parent_comment_id INTEGER,
+    content TEXT NOT NULL,
+    likes_count INTEGER DEFAULT 0,
+    post_created_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, post_created_at)
+) PARTITION BY RANGE (post_created_at);
+
+CREATE INDEX IF NOT EXISTS idx_post_comments_partitioned_post ON post_comments_partitioned(post_id, created_at);
+
+-- Строки вне созданных месячных секций
+CREATE TABLE IF NOT EXISTS posts_partitioned_default PARTITION OF posts_partitioned DEFAULT;
+CREATE TABLE IF NOT EXISTS post_likes_partitioned_default PARTITION OF post_likes_partitioned DEFAULT;
+CREATE TABLE IF NOT EXISTS post_comments_partitioned_default PARTITION OF post_comments_partitioned DEFAULT;
+
+-- Зеркалирование записей в секционированные таблицы на время онлайн-копирования
+CREATE OR REPLACE FUNCTION mirror_to_partitioned() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'posts' THEN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM posts_partitioned WHERE id = OLD.id AND created_at = OLD.created_at;
+        ELSE
+            INSERT INTO posts_partitioned (id, user_id, content, image_url, likes_count, comments_count,
+                                           shares_count, created_at, updated_at)
+            VALUES (NEW.id, NEW.user_id, NEW.content, NEW.image_url, NEW.likes_count, NEW.comments_count,
+                    NEW.shares_count, NEW.created_at, NEW.updated_at)
+            ON CONFLICT (id, created_at) DO UPDATE
+            SET content = EXCLUDED.content, image_url = EXCLUDED.image_url,
+                likes_count = EXCLUDED.likes_count, comments_count = EXCLUDED.comments_count,
+                shares_count = EXCLUDED.shares_count, updated_at = EXCLUDED.updated_at;
+        END IF;
+    ELSIF TG_TABLE_NAME = 'post_likes' THEN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM post_likes_partitioned WHERE post_id = OLD.post_id AND user_id = OLD.user_id;
+        ELSE
+            INSERT INTO post_likes_partitioned (id, post_id, user_id, post_created_at, created_at)
+            SELECT NEW.id, NEW.post_id, NEW.user_id, COALESCE(NEW.post_created_at, p.created_at), NEW.created_at
+            FROM posts p WHERE p.id = NEW.post_id
+            ON CONFLICT DO NOTHING;
+        END IF;
+    ELSE
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM post_comments_partitioned WHERE id = OLD.id AND post_id = OLD.post_id;
+        ELSE
+            INSERT INTO post_comments_partitioned (id, post_id, user_id, parent_comment_id, content, likes_count,
+                                                   post_created_at, created_at, updated_at)
+            SELECT NEW.id, NEW.post_id, NEW.user_id, NEW.parent_comment_id, NEW.content, NEW.likes_count,
+                   COALESCE(NEW.post_created_at, p.created_at), NEW.created_at, NEW.updated_at
+            FROM posts p WHERE p.id = NEW.post_id
+            ON CONFLICT (id, post_created_at) DO UPDATE
+            SET content = EXCLUDED.content, likes_count = EXCLUDED.likes_count, updated_at = EXCLUDED.updated_at;
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_posts_mirror
+    AFTER INSERT OR UPDATE OR DELETE ON posts
+    FOR EACH ROW EXECUTE FUNCTION mirror_to_partitioned();
+
+CREATE TRIGGER trg_post_likes_mirror
+    AFTER INSERT OR DELETE ON post_likes
+    FOR EACH ROW EXECUTE FUNCTION mirror_to_partitioned();
+
+CREATE TRIGGER trg_post_comments_mirror
+    AFTER INSERT OR UPDATE OR DELETE ON post_comments
+    FOR EACH ROW EXECUTE FUNCTION mirror_to_partitioned();
@@ -0,0 +1,10 @@
+-- Общие корзины лимитов запросов для нескольких экземпляров функций (RATE_LIMIT_MODE=shared).
+-- Ключ — "маршрут:субъект" (IP или id пользователя), tokens может уходить в минус до -емкости
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    key TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Давно не обновлявшиеся корзины уже полные и удаляются scripts/sweep_sessions.py
+CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_updated ON rate_limit_buckets(updated_at);
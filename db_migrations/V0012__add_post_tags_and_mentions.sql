@@ -0,0 +1,29 @@
+-- Хэштеги и упоминания постов, извлекаются при action=create и scripts/backfill_post_tags.py.
+-- Время поста хранится рядом, чтобы лента по тегу шла по одному индексу с keyset-пагинацией.
+-- Без внешних ключей на posts(id): после перехода на секционирование (scripts/partitions.py) они невозможны
+CREATE TABLE IF NOT EXISTS post_tags (
+    tag VARCHAR(64) NOT NULL,
+    post_id INTEGER NOT NULL,
+    post_created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (tag, post_created_at, post_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_post_tags_post ON post_tags(post_id);
+CREATE INDEX IF NOT EXISTS idx_post_tags_created ON post_tags(post_created_at);
+
+CREATE TABLE IF NOT EXISTS post_mentions (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    post_id INTEGER NOT NULL,
+    post_created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, post_created_at, post_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_post_mentions_post ON post_mentions(post_id);
+
+-- Почасовые счетчики постов по тегам для трендов, обновляются scripts/rollup_trending_tags.py
+CREATE TABLE IF NOT EXISTS tag_counts_hourly (
+    hour TIMESTAMP NOT NULL,
+    tag VARCHAR(64) NOT NULL,
+    posts_count INTEGER NOT NULL,
+    PRIMARY KEY (hour, tag)
+);
@@ -0,0 +1,13 @@
+-- Полнотекстовый поиск по постам (action=search_posts): русская и английская конфигурации вместе,
+-- чтобы находились и русские словоформы, и английские слова с английскими стоп-словами.
+-- Добавление STORED-колонки переписывает таблицу под эксклюзивной блокировкой — применять в окно обслуживания
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('russian', COALESCE(content, '')) || to_tsvector('english', COALESCE(content, ''))
+    ) STORED;
+
+-- Та же колонка в секционированной таблице, чтобы после scripts/partitions.py swap поиск работал без изменений
+ALTER TABLE posts_partitioned ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('russian', COALESCE(content, '')) || to_tsvector('english', COALESCE(content, ''))
+    ) STORED;
@@ -0,0 +1,4 @@
+-- GIN-индекс для action=search_posts строится без блокировки записи в posts.
+-- CREATE INDEX CONCURRENTLY не выполняется внутри транзакции, поэтому он вынесен в отдельную миграцию.
+-- На секционированной таблице CONCURRENTLY недоступен: индекс по секциям строит scripts/partitions.py search-index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_search_vector ON posts USING GIN (search_vector);
@@ -0,0 +1,7 @@
+-- Зеркалирование в секционированные таблицы включается только на время перехода командой
+-- scripts/partitions.py mirror (после создания месячных секций), а не для всех установок:
+-- иначе каждая запись платит лишним upsert, а строки копятся в секции по умолчанию.
+-- Если переход уже начат, после миграции повторите mirror, copy и verify
+DROP TRIGGER IF EXISTS trg_posts_mirror ON posts;
+DROP TRIGGER IF EXISTS trg_post_likes_mirror ON post_likes;
+DROP TRIGGER IF EXISTS trg_post_comments_mirror ON post_comments;
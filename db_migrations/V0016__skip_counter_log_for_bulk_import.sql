@@ -0,0 +1,28 @@
+-- Массовый импорт (scripts/bulk_io.py) пересчитывает счетчики целиком после загрузки,
+-- поэтому его сессия выставляет app.skip_counter_log = 'on' и не пишет строку журнала на каждую связь
+CREATE OR REPLACE FUNCTION log_counter_change() RETURNS trigger AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF current_setting('app.skip_counter_log', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        r := OLD;
+    ELSE
+        r := NEW;
+    END IF;
+
+    IF TG_TABLE_NAME = 'user_follows' THEN
+        INSERT INTO counter_changes (entity, entity_id)
+        VALUES ('user', r.follower_id), ('user', r.following_id);
+    ELSIF TG_TABLE_NAME = 'posts' THEN
+        INSERT INTO counter_changes (entity, entity_id) VALUES ('user', r.user_id);
+    ELSE
+        INSERT INTO counter_changes (entity, entity_id) VALUES ('post', r.post_id);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,139 @@
+'''
+Воркер отложенной записи лайков (LIKE_WRITE_MODE=queue)
+Забирает намерения из like_intents пакетами, схлопывает цепочки лайк→анлайк→лайк по паре
+(пользователь, пост) в одно итоговое изменение и применяет пакет одной транзакцией
+
+Запускается в одном экземпляре: порядок намерений одной пары важен.
+
+Примеры:
+    python scripts/apply_like_intents.py --once
+    python scripts/apply_like_intents.py --batch-size 5000 --interval 0.5
+'''
+
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+import psycopg2
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_INTERVAL = 1.0
+
+# Таблицы постов секционированы по месяцам (scripts/partitions.py swap): запросы передают время поста
+POSTS_PARTITIONED = os.environ.get('POSTS_PARTITIONED', '') == '1'
+
+def get_db_connection():
+    """Получение подключения к базе данных"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    return psycopg2.connect(DATABASE_URL)
+
+def coalesce_intents(intents: List[Tuple[int, int, bool]]) -> Dict[Tuple[int, int], bool]:
+    """Итоговое состояние по каждой паре (user_id, post_id): побеждает последнее намерение"""
+    final: Dict[Tuple[int, int], bool] = {}
+    for user_id, post_id, liked in intents:
+        final[(user_id, post_id)] = liked
+    return final
+
+def apply_batch(conn, batch_size: int) -> Tuple[int, int]:
+    """Применение одного пакета, возвращает (намерений, фактических изменений)"""
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        DELETE FROM like_intents
+        WHERE id IN (
+            SELECT id FROM like_intents
+            ORDER BY id
+            LIMIT %s
+        )
+        RETURNING id, user_id, post_id, liked
+    """, (batch_size,))
+    rows = sorted(cursor.fetchall())
+    if not rows:
+        conn.rollback()
+        cursor.close()
+        return 0, 0
+
+    final = coalesce_intents([(user_id, post_id, liked) for _, user_id, post_id, liked in rows])
+
+    # Время поста — ключ секционирования: с ним запись и счетчик затрагивают одну месячную секцию.
+    # Намерения по несуществующим постам отбрасываются, а не валят весь пакет
+    cursor.execute("SELECT id, created_at FROM posts WHERE id = ANY(%s)",
+                   (sorted({post_id for _, post_id in final}),))
+    created_at = dict(cursor.fetchall())
+    likes = [pair for pair, liked in final.items() if liked and pair[1] in created_at]
+    unlikes = [pair for pair, liked in final.items() if not liked and pair[1] in created_at]
+    deltas: Counter = Counter()
+
+    if likes:
+        cursor.execute("""
+            INSERT INTO post_likes (user_id, post_id, post_created_at)
+            SELECT x.user_id, x.post_id, x.post_created_at
+            FROM unnest(%s::INTEGER[], %s::INTEGER[], %s::TIMESTAMP[]) AS x(user_id, post_id, post_created_at)
+            ON CONFLICT DO NOTHING
+            RETURNING post_id
+        """, ([user_id for user_id, _ in likes], [post_id for _, post_id in likes],
+              [created_at[post_id] for _, post_id in likes]))
+        for (post_id,) in cursor.fetchall():
+            deltas[post_id] += 1
+
+    if unlikes:
+        # До переключения у старых строк post_likes время поста не заполнено, поэтому условие только после него
+        cursor.execute("""
+            DELETE FROM post_likes pl
+            USING unnest(%s::INTEGER[], %s::INTEGER[], %s::TIMESTAMP[]) AS x(user_id, post_id, post_created_at)
+            WHERE pl.user_id = x.user_id AND pl.post_id = x.post_id
+        """ + ("AND pl.post_created_at = x.post_created_at" if POSTS_PARTITIONED else "") + """
+            RETURNING pl.post_id
+        """, ([user_id for user_id, _ in unlikes], [post_id for _, post_id in unlikes],
+              [created_at[post_id] for _, post_id in unlikes]))
+        for (post_id,) in cursor.fetchall():
+            deltas[post_id] -= 1
+
+    changed = {post_id: delta for post_id, delta in deltas.items() if delta}
+    if changed:
+        cursor.execute("""
+            UPDATE posts p SET likes_count = p.likes_count + d.delta
+            FROM unnest(%s::INTEGER[], %s::INTEGER[], %s::TIMESTAMP[]) AS d(id, delta, created_at)
+            WHERE p.id = d.id AND p.created_at = d.created_at
+            RETURNING p.id, p.likes_count
+        """, (list(changed), list(changed.values()), [created_at[post_id] for post_id in changed]))
+
+        # Одно событие на пост с итоговым счетчиком пакета
+        updated = cursor.fetchall()
+        cursor.execute("""
+            SELECT pg_notify('social_events', json_build_object('type', 'like', 'post_id', u.id,
+                                                                'likes_count', u.likes_count)::text)
+            FROM unnest(%s::INTEGER[], %s::INTEGER[]) AS u(id, likes_count)
+        """, ([row[0] for row in updated], [row[1] for row in updated]))
+
+    conn.commit()
+    cursor.close()
+    return len(rows), sum(abs(delta) for delta in deltas.values())
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Применение очереди лайков')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='Пауза при пустой очереди, секунды')
+    parser.add_argument('--once', action='store_true', help='Разобрать очередь и выйти')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        while True:
+            intents, changes = apply_batch(conn, args.batch_size)
+            if intents:
+                print(f'Намерений: {intents}, изменений: {changes}', file=sys.stderr)
+            elif args.once:
+                break
+            else:
+                time.sleep(args.interval)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
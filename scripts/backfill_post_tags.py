@@ -0,0 +1,116 @@
+'''
+Заполнение post_tags и post_mentions для постов, созданных до появления извлечения тегов
+Посты читаются пакетами по id (keyset), теги извлекаются той же функцией, что и в action=create,
+каждый пакет пишется и коммитится отдельно; прерванный запуск продолжается с --after-id
+
+Примеры:
+    python scripts/backfill_post_tags.py
+    python scripts/backfill_post_tags.py --batch-size 20000 --after-id 1500000
+После заполнения пересчитайте тренды: python scripts/rollup_trending_tags.py --hours 168
+'''
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+import psycopg2
+
+DEFAULT_BATCH_SIZE = 5000
+
+def load_posts_module():
+    """Загрузка backend/posts/index.py как модуля ради extract_tags"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'posts', 'index.py')
+    spec = importlib.util.spec_from_file_location('posts_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def get_db_connection():
+    """Получение подключения к базе данных"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    return psycopg2.connect(DATABASE_URL)
+
+def backfill_batch(cursor, extract_tags, after_id: int, batch_size: int) -> Tuple[int, int, int, int]:
+    """Один пакет постов: возвращает (последний id, постов, тегов, упоминаний)"""
+    cursor.execute("""
+        SELECT id, created_at, content
+        FROM posts
+        WHERE id > %s
+        ORDER BY id
+        LIMIT %s
+    """, (after_id, batch_size))
+    posts = cursor.fetchall()
+    if not posts:
+        return after_id, 0, 0, 0
+
+    tag_rows: Dict[str, List] = {'tag': [], 'post_id': [], 'created_at': []}
+    mention_rows: Dict[str, List] = {'username': [], 'post_id': [], 'created_at': []}
+    for post_id, created_at, content in posts:
+        tags, mentions = extract_tags(content or '')
+        for tag in tags:
+            tag_rows['tag'].append(tag)
+            tag_rows['post_id'].append(post_id)
+            tag_rows['created_at'].append(created_at)
+        for username in mentions:
+            mention_rows['username'].append(username)
+            mention_rows['post_id'].append(post_id)
+            mention_rows['created_at'].append(created_at)
+
+    tags_inserted = mentions_inserted = 0
+    if tag_rows['tag']:
+        cursor.execute("""
+            INSERT INTO post_tags (tag, post_id, post_created_at)
+            SELECT * FROM unnest(%s::VARCHAR[], %s::INTEGER[], %s::TIMESTAMP[])
+            ON CONFLICT DO NOTHING
+        """, (tag_rows['tag'], tag_rows['post_id'], tag_rows['created_at']))
+        tags_inserted = cursor.rowcount
+    if mention_rows['username']:
+        cursor.execute("""
+            INSERT INTO post_mentions (user_id, post_id, post_created_at)
+            SELECT u.id, m.post_id, m.created_at
+            FROM unnest(%s::VARCHAR[], %s::INTEGER[], %s::TIMESTAMP[]) AS m(username, post_id, created_at)
+            JOIN users u ON u.username = m.username
+            ON CONFLICT DO NOTHING
+        """, (mention_rows['username'], mention_rows['post_id'], mention_rows['created_at']))
+        mentions_inserted = cursor.rowcount
+
+    return posts[-1][0], len(posts), tags_inserted, mentions_inserted
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Заполнение хэштегов и упоминаний для существующих постов')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--after-id', type=int, default=0, help='Продолжить с постов, id которых больше')
+    parser.add_argument('--pause', type=float, default=0.0, help='Пауза между пакетами, секунды')
+    args = parser.parse_args()
+
+    extract_tags = load_posts_module().extract_tags
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    last_id = args.after_id
+    totals = [0, 0, 0]
+    started = time.monotonic()
+
+    try:
+        while True:
+            last_id, posts, tags, mentions = backfill_batch(cursor, extract_tags, last_id, args.batch_size)
+            conn.commit()
+            if not posts:
+                break
+
+            totals = [totals[0] + posts, totals[1] + tags, totals[2] + mentions]
+            elapsed = time.monotonic() - started
+            print(f'до id {last_id}: постов {totals[0]}, тегов {totals[1]}, упоминаний {totals[2]}, '
+                  f'{totals[0] / max(elapsed, 0.001):.0f} постов/с', file=sys.stderr)
+            if args.pause:
+                time.sleep(args.pause)
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
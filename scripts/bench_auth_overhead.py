@@ -0,0 +1,78 @@
+'''
+Бенчмарк накладных расходов аутентификации на запрос
+Сравнивает get_user_from_token функции posts для непрозрачного токена (поиск в user_sessions)
+и подписанного токена (HMAC + кэш поколения)
+
+Пример:
+    DATABASE_URL=... python scripts/bench_auth_overhead.py --user-id 1 --iterations 20000
+'''
+
+import argparse
+import base64
+import hashlib
+import hmac
+import importlib.util
+import os
+import secrets
+import sys
+import time
+from datetime import datetime, timedelta
+
+def load_posts_module():
+    """Загрузка backend/posts/index.py как модуля"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'posts', 'index.py')
+    spec = importlib.util.spec_from_file_location('posts_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def sign_token(key: str, user_id: int, generation: int) -> str:
+    """Подписанный токен в формате функции auth"""
+    expires = int(time.time() + 3600)
+    payload = f'v1.{user_id}.{expires}.{generation}'
+    digest = hmac.new(key.encode(), payload.encode(), hashlib.sha256).digest()
+    return f'{payload}.{base64.urlsafe_b64encode(digest).rstrip(b"=").decode()}'
+
+def measure(get_user, cursor, token: str, iterations: int) -> float:
+    """Среднее время проверки токена в микросекундах"""
+    assert get_user(cursor, token), 'токен не принят'
+    started = time.perf_counter()
+    for _ in range(iterations):
+        get_user(cursor, token)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк проверки токенов')
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('SESSION_SIGNING_KEY', secrets.token_urlsafe(32))
+    posts = load_posts_module()
+
+    conn = posts.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT session_generation FROM users WHERE id = %s", (args.user_id,))
+        generation = cursor.fetchone()['session_generation']
+
+        opaque_token = secrets.token_urlsafe(32)
+        cursor.execute("""
+            INSERT INTO user_sessions (user_id, token_hash, expires_at)
+            VALUES (%s, %s, %s)
+        """, (args.user_id, hashlib.sha256(opaque_token.encode()).digest(), datetime.now() + timedelta(hours=1)))
+
+        signed_token = sign_token(os.environ['SESSION_SIGNING_KEY'], args.user_id, generation)
+
+        opaque_us = measure(posts.get_user_from_token, cursor, opaque_token, args.iterations)
+        signed_us = measure(posts.get_user_from_token, cursor, signed_token, args.iterations)
+
+        print(f'opaque (запрос к БД): {opaque_us:.1f} мкс/запрос', file=sys.stderr)
+        print(f'signed (HMAC + кэш): {signed_us:.1f} мкс/запрос', file=sys.stderr)
+    finally:
+        cursor.close()
+        conn.rollback()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
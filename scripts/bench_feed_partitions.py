@@ -0,0 +1,73 @@
+'''
+Бенчмарк ленты и лайков до и после перехода на секционирование
+Запускается на одном наборе данных дважды: до scripts/partitions.py swap и после
+(с POSTS_PARTITIONED=1), результаты сравниваются вручную
+
+Пример:
+    DATABASE_URL=... python scripts/bench_feed_partitions.py --token <session_token> --post-id 1 --before 2024-01-01
+'''
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+
+def load_posts_module():
+    """Загрузка backend/posts/index.py как модуля"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'posts', 'index.py')
+    spec = importlib.util.spec_from_file_location('posts_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def timed(posts, event, iterations: int) -> list:
+    """Задержки вызовов обработчика в миллисекундах"""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = posts.handler(event, None)
+        timings.append((time.perf_counter() - started) * 1000)
+        if response['statusCode'] != 200:
+            raise Exception(response['body'])
+    return timings
+
+def report(name: str, timings: list) -> None:
+    timings.sort()
+    p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+    print(f'{name}: p50 {statistics.median(timings):.2f} мс, p99 {p99:.2f} мс', file=sys.stderr)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк ленты и лайков')
+    parser.add_argument('--token', required=True)
+    parser.add_argument('--post-id', type=int, required=True)
+    parser.add_argument('--before', default='', help='ISO-время для глубокой страницы ленты')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    posts = load_posts_module()
+    # Лимит лайков на пользователя (RATE_LIMITS) иначе отвечает 429 уже после первых запросов бенчмарка
+    posts.RATE_LIMITS = {route: (1e9, 1.0) for route in posts.RATE_LIMITS}
+    headers = {'X-Auth-Token': args.token}
+    mode = 'секционированные' if posts.POSTS_PARTITIONED else 'обычные'
+    print(f'Таблицы: {mode}', file=sys.stderr)
+
+    report('лента, первая страница', timed(posts, {
+        'httpMethod': 'GET', 'queryStringParameters': {}, 'headers': headers,
+    }, args.iterations))
+
+    if args.before:
+        report('лента, курсор before', timed(posts, {
+            'httpMethod': 'GET', 'queryStringParameters': {'before': args.before}, 'headers': headers,
+        }, args.iterations))
+
+    # Четное число переключений оставляет лайк в исходном состоянии
+    report('лайк/анлайк', timed(posts, {
+        'httpMethod': 'POST', 'queryStringParameters': {'action': 'like'}, 'headers': headers,
+        'body': json.dumps({'post_id': args.post_id}),
+    }, args.iterations - args.iterations % 2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+'''
+Бенчмарк лайков под нагрузкой: LIKE_WRITE_MODE=direct против queue
+Несколько потоков непрерывно вызывают action=like функции posts; считаются лайки/с
+и коммиты/с базы по pg_stat_database.xact_commit
+
+Пример:
+    DATABASE_URL=... python scripts/bench_likes.py --token <session_token> --post-ids 1,2,3 --seconds 20
+'''
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+
+def load_posts_module():
+    """Загрузка backend/posts/index.py как модуля"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'posts', 'index.py')
+    spec = importlib.util.spec_from_file_location('posts_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def xact_commits(posts) -> int:
+    """Число закоммиченных транзакций базы"""
+    conn = posts.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()")
+    commits = cursor.fetchone()['xact_commit']
+    cursor.close()
+    conn.close()
+    return commits
+
+def run(posts, mode: str, token: str, post_ids: list, threads: int, seconds: float) -> None:
+    posts.LIKE_WRITE_MODE = mode
+    deadline = time.monotonic() + seconds
+    done = [0] * threads
+
+    def worker(index: int) -> None:
+        i = index
+        while time.monotonic() < deadline:
+            event = {
+                'httpMethod': 'POST',
+                'queryStringParameters': {'action': 'like'},
+                'headers': {'X-Auth-Token': token},
+                'body': json.dumps({'post_id': post_ids[i % len(post_ids)]}),
+            }
+            if posts.handler(event, None)['statusCode'] == 200:
+                done[index] += 1
+            i += threads
+
+    commits_before = xact_commits(posts)
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    commits = xact_commits(posts) - commits_before
+
+    print(f'{mode}: {sum(done) / seconds:.0f} лайков/с, {commits / seconds:.0f} коммитов/с', file=sys.stderr)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк режимов записи лайков')
+    parser.add_argument('--token', required=True)
+    parser.add_argument('--post-ids', required=True)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=20)
+    args = parser.parse_args()
+
+    posts = load_posts_module()
+    # Лимит лайков на пользователя (RATE_LIMITS) иначе отвечает 429 уже после первых запросов бенчмарка
+    posts.RATE_LIMITS = {route: (1e9, 1.0) for route in posts.RATE_LIMITS}
+    post_ids = [int(post_id) for post_id in args.post_ids.split(',')]
+
+    run(posts, 'direct', args.token, post_ids, args.threads, args.seconds)
+    run(posts, 'queue', args.token, post_ids, args.threads, args.seconds)
+    print('Очередь применяется scripts/apply_like_intents.py; запустите его параллельно, '
+          'чтобы учесть коммиты воркера', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
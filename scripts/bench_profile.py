@@ -0,0 +1,92 @@
+'''
+Бенчмарк страницы профиля: два последовательных запроса против одного запроса с json_agg,
+и N запросов action=profile против одного action=profiles
+
+Пример:
+    DATABASE_URL=... python scripts/bench_profile.py --user-id 1 --batch-ids 1,2,3,4,5,6,7,8,9,10
+'''
+
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import time
+
+def load_social_module():
+    """Загрузка backend/social/index.py как модуля"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'social', 'index.py')
+    spec = importlib.util.spec_from_file_location('social_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def old_profile(social, user_id: int) -> None:
+    """Прежний путь: пользователь и посты двумя запросами"""
+    conn = social.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT u.id, u.username, u.full_name, u.bio, u.avatar_url, u.is_verified,
+               u.followers_count, u.following_count, u.posts_count, u.created_at,
+               CASE WHEN f.follower_id IS NOT NULL THEN true ELSE false END as is_following
+        FROM users u
+        LEFT JOIN user_follows f ON u.id = f.following_id AND f.follower_id = %s
+        WHERE u.id = %s
+    """, (None, user_id))
+    cursor.fetchone()
+    cursor.execute("""
+        SELECT p.id, p.content, p.image_url, p.likes_count, p.comments_count,
+               p.shares_count, p.created_at,
+               CASE WHEN pl.user_id IS NOT NULL THEN true ELSE false END as is_liked
+        FROM posts p
+        LEFT JOIN post_likes pl ON p.id = pl.post_id AND pl.user_id = %s
+        WHERE p.user_id = %s
+        ORDER BY p.created_at DESC
+        LIMIT 12
+    """, (None, user_id))
+    cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+def timed(fn, iterations: int) -> list:
+    """Задержки вызовов в миллисекундах"""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def report(name: str, round_trips: int, timings: list) -> None:
+    timings.sort()
+    p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+    print(f'{name}: {round_trips} запрос(а) к БД, p50 {statistics.median(timings):.2f} мс, p99 {p99:.2f} мс',
+          file=sys.stderr)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк профиля')
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--batch-ids', default='', help='ID через запятую для сравнения с action=profiles')
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    social = load_social_module()
+
+    def profile_event(user_id):
+        return {'httpMethod': 'GET', 'queryStringParameters': {'action': 'profile', 'user_id': str(user_id)}}
+
+    report('profile, два запроса', 2, timed(lambda: old_profile(social, args.user_id), args.iterations))
+    report('profile, один запрос', 1,
+           timed(lambda: social.handler(profile_event(args.user_id), None), args.iterations))
+
+    batch_ids = [int(user_id) for user_id in args.batch_ids.split(',') if user_id]
+    if batch_ids:
+        report(f'{len(batch_ids)} x action=profile', len(batch_ids),
+               timed(lambda: [social.handler(profile_event(user_id), None) for user_id in batch_ids],
+                     max(args.iterations // len(batch_ids), 1)))
+        event = {'httpMethod': 'GET',
+                 'queryStringParameters': {'action': 'profiles', 'user_ids': args.batch_ids}}
+        report('action=profiles', 1, timed(lambda: social.handler(event, None), args.iterations))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+'''
+Бенчмарк проверки лимитов запросов: стоимость check_rate_limit на горячем пути
+Вызовы идут напрямую в функцию из backend/posts/index.py по множеству субъектов;
+с --shared корзины сверяются с таблицей rate_limit_buckets (нужен DATABASE_URL)
+
+Примеры:
+    python scripts/bench_rate_limit.py --calls 1000000 --subjects 10000
+    DATABASE_URL=... python scripts/bench_rate_limit.py --shared --sync-interval 1 --seconds 10
+'''
+
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import time
+
+def load_posts_module():
+    """Загрузка backend/posts/index.py как модуля"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'posts', 'index.py')
+    spec = importlib.util.spec_from_file_location('posts_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def bench_local(posts, calls: int, subjects: int, rounds: int) -> None:
+    """Только корзины в памяти: наносекунды на проверку"""
+    posts.RATE_LIMIT_MODE = 'local'
+    check = posts.check_rate_limit
+    results = []
+    allowed = 0
+
+    for _ in range(rounds):
+        posts._rate_buckets.clear()
+        started = time.perf_counter()
+        for i in range(calls):
+            if not check(None, 'like', i % subjects):
+                allowed += 1
+        results.append((time.perf_counter() - started) / calls * 1e9)
+
+    print(f'local: {statistics.median(results):.0f} нс/проверку (медиана {rounds} прогонов), '
+          f'разрешено {allowed} из {calls * rounds}, корзин {len(posts._rate_buckets)}', file=sys.stderr)
+
+def bench_shared(posts, subjects: int, seconds: float, sync_interval: float) -> None:
+    """Корзины со сверкой через Postgres: средняя стоимость с учетом редких походов в базу"""
+    posts.RATE_LIMIT_MODE = 'shared'
+    posts.RATE_LIMIT_SYNC_INTERVAL = sync_interval
+    posts._rate_buckets.clear()
+
+    conn = posts.get_db_connection()
+    cursor = conn.cursor()
+    calls = 0
+    deadline = time.monotonic() + seconds
+    started = time.perf_counter()
+    while time.monotonic() < deadline:
+        posts.check_rate_limit(cursor, 'like', calls % subjects)
+        calls += 1
+    elapsed = time.perf_counter() - started
+    cursor.close()
+    conn.close()
+
+    print(f'shared: {elapsed / calls * 1e9:.0f} нс/проверку, {calls / elapsed:.0f} проверок/с, '
+          f'интервал сверки {sync_interval} с', file=sys.stderr)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк проверки лимитов запросов')
+    parser.add_argument('--calls', type=int, default=1000000)
+    parser.add_argument('--subjects', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--shared', action='store_true', help='Дополнительно замерить режим shared')
+    parser.add_argument('--sync-interval', type=float, default=1.0)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    posts = load_posts_module()
+    bench_local(posts, args.calls, args.subjects, args.rounds)
+    if args.shared:
+        bench_shared(posts, args.subjects, args.seconds, args.sync_interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+'''
+Бенчмарк раздачи событий realtime_server.py: много простаивающих SSE-клиентов и одно pg_notify
+Замеряется время от уведомления до получения события последним клиентом и число переживших тест клиентов
+
+Пример (сервер уже запущен, ulimit -n не меньше числа клиентов):
+    DATABASE_URL=... python scripts/bench_realtime_fanout.py --clients 10000 --rounds 5
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+import psycopg2
+
+def notify(payload: dict) -> None:
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    conn = psycopg2.connect(DATABASE_URL)
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_notify('social_events', %s)", (json.dumps(payload),))
+    conn.commit()
+    conn.close()
+
+async def open_client(host: str, port: int):
+    reader, writer = await asyncio.open_connection(host, port)
+    # Анонимные клиенты: событие post_created раздается всем, проверка токенов в замер не входит
+    writer.write(f'GET /events HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+    await writer.drain()
+    # Заголовки ответа и retry
+    await reader.readuntil(b'\n\n')
+    return reader, writer
+
+async def wait_event(reader: asyncio.StreamReader, marker: bytes) -> float:
+    """Чтение кадров до нужного события (heartbeat и чужие события пропускаются)"""
+    while True:
+        frame = await reader.readuntil(b'\n\n')
+        if marker in frame:
+            return time.monotonic()
+
+async def run(args: argparse.Namespace) -> None:
+    clients = []
+    started = time.monotonic()
+    for offset in range(0, args.clients, args.connect_batch):
+        batch = range(offset, min(offset + args.connect_batch, args.clients))
+        clients += await asyncio.gather(*(open_client(args.host, args.port) for _ in batch))
+    print(f'Подключено {len(clients)} клиентов за {time.monotonic() - started:.1f} с', file=sys.stderr)
+
+    await asyncio.sleep(args.idle)
+
+    latencies: List[float] = []
+    for round_number in range(args.rounds):
+        marker = f'"bench_round":{round_number}}}'.encode()
+        waiters = [asyncio.ensure_future(wait_event(reader, marker)) for reader, _ in clients]
+
+        sent = time.monotonic()
+        await asyncio.get_running_loop().run_in_executor(
+            None, notify, {'type': 'post_created', 'post_id': 0, 'user_id': 0, 'bench_round': round_number}
+        )
+        done, pending = await asyncio.wait(waiters, timeout=args.timeout)
+        for task in pending:
+            task.cancel()
+
+        received = [task.result() for task in done if not task.exception()]
+        if received:
+            last = max(received) - sent
+            median = statistics.median(received) - sent
+            latencies.append(last)
+            print(f'Раунд {round_number + 1}: получили {len(received)}/{len(clients)}, '
+                  f'медиана {median * 1000:.1f} мс, последний {last * 1000:.1f} мс', file=sys.stderr)
+        else:
+            print(f'Раунд {round_number + 1}: событие не получено', file=sys.stderr)
+
+    if latencies:
+        print(f'Время до последнего клиента: среднее {statistics.mean(latencies) * 1000:.1f} мс, '
+              f'макс {max(latencies) * 1000:.1f} мс', file=sys.stderr)
+
+    for _, writer in clients:
+        writer.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк раздачи событий SSE')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--connect-batch', type=int, default=500)
+    parser.add_argument('--idle', type=float, default=5.0, help='Пауза после подключения, секунды')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+'''
+Бенчмарк полнотекстового поиска постов (action=search_posts): p50/p95/p99 по набору запросов
+С --seed сначала дописывает синтетические посты из смешанного русско-английского словаря
+до нужного общего числа (например, 5 млн) — только на отдельной базе для тестов;
+posts_count авторов после генерации поправит scripts/reconcile_counters.py
+
+Примеры:
+    DATABASE_URL=... python scripts/bench_search_posts.py --seed 5000000
+    DATABASE_URL=... python scripts/bench_search_posts.py --iterations 500 --pages 3
+    DATABASE_URL=... python scripts/bench_search_posts.py --queries 'кот' --candidates 10000
+'''
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+DEFAULT_QUERIES = [
+    'кот',                       # частое слово: ранжируются только SEARCH_CANDIDATES свежих совпадений
+    'котики собаки',             # несколько слов, словоформы
+    '"новый проект"',            # фраза
+    'travel photography',        # английские слова
+    'музыка -концерт',           # исключение
+    'редкоесловобенчмарка',      # нет совпадений
+]
+
+VOCABULARY = (
+    'кот котики собака собаки музыка концерт новый проект работа отпуск море горы город книга фильм '
+    'друзья семья утро вечер кофе спорт бег футбол погода дождь солнце праздник подарок учеба '
+    'travel photography coffee music concert project work weekend friends family sunset mountains '
+    'city book movie running football weather rain summer holiday gift study code release'
+).split()
+
+SEED_BATCH = 100000
+
+def load_posts_module():
+    """Загрузка backend/posts/index.py как модуля"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'posts', 'index.py')
+    spec = importlib.util.spec_from_file_location('posts_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def seed_posts(posts, total: int) -> None:
+    """Дозаполнение posts синтетическими постами по 8–27 слов, пакетами в отдельных транзакциях"""
+    conn = posts.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) AS count FROM posts")
+    existing = cursor.fetchone()['count']
+    cursor.execute("SELECT array_agg(id) AS ids FROM users")
+    user_ids = cursor.fetchone()['ids']
+    if not user_ids:
+        raise Exception('Для генерации постов нужен хотя бы один пользователь')
+
+    remaining = total - existing
+    started = time.monotonic()
+    while remaining > 0:
+        batch = min(SEED_BATCH, remaining)
+        cursor.execute("""
+            INSERT INTO posts (user_id, content, created_at)
+            SELECT (%(users)s::INTEGER[])[1 + floor(random() * cardinality(%(users)s::INTEGER[]))::INTEGER],
+                   array_to_string(ARRAY(
+                       SELECT (%(words)s::TEXT[])[1 + floor(random() * cardinality(%(words)s::TEXT[]))::INTEGER]
+                       FROM generate_series(1, 8 + g %% 20)
+                   ), ' '),
+                   NOW() - random() * INTERVAL '365 days'
+            FROM generate_series(1, %(batch)s) AS g
+        """, {'users': user_ids, 'words': VOCABULARY, 'batch': batch})
+        conn.commit()
+        remaining -= batch
+        done = total - existing - remaining
+        print(f'Сгенерировано {done} из {total - existing}, {done / (time.monotonic() - started):.0f} постов/с',
+              file=sys.stderr)
+
+    cursor.execute("ANALYZE posts")
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def percentile(timings: List[float], share: float) -> float:
+    return timings[max(int(len(timings) * share) - 1, 0)]
+
+def bench_query(posts, search_query: str, iterations: int, pages: int, headers: dict) -> List[float]:
+    """Задержки в миллисекундах: первая страница и следующие по курсору"""
+    timings = []
+    for _ in range(iterations):
+        params = {'action': 'search_posts', 'q': search_query}
+        for _ in range(pages):
+            started = time.perf_counter()
+            response = posts.handler({'httpMethod': 'GET', 'queryStringParameters': params, 'headers': headers}, None)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response['statusCode'] != 200:
+                raise Exception(response['body'])
+            next_cursor = json.loads(response['body'])['next_cursor']
+            if not next_cursor:
+                break
+            params = {'action': 'search_posts', 'q': search_query,
+                      **{key: repr(value) if isinstance(value, float) else str(value) for key, value in next_cursor.items()}}
+    return timings
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк action=search_posts')
+    parser.add_argument('--seed', type=int, default=0, help='Дозаполнить posts до этого числа строк')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--pages', type=int, default=2, help='Сколько страниц пролистывать курсором')
+    parser.add_argument('--token', default='', help='Токен зрителя, чтобы учитывать is_liked')
+    parser.add_argument('--queries', default='', help='Свои запросы через "|"')
+    parser.add_argument('--candidates', type=int, default=0, help='Размер окна ранжирования вместо SEARCH_CANDIDATES')
+    args = parser.parse_args()
+
+    posts = load_posts_module()
+    if args.candidates:
+        posts.SEARCH_CANDIDATES = args.candidates
+    if args.seed:
+        seed_posts(posts, args.seed)
+
+    headers = {'X-Auth-Token': args.token} if args.token else {}
+    queries = [query for query in args.queries.split('|') if query] or DEFAULT_QUERIES
+    everything: List[float] = []
+
+    for search_query in queries:
+        timings = sorted(bench_query(posts, search_query, args.iterations, args.pages, headers))
+        everything += timings
+        print(f'{search_query!r}: p50 {statistics.median(timings):.2f} мс, p95 {percentile(timings, 0.95):.2f} мс, '
+              f'p99 {percentile(timings, 0.99):.2f} мс ({len(timings)} запросов)', file=sys.stderr)
+
+    everything.sort()
+    print(f'Все запросы: p50 {statistics.median(everything):.2f} мс, p95 {percentile(everything, 0.95):.2f} мс, '
+          f'p99 {percentile(everything, 0.99):.2f} мс', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+'''
+Бенчмарк поиска сессии по токену: VARCHAR-токен против BYTEA SHA-256 дайджеста
+Создает две временные таблицы по N строк, сравнивает размер уникальных индексов и задержку поиска
+
+Пример:
+    python scripts/bench_session_lookup.py --rows 50000000 --lookups 20000
+'''
+
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import sys
+import time
+import psycopg2
+
+def get_db_connection():
+    """Получение подключения к базе данных"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    return psycopg2.connect(DATABASE_URL)
+
+def make_token(i: int) -> str:
+    """Детерминированный токен той же длины, что secrets.token_urlsafe(32)"""
+    return hashlib.md5(str(i).encode()).hexdigest() + hashlib.md5(str(-i).encode()).hexdigest()[:11]
+
+def setup(cursor, rows: int) -> None:
+    """Заполнение таблиц через generate_series на стороне базы"""
+    cursor.execute("""
+        CREATE TEMP TABLE bench_sessions_text (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            session_token VARCHAR(255) NOT NULL,
+            expires_at TIMESTAMP NOT NULL
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO bench_sessions_text (user_id, session_token, expires_at)
+        SELECT i % 1000000, md5(i::text) || left(md5((-i)::text), 11), NOW() + INTERVAL '30 days'
+        FROM generate_series(1, %s) AS i
+    """, (rows,))
+    cursor.execute("CREATE UNIQUE INDEX bench_text_token ON bench_sessions_text(session_token)")
+
+    cursor.execute("""
+        CREATE TEMP TABLE bench_sessions_hash AS
+        SELECT id, user_id, sha256(convert_to(session_token, 'UTF8')) AS token_hash, expires_at
+        FROM bench_sessions_text
+    """)
+    cursor.execute("CREATE UNIQUE INDEX bench_hash_token ON bench_sessions_hash(token_hash)")
+    cursor.execute("ANALYZE bench_sessions_text")
+    cursor.execute("ANALYZE bench_sessions_hash")
+
+def measure(cursor, sql: str, params) -> list:
+    """Задержки отдельных запросов в миллисекундах"""
+    timings = []
+    for value in params:
+        started = time.perf_counter()
+        cursor.execute(sql, (value,))
+        cursor.fetchone()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def report(name: str, timings: list, index_bytes: int) -> None:
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f'{name}: индекс {index_bytes / 1024 / 1024:.1f} МБ, '
+          f'p50 {statistics.median(timings):.3f} мс, p99 {p99:.3f} мс', file=sys.stderr)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк поиска сессии по токену')
+    parser.add_argument('--rows', type=int, default=50000000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        setup(cursor, args.rows)
+
+        sample = [make_token(random.randint(1, args.rows)) for _ in range(args.lookups)]
+        text_timings = measure(cursor, """
+            SELECT user_id FROM bench_sessions_text
+            WHERE session_token = %s AND expires_at > NOW()
+        """, sample)
+        hash_timings = measure(cursor, """
+            SELECT user_id FROM bench_sessions_hash
+            WHERE token_hash = %s AND expires_at > NOW()
+        """, [hashlib.sha256(token.encode()).digest() for token in sample])
+
+        cursor.execute("SELECT pg_relation_size('bench_text_token'), pg_relation_size('bench_hash_token')")
+        text_size, hash_size = cursor.fetchone()
+
+        report('VARCHAR session_token', text_timings, text_size)
+        report('BYTEA token_hash', hash_timings, hash_size)
+    finally:
+        cursor.close()
+        conn.rollback()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+'''
+Пакетный расчет рекомендаций "Возможно, вы знакомы" по графу подписок
+Кандидаты — подписки ваших подписок, ранжируются по числу общих связей.
+Обход ограничен: не больше --via-limit подписок пользователя и --fanout подписок каждой из них,
+поэтому память и время на пакет не зависят от размера графа
+
+Примеры:
+    python scripts/build_suggestions.py
+    python scripts/build_suggestions.py --batch-size 500 --limit 50
+'''
+
+import argparse
+import os
+import sys
+import time
+import psycopg2
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_VIA_LIMIT = 200
+DEFAULT_FANOUT = 100
+# Совпадает с SUGGESTIONS_MAX_LIMIT функции social: сохраненного списка хватает на любой limit запроса
+DEFAULT_LIMIT = 50
+
+def get_db_connection():
+    """Получение подключения к базе данных"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    return psycopg2.connect(DATABASE_URL)
+
+def build_batch(cursor, user_ids, via_limit: int, fanout: int, limit: int) -> None:
+    """Расчет и сохранение рекомендаций для пакета пользователей одним запросом"""
+    cursor.execute("""
+        WITH src AS (
+            SELECT unnest(%(user_ids)s::INTEGER[]) AS id
+        ),
+        via AS (
+            SELECT src.id AS user_id, v.following_id AS via_id
+            FROM src
+            CROSS JOIN LATERAL (
+                SELECT f.following_id FROM user_follows f
+                WHERE f.follower_id = src.id
+                ORDER BY f.created_at DESC
+                LIMIT %(via_limit)s
+            ) v
+        ),
+        candidates AS (
+            SELECT via.user_id, c.following_id AS candidate_id, COUNT(*) AS shared
+            FROM via
+            CROSS JOIN LATERAL (
+                SELECT f2.following_id FROM user_follows f2
+                WHERE f2.follower_id = via.via_id
+                ORDER BY f2.created_at DESC
+                LIMIT %(fanout)s
+            ) c
+            WHERE c.following_id <> via.user_id
+              AND NOT EXISTS (
+                  SELECT 1 FROM user_follows x
+                  WHERE x.follower_id = via.user_id AND x.following_id = c.following_id
+              )
+            GROUP BY via.user_id, c.following_id
+        ),
+        ranked AS (
+            SELECT user_id, candidate_id, shared,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY shared DESC, candidate_id) AS rn
+            FROM candidates
+        )
+        INSERT INTO user_suggestions (user_id, suggested_ids, shared_counts, computed_at)
+        SELECT src.id,
+               COALESCE(array_agg(r.candidate_id ORDER BY r.rn) FILTER (WHERE r.candidate_id IS NOT NULL), '{}'),
+               COALESCE(array_agg(r.shared ORDER BY r.rn) FILTER (WHERE r.candidate_id IS NOT NULL), '{}'),
+               NOW()
+        FROM src
+        LEFT JOIN ranked r ON r.user_id = src.id AND r.rn <= %(limit)s
+        GROUP BY src.id
+        ON CONFLICT (user_id) DO UPDATE
+        SET suggested_ids = EXCLUDED.suggested_ids,
+            shared_counts = EXCLUDED.shared_counts,
+            computed_at = EXCLUDED.computed_at
+    """, {'user_ids': user_ids, 'via_limit': via_limit, 'fanout': fanout, 'limit': limit})
+
+def build_all(conn, batch_size: int, via_limit: int, fanout: int, limit: int) -> int:
+    """Обход всех пользователей, у которых есть подписки, пакетами по id"""
+    cursor = conn.cursor()
+    last_id = 0
+    processed = 0
+    started = time.monotonic()
+
+    while True:
+        cursor.execute("""
+            SELECT u.id FROM users u
+            WHERE u.id > %s
+              AND EXISTS (SELECT 1 FROM user_follows f WHERE f.follower_id = u.id)
+            ORDER BY u.id
+            LIMIT %s
+        """, (last_id, batch_size))
+        user_ids = [row[0] for row in cursor.fetchall()]
+        if not user_ids:
+            break
+
+        build_batch(cursor, user_ids, via_limit, fanout, limit)
+        conn.commit()
+
+        processed += len(user_ids)
+        last_id = user_ids[-1]
+        print(f'Обработано пользователей: {processed} ({time.monotonic() - started:.0f} с)', file=sys.stderr)
+
+    cursor.close()
+    return processed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Расчет рекомендаций по графу подписок')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--via-limit', type=int, default=DEFAULT_VIA_LIMIT)
+    parser.add_argument('--fanout', type=int, default=DEFAULT_FANOUT)
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='Рекомендаций на пользователя')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        build_all(conn, args.batch_size, args.via_limit, args.fanout, args.limit)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+'''
+Массовый импорт/экспорт данных социальной сети через COPY
+Поддерживает users, posts, user_follows, post_likes и post_comments в форматах CSV и NDJSON
+
+Примеры:
+    python scripts/bulk_io.py export user_follows follows.csv
+    python scripts/bulk_io.py export users users.ndjson --format ndjson
+    python scripts/bulk_io.py import user_follows follows.csv --chunk-rows 200000
+'''
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, Iterator, List, TextIO
+import psycopg2
+
+# Колонки, которые переносятся для каждой таблицы.
+# Счетчики (*_count) не импортируются — они пересчитываются после загрузки.
+TABLES: Dict[str, Dict[str, Any]] = {
+    'users': {
+        'columns': ['id', 'username', 'email', 'password_hash', 'full_name',
+                    'avatar_url', 'bio', 'is_verified', 'created_at'],
+        'serial': True,
+    },
+    'posts': {
+        'columns': ['id', 'user_id', 'content', 'image_url', 'created_at'],
+        'serial': True,
+    },
+    'user_follows': {
+        'columns': ['follower_id', 'following_id', 'created_at'],
+        'serial': False,
+    },
+    'post_likes': {
+        'columns': ['post_id', 'user_id', 'created_at'],
+        'serial': False,
+    },
+    'post_comments': {
+        'columns': ['id', 'post_id', 'user_id', 'parent_comment_id', 'content', 'created_at'],
+        'serial': True,
+    },
+}
+
+DEFAULT_CHUNK_ROWS = 100000
+
+# Маркер NULL в CSV: пустая строка остается пустой строкой (например, content поста с картинкой)
+NULL_MARKER = '\\N'
+
+def get_db_connection():
+    """Получение подключения к базе данных"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    return psycopg2.connect(DATABASE_URL)
+
+def export_table(conn, table: str, out: TextIO, fmt: str) -> None:
+    """Выгрузка таблицы потоком через COPY TO STDOUT"""
+    columns = ', '.join(TABLES[table]['columns'])
+    cursor = conn.cursor()
+
+    if fmt == 'csv':
+        cursor.copy_expert(
+            f"COPY (SELECT {columns} FROM {table} ORDER BY 1) TO STDOUT WITH (FORMAT csv, HEADER true, NULL '{NULL_MARKER}')",
+            out
+        )
+    else:
+        # row_to_json не содержит переводов строк и управляющих символов,
+        # поэтому CSV с "невозможными" QUOTE/DELIMITER выдает JSON без экранирования
+        cursor.copy_expert(
+            f"""COPY (SELECT row_to_json(t) FROM (SELECT {columns} FROM {table} ORDER BY 1) t)
+                TO STDOUT WITH (FORMAT csv, QUOTE e'\\x01', DELIMITER e'\\x02')""",
+            out
+        )
+
+    cursor.close()
+
+def read_chunks(source: TextIO, fmt: str, columns: List[str], chunk_rows: int) -> Iterator[io.StringIO]:
+    """Чтение входного файла порциями, каждая порция — готовый CSV-буфер для COPY"""
+    writer_buffer = io.StringIO()
+    writer = csv.writer(writer_buffer)
+    rows_in_chunk = 0
+
+    if fmt == 'csv':
+        reader = csv.reader(source)
+        header = next(reader, None)
+        if header is None:
+            return
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise Exception(f'В CSV нет колонок: {", ".join(missing)}')
+        positions = [header.index(column) for column in columns]
+        rows = ([row[i] for i in positions] for row in reader if row)
+    else:
+        rows = (
+            [_ndjson_value(record.get(column)) for column in columns]
+            for record in (json.loads(line) for line in source if line.strip())
+        )
+
+    for row in rows:
+        writer.writerow(row)
+        rows_in_chunk += 1
+        if rows_in_chunk >= chunk_rows:
+            writer_buffer.seek(0)
+            yield writer_buffer
+            writer_buffer = io.StringIO()
+            writer = csv.writer(writer_buffer)
+            rows_in_chunk = 0
+
+    if rows_in_chunk:
+        writer_buffer.seek(0)
+        yield writer_buffer
+
+def _ndjson_value(value: Any) -> str:
+    """Преобразование значения из NDJSON в поле CSV"""
+    if value is None:
+        return NULL_MARKER
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+def import_table(conn, table: str, source: TextIO, fmt: str, chunk_rows: int,
+                 log_counter_changes: bool = True) -> int:
+    """Загрузка таблицы порциями: COPY в staging-таблицу и INSERT ... SELECT в целевую.
+    Без log_counter_changes триггеры не пишут counter_changes — счетчики затем пересчитываются целиком"""
+    columns = TABLES[table]['columns']
+    column_list = ', '.join(columns)
+    cursor = conn.cursor()
+
+    if not log_counter_changes:
+        # Настройка сессии переживает коммиты порций и проверяется в log_counter_change() (V0016)
+        cursor.execute("SET app.skip_counter_log = 'on'")
+
+    cursor.execute(f"""
+        CREATE TEMP TABLE bulk_stage AS
+        SELECT {column_list} FROM {table} WITH NO DATA
+    """)
+
+    # Самоподписки отбрасываются так же, как их отвергает action=follow
+    where_clause = 'WHERE follower_id <> following_id' if table == 'user_follows' else ''
+    insert_columns = column_list
+    select_columns = column_list
+    select_source = 'bulk_stage'
+
+    # Лайки и комментарии хранят время поста — ключ помесячного секционирования
+    if table in ('post_likes', 'post_comments'):
+        insert_columns = f'{column_list}, post_created_at'
+        select_columns = ', '.join(f's.{column}' for column in columns) + ', p.created_at'
+        select_source = 'bulk_stage s JOIN posts p ON p.id = s.post_id'
+
+    imported = 0
+    started = time.monotonic()
+
+    for chunk in read_chunks(source, fmt, columns, chunk_rows):
+        cursor.copy_expert(
+            f"COPY bulk_stage ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '{NULL_MARKER}')",
+            chunk
+        )
+        cursor.execute(f"""
+            INSERT INTO {table} ({insert_columns})
+            SELECT {select_columns} FROM {select_source}
+            {where_clause}
+            ON CONFLICT DO NOTHING
+        """)
+        imported += cursor.rowcount
+        cursor.execute("TRUNCATE bulk_stage")
+        conn.commit()
+
+        elapsed = time.monotonic() - started
+        print(f'{table}: {imported} строк, {imported / max(elapsed, 0.001):.0f} строк/с', file=sys.stderr)
+
+    if TABLES[table]['serial']:
+        cursor.execute(f"""
+            SELECT setval(pg_get_serial_sequence('{table}', 'id'),
+                          (SELECT COALESCE(MAX(id), 1) FROM {table}))
+        """)
+
+    cursor.execute("DROP TABLE bulk_stage")
+    if not log_counter_changes:
+        cursor.execute("RESET app.skip_counter_log")
+    conn.commit()
+    cursor.close()
+    return imported
+
+def recompute_counters(conn) -> None:
+    """Пересчет денормализованных счетчиков одним set-based проходом по каждой таблице"""
+    cursor = conn.cursor()
+
+    # Записи журнала, появившиеся до пересчета (в том числе от импорта с --skip-recount), им уже покрыты
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM counter_changes")
+    covered_change_id = cursor.fetchone()[0]
+
+    cursor.execute("""
+        UPDATE users u
+        SET followers_count = c.followers_count,
+            following_count = c.following_count,
+            posts_count = c.posts_count
+        FROM (
+            SELECT u2.id,
+                   COALESCE(fr.cnt, 0) AS followers_count,
+                   COALESCE(fg.cnt, 0) AS following_count,
+                   COALESCE(p.cnt, 0) AS posts_count
+            FROM users u2
+            LEFT JOIN (SELECT following_id AS id, COUNT(*) AS cnt FROM user_follows GROUP BY 1) fr ON fr.id = u2.id
+            LEFT JOIN (SELECT follower_id AS id, COUNT(*) AS cnt FROM user_follows GROUP BY 1) fg ON fg.id = u2.id
+            LEFT JOIN (SELECT user_id AS id, COUNT(*) AS cnt FROM posts GROUP BY 1) p ON p.id = u2.id
+        ) c
+        WHERE u.id = c.id
+          AND (u.followers_count IS DISTINCT FROM c.followers_count
+               OR u.following_count IS DISTINCT FROM c.following_count
+               OR u.posts_count IS DISTINCT FROM c.posts_count)
+    """)
+    print(f'users: обновлено счетчиков {cursor.rowcount}', file=sys.stderr)
+
+    cursor.execute("""
+        UPDATE posts p
+        SET likes_count = c.likes_count,
+            comments_count = c.comments_count
+        FROM (
+            SELECT p2.id,
+                   COALESCE(l.cnt, 0) AS likes_count,
+                   COALESCE(cm.cnt, 0) AS comments_count
+            FROM posts p2
+            LEFT JOIN (SELECT post_id AS id, COUNT(*) AS cnt FROM post_likes GROUP BY 1) l ON l.id = p2.id
+            LEFT JOIN (SELECT post_id AS id, COUNT(*) AS cnt FROM post_comments GROUP BY 1) cm ON cm.id = p2.id
+        ) c
+        WHERE p.id = c.id
+          AND (p.likes_count IS DISTINCT FROM c.likes_count
+               OR p.comments_count IS DISTINCT FROM c.comments_count)
+    """)
+    print(f'posts: обновлено счетчиков {cursor.rowcount}', file=sys.stderr)
+
+    cursor.execute("DELETE FROM counter_changes WHERE id <= %s", (covered_change_id,))
+
+    conn.commit()
+    cursor.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Массовый импорт/экспорт через COPY')
+    parser.add_argument('command', choices=['export', 'import', 'recount'])
+    parser.add_argument('table', nargs='?', choices=list(TABLES))
+    parser.add_argument('path', nargs='?', help='Файл, "-" — stdin/stdout')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--skip-recount', action='store_true',
+                        help='Не пересчитывать счетчики после импорта')
+    args = parser.parse_args()
+
+    if args.command != 'recount' and (not args.table or not args.path):
+        parser.error('Для export/import нужно указать таблицу и файл')
+
+    conn = get_db_connection()
+    try:
+        if args.command == 'export':
+            if args.path == '-':
+                export_table(conn, args.table, sys.stdout, args.format)
+            else:
+                with open(args.path, 'w', encoding='utf-8', newline='') as out:
+                    export_table(conn, args.table, out, args.format)
+
+        elif args.command == 'import':
+            # Журнал изменений нужен, только если счетчики не будут пересчитаны сразу после импорта
+            if args.path == '-':
+                import_table(conn, args.table, sys.stdin, args.format, args.chunk_rows, args.skip_recount)
+            else:
+                with open(args.path, 'r', encoding='utf-8', newline='') as source:
+                    import_table(conn, args.table, source, args.format, args.chunk_rows, args.skip_recount)
+            if not args.skip_recount:
+                recompute_counters(conn)
+
+        else:
+            recompute_counters(conn)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
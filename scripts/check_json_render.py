@@ -0,0 +1,67 @@
+'''
+Проверка эквивалентности режимов рендеринга JSON (JSON_RENDER_MODE=python и db)
+Вызывает обработчики posts и social в обоих режимах и сравнивает разобранные ответы
+
+Пример:
+    DATABASE_URL=... python scripts/check_json_render.py --user-id 1 --post-id 1 --token <session_token>
+'''
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+
+def load_module(name: str):
+    """Загрузка backend/<name>/index.py как модуля"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'backend', name, 'index.py')
+    spec = importlib.util.spec_from_file_location(f'{name}_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def render(module, event) -> dict:
+    """Ответ обработчика в обоих режимах"""
+    bodies = {}
+    for mode in ('python', 'db'):
+        module.JSON_RENDER_MODE = mode
+        response = module.handler(event, None)
+        if response['statusCode'] != 200:
+            raise Exception(f'{mode}: статус {response["statusCode"]}: {response["body"]}')
+        bodies[mode] = json.loads(response['body'])
+    return bodies
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Сравнение JSON_RENDER_MODE=python и db')
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--post-id', type=int, required=True)
+    parser.add_argument('--token', default='', help='Токен сессии для проверки is_liked/is_following')
+    args = parser.parse_args()
+
+    headers = {'X-Auth-Token': args.token} if args.token else {}
+    posts = load_module('posts')
+    social = load_module('social')
+
+    cases = [
+        ('feed', posts, {}),
+        ('feed top', posts, {'sort': 'top'}),
+        ('comments', posts, {'action': 'comments', 'post_id': str(args.post_id)}),
+        ('followers', social, {'action': 'followers', 'user_id': str(args.user_id)}),
+        ('following', social, {'action': 'following', 'user_id': str(args.user_id)}),
+        ('search', social, {'action': 'search', 'q': 'a'}),
+    ]
+
+    failed = 0
+    for name, module, params in cases:
+        event = {'httpMethod': 'GET', 'queryStringParameters': params, 'headers': headers}
+        bodies = render(module, event)
+        if bodies['python'] == bodies['db']:
+            print(f'OK   {name}', file=sys.stderr)
+        else:
+            failed += 1
+            print(f'FAIL {name}\n  python: {bodies["python"]}\n  db:     {bodies["db"]}', file=sys.stderr)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+'''
+Проверка склейки одновременных чтений (SINGLE_FLIGHT=1) под "набегом" одинаковых запросов
+Много потоков одновременно запрашивают одну страницу ленты или профиль от разных зрителей;
+считается число запросов к базе и сравниваются ответы каждого зрителя с режимом без склейки
+
+Пример:
+    DATABASE_URL=... python scripts/check_single_flight.py --user-id 1 --tokens <t1>,<t2> --threads 200
+'''
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List
+
+def load_module(name: str):
+    """Загрузка backend/<name>/index.py как модуля"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'backend', name, 'index.py')
+    spec = importlib.util.spec_from_file_location(f'{name}_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def count_queries(module) -> Dict[str, int]:
+    """Подмена фабрики курсоров модуля на считающую вызовы execute"""
+    counter = {'queries': 0}
+    lock = threading.Lock()
+
+    class CountingCursor(module.RealDictCursor):
+        def execute(self, query, vars=None):
+            with lock:
+                counter['queries'] += 1
+            return super().execute(query, vars)
+
+    module.RealDictCursor = CountingCursor
+    return counter
+
+def herd(module, counter: Dict[str, int], params: Dict, tokens: List[str], threads: int, single_flight: bool):
+    """Одновременный запуск обработчиков, возвращает (ответы по зрителям, запросов к базе, секунд)"""
+    module.SINGLE_FLIGHT = single_flight
+    counter['queries'] = 0
+    barrier = threading.Barrier(threads)
+    bodies: Dict[str, object] = {}
+    failures: List[str] = []
+
+    def worker(index: int) -> None:
+        token = tokens[index % len(tokens)]
+        event = {
+            'httpMethod': 'GET',
+            'queryStringParameters': params,
+            'headers': {'X-Auth-Token': token} if token else {},
+        }
+        barrier.wait()
+        response = module.handler(event, None)
+        if response['statusCode'] != 200:
+            failures.append(f'{response["statusCode"]}: {response["body"]}')
+            return
+        body = json.loads(response['body'])
+        previous = bodies.setdefault(token, body)
+        if previous != body:
+            failures.append(f'разные ответы одному зрителю {token[:8] or "аноним"}')
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.monotonic()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    if failures:
+        raise Exception(failures[0])
+    return bodies, counter['queries'], elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Проверка SINGLE_FLIGHT под одновременными запросами')
+    parser.add_argument('--user-id', type=int, required=True, help='Профиль для проверки')
+    parser.add_argument('--tokens', default='', help='Токены зрителей через запятую; аноним добавляется всегда')
+    parser.add_argument('--threads', type=int, default=200)
+    args = parser.parse_args()
+
+    tokens = [''] + [token for token in args.tokens.split(',') if token]
+    posts = load_module('posts')
+    social = load_module('social')
+    counters = {posts: count_queries(posts), social: count_queries(social)}
+
+    cases = [
+        ('feed', posts, {}),
+        ('feed top', posts, {'sort': 'top'}),
+        ('profile', social, {'action': 'profile', 'user_id': str(args.user_id)}),
+    ]
+
+    failed = 0
+    for name, module, params in cases:
+        plain, plain_queries, plain_time = herd(module, counters[module], params, tokens, args.threads, False)
+        merged, merged_queries, merged_time = herd(module, counters[module], params, tokens, args.threads, True)
+
+        status = 'OK  ' if plain == merged else 'FAIL'
+        failed += plain != merged
+        print(f'{status} {name}: запросов к базе {plain_queries} -> {merged_queries}, '
+              f'{plain_time:.2f} с -> {merged_time:.2f} с ({args.threads} потоков, {len(tokens)} зрителей)',
+              file=sys.stderr)
+        if plain != merged:
+            for token in tokens:
+                if plain.get(token) != merged.get(token):
+                    print(f'  зритель {token[:8] or "аноним"}:\n    без склейки: {plain.get(token)}\n'
+                          f'    со склейкой: {merged.get(token)}', file=sys.stderr)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
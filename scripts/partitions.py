@@ -0,0 +1,395 @@
+'''
+Переход posts, post_likes и post_comments на помесячное секционирование и обслуживание секций
+
+Порядок перехода (после миграции V0010, которая создает секционированные таблицы):
+    python scripts/partitions.py ensure            # месячные секции от первого поста до +3 месяцев
+    python scripts/partitions.py mirror            # зеркалирование новых записей триггерами
+    python scripts/partitions.py copy              # онлайн-копирование старых строк пакетами
+    python scripts/partitions.py verify            # удаление строк, удаленных во время копирования
+    python scripts/partitions.py search-index      # GIN-индекс полнотекстового поиска по секциям (V0014)
+    python scripts/partitions.py swap              # переименование таблиц одной короткой транзакцией
+    POSTS_PARTITIONED=1 в окружении функций posts и social  # запросы с отсечением секций
+
+Обслуживание:
+    python scripts/partitions.py ensure --months-ahead 3
+    python scripts/partitions.py detach --before 2023-01 --archive-dir /backups --drop
+'''
+
+import argparse
+import os
+import re
+import sys
+from datetime import date
+from typing import Dict, List, Tuple
+import psycopg2
+
+DEFAULT_BATCH_SIZE = 50000
+DEFAULT_MONTHS_AHEAD = 3
+
+# Логическая таблица -> (секционированная таблица до переключения, ключ секционирования)
+TABLES: Dict[str, Tuple[str, str]] = {
+    'posts': ('posts_partitioned', 'created_at'),
+    'post_likes': ('post_likes_partitioned', 'post_created_at'),
+    'post_comments': ('post_comments_partitioned', 'post_created_at'),
+}
+
+PARTITION_SUFFIX = re.compile(r'_y(\d{4})m(\d{2})$')
+
+def get_db_connection():
+    """Получение подключения к базе данных"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    return psycopg2.connect(DATABASE_URL)
+
+def is_swapped(cursor) -> bool:
+    """Переключение выполнено, если posts уже секционированная таблица"""
+    cursor.execute("SELECT relkind FROM pg_class WHERE relname = 'posts' AND relkind IN ('r', 'p')")
+    row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+def partitioned_name(cursor, table: str) -> str:
+    """Имя секционированной таблицы с учетом того, выполнено ли переключение"""
+    return table if is_swapped(cursor) else TABLES[table][0]
+
+def next_month(month: date) -> date:
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+# События, которые зеркалируются в секционированные таблицы до переключения
+MIRROR_EVENTS: Dict[str, str] = {
+    'posts': 'INSERT OR UPDATE OR DELETE',
+    'post_likes': 'INSERT OR DELETE',
+    'post_comments': 'INSERT OR UPDATE OR DELETE',
+}
+
+def insertable_columns(cursor, table: str) -> List[str]:
+    """Колонки таблицы без генерируемых (в них нельзя вставлять явно)"""
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+    """, (table,))
+    return [row[0] for row in cursor.fetchall()]
+
+def create_month_partition(conn, table: str, month: date) -> None:
+    """Секция месяца; строки этого месяца, уже попавшие в секцию по умолчанию, переносятся в нее.
+    Postgres не создает секцию, пока в секции по умолчанию есть строки из ее диапазона"""
+    shadow, key = TABLES[table]
+    upper = next_month(month)
+    name = f'{shadow}_y{month.year}m{month.month:02d}'
+    default = f'{shadow}_default'
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+    if cursor.fetchone()[0]:
+        cursor.close()
+        return
+
+    parent = partitioned_name(cursor, table)
+    columns = ', '.join(insertable_columns(cursor, default))
+
+    # Пока идет перенос, новые строки этого месяца не должны попасть в секцию по умолчанию
+    cursor.execute("SET LOCAL lock_timeout = '5s'")
+    cursor.execute(f"LOCK TABLE {default} IN ACCESS EXCLUSIVE MODE")
+    cursor.execute(f"""
+        CREATE TEMP TABLE partition_move ON COMMIT DROP AS
+        SELECT {columns} FROM {default} WHERE {key} >= %s AND {key} < %s
+    """, (month, upper))
+    moved = cursor.rowcount
+    if moved:
+        cursor.execute(f"DELETE FROM {default} WHERE {key} >= %s AND {key} < %s", (month, upper))
+
+    cursor.execute(f"""
+        CREATE TABLE {name} PARTITION OF {parent}
+        FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')
+    """)
+    if moved:
+        cursor.execute(f"INSERT INTO {parent} ({columns}) SELECT {columns} FROM partition_move")
+
+    conn.commit()
+    cursor.close()
+    print(f'{name}: создана' + (f', перенесено из {default} {moved} строк' if moved else ''), file=sys.stderr)
+
+def ensure_partitions(conn, months_ahead: int) -> None:
+    """Создание месячных секций от первого поста до текущего месяца + months_ahead, каждая отдельной транзакцией"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT date_trunc('month', COALESCE(MIN(created_at), NOW()))::date FROM posts")
+    month = cursor.fetchone()[0]
+    conn.commit()
+    cursor.close()
+
+    today = date.today().replace(day=1)
+    last = today
+    for _ in range(months_ahead):
+        last = next_month(last)
+
+    while month <= last:
+        for table in TABLES:
+            create_month_partition(conn, table, month)
+        month = next_month(month)
+
+    print(f'Секции созданы по {last.isoformat()}', file=sys.stderr)
+
+def is_mirroring(cursor) -> bool:
+    """Триггеры зеркалирования установлены на всех трех таблицах"""
+    cursor.execute("SELECT COUNT(*) FROM pg_trigger WHERE tgname = ANY(%s)",
+                   ([f'trg_{table}_mirror' for table in TABLES],))
+    return cursor.fetchone()[0] == len(TABLES)
+
+def install_mirroring(conn, months_ahead: int) -> None:
+    """Включение зеркалирования записей в секционированные таблицы; сначала создаются секции,
+    чтобы свежие строки ложились в свой месяц, а не в секцию по умолчанию"""
+    cursor = conn.cursor()
+    if is_swapped(cursor):
+        raise Exception('Таблицы уже переключены')
+    conn.commit()
+
+    ensure_partitions(conn, months_ahead)
+
+    for table, events in MIRROR_EVENTS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_mirror ON {table}")
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_mirror
+                AFTER {events} ON {table}
+                FOR EACH ROW EXECUTE FUNCTION mirror_to_partitioned()
+        """)
+    conn.commit()
+    cursor.close()
+    print('Зеркалирование включено', file=sys.stderr)
+
+def copy_rows(conn, batch_size: int) -> None:
+    """Онлайн-копирование старых строк пакетами по id; свежие записи уже зеркалируются триггерами"""
+    cursor = conn.cursor()
+    if is_swapped(cursor):
+        raise Exception('Таблицы уже переключены')
+    if not is_mirroring(cursor):
+        raise Exception('Сначала включите зеркалирование: scripts/partitions.py mirror')
+
+    statements = {
+        'posts': """
+            INSERT INTO posts_partitioned (id, user_id, content, image_url, likes_count, comments_count,
+                                           shares_count, created_at, updated_at)
+            SELECT id, user_id, content, image_url, likes_count, comments_count,
+                   shares_count, created_at, updated_at
+            FROM posts
+            WHERE id > %s AND id <= %s
+            ON CONFLICT DO NOTHING
+        """,
+        'post_likes': """
+            INSERT INTO post_likes_partitioned (id, post_id, user_id, post_created_at, created_at)
+            SELECT l.id, l.post_id, l.user_id, p.created_at, l.created_at
+            FROM post_likes l
+            JOIN posts p ON p.id = l.post_id
+            WHERE l.id > %s AND l.id <= %s
+            ON CONFLICT DO NOTHING
+        """,
+        'post_comments': """
+            INSERT INTO post_comments_partitioned (id, post_id, user_id, parent_comment_id, content, likes_count,
+                                                   post_created_at, created_at, updated_at)
+            SELECT c.id, c.post_id, c.user_id, c.parent_comment_id, c.content, c.likes_count,
+                   p.created_at, c.created_at, c.updated_at
+            FROM post_comments c
+            JOIN posts p ON p.id = c.post_id
+            WHERE c.id > %s AND c.id <= %s
+            ON CONFLICT DO NOTHING
+        """,
+    }
+
+    for table, sql in statements.items():
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+        max_id = cursor.fetchone()[0]
+        conn.commit()
+
+        last_id = 0
+        copied = 0
+        while last_id < max_id:
+            cursor.execute(sql, (last_id, last_id + batch_size))
+            copied += cursor.rowcount
+            conn.commit()
+            last_id += batch_size
+            print(f'{table}: до id {min(last_id, max_id)} из {max_id}, скопировано {copied}', file=sys.stderr)
+
+    cursor.close()
+
+def verify_rows(conn, batch_size: int) -> None:
+    """Удаление строк, которые копирование перенесло уже после их удаления в исходной таблице"""
+    cursor = conn.cursor()
+    if is_swapped(cursor):
+        raise Exception('Таблицы уже переключены')
+
+    checks = {
+        'posts': """
+            DELETE FROM posts_partitioned pp
+            WHERE pp.id > %s AND pp.id <= %s
+              AND NOT EXISTS (SELECT 1 FROM posts p WHERE p.id = pp.id)
+        """,
+        'post_likes': """
+            DELETE FROM post_likes_partitioned pl
+            WHERE pl.id > %s AND pl.id <= %s
+              AND NOT EXISTS (SELECT 1 FROM post_likes l WHERE l.post_id = pl.post_id AND l.user_id = pl.user_id)
+        """,
+        'post_comments': """
+            DELETE FROM post_comments_partitioned pc
+            WHERE pc.id > %s AND pc.id <= %s
+              AND NOT EXISTS (SELECT 1 FROM post_comments c WHERE c.id = pc.id)
+        """,
+    }
+
+    for table, sql in checks.items():
+        shadow = TABLES[table][0]
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {shadow}")
+        max_id = cursor.fetchone()[0]
+
+        last_id = 0
+        removed = 0
+        while last_id < max_id:
+            cursor.execute(sql, (last_id, last_id + batch_size))
+            removed += cursor.rowcount
+            conn.commit()
+            last_id += batch_size
+
+        cursor.execute(f"SELECT (SELECT COUNT(*) FROM {table}), (SELECT COUNT(*) FROM {shadow})")
+        source_count, shadow_count = cursor.fetchone()
+        conn.commit()
+        print(f'{table}: удалено лишних {removed}, строк {source_count} -> {shadow_count}', file=sys.stderr)
+
+def build_search_index(conn) -> None:
+    """GIN-индекс search_vector: на каждой секции CONCURRENTLY, затем подключение к индексу родителя"""
+    conn.autocommit = True
+    cursor = conn.cursor()
+    parent = partitioned_name(cursor, 'posts')
+    parent_index = f'idx_{TABLES["posts"][0]}_search_vector'
+
+    # Индекс только на родителе: новые секции (ensure) получают свой индекс автоматически
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {parent_index} ON ONLY {parent} USING GIN (search_vector)")
+
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (parent,))
+    for (name,) in cursor.fetchall():
+        index = f'{name}_search_vector_idx'
+        cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} ON {name} USING GIN (search_vector)")
+        cursor.execute(f"ALTER INDEX {parent_index} ATTACH PARTITION {index}")
+        print(f'{index}: готов', file=sys.stderr)
+
+    cursor.close()
+
+def swap_tables(conn) -> None:
+    """Переключение на секционированные таблицы одной транзакцией"""
+    cursor = conn.cursor()
+    if is_swapped(cursor):
+        raise Exception('Таблицы уже переключены')
+
+    cursor.execute("SET LOCAL lock_timeout = '5s'")
+    cursor.execute("LOCK TABLE posts, post_likes, post_comments IN ACCESS EXCLUSIVE MODE")
+
+    cursor.execute("DROP TRIGGER IF EXISTS trg_posts_mirror ON posts")
+    cursor.execute("DROP TRIGGER IF EXISTS trg_post_likes_mirror ON post_likes")
+    cursor.execute("DROP TRIGGER IF EXISTS trg_post_comments_mirror ON post_comments")
+
+    # Внешние ключи на posts(id) невозможны для секционированной таблицы
+    cursor.execute("ALTER TABLE post_scores DROP CONSTRAINT IF EXISTS post_scores_post_id_fkey")
+
+    for table, (shadow, _) in TABLES.items():
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+        cursor.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+        # Последовательность id переходит к новой таблице: иначе DROP *_legacy ее удалит (с CASCADE — вместе
+        # с DEFAULT у id), а pg_get_serial_sequence() в scripts/bulk_io.py вернет NULL
+        cursor.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_counter_change ON {table}_legacy")
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_counter_change
+                AFTER INSERT OR DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION log_counter_change()
+        """)
+
+    conn.commit()
+    cursor.close()
+    print('Таблицы переключены; старые данные остались в *_legacy', file=sys.stderr)
+
+def month_partitions(cursor, parent: str) -> List[Tuple[date, str]]:
+    """Месячные секции таблицы с датой начала месяца"""
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (parent,))
+    partitions = []
+    for (name,) in cursor.fetchall():
+        match = PARTITION_SUFFIX.search(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+def detach_partitions(conn, before: date, archive_dir: str, drop: bool) -> None:
+    """Отсоединение секций старше месяца before с выгрузкой в CSV и удалением"""
+    cursor = conn.cursor()
+
+    # Сначала зависимые таблицы, потом посты
+    for table in ('post_comments', 'post_likes', 'posts'):
+        parent = partitioned_name(cursor, table)
+        for month, name in month_partitions(cursor, parent):
+            if month >= before:
+                continue
+
+            cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {name}")
+            conn.commit()
+
+            if archive_dir:
+                path = os.path.join(archive_dir, f'{name}.csv')
+                with open(path, 'w', encoding='utf-8', newline='') as out:
+                    cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER true)", out)
+                print(f'{name}: выгружено в {path}', file=sys.stderr)
+
+            if drop:
+                cursor.execute(f"DROP TABLE {name}")
+                conn.commit()
+                print(f'{name}: удалена', file=sys.stderr)
+            else:
+                print(f'{name}: отсоединена', file=sys.stderr)
+
+    cursor.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Помесячное секционирование постов, лайков и комментариев')
+    parser.add_argument('command', choices=['ensure', 'mirror', 'copy', 'verify', 'search-index', 'swap', 'detach'])
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--months-ahead', type=int, default=DEFAULT_MONTHS_AHEAD)
+    parser.add_argument('--before', help='detach: месяц YYYY-MM, секции раньше него отсоединяются')
+    parser.add_argument('--archive-dir', default='', help='detach: каталог для CSV-архива секций')
+    parser.add_argument('--drop', action='store_true', help='detach: удалить отсоединенные секции')
+    args = parser.parse_args()
+
+    if args.command == 'detach' and not args.before:
+        parser.error('Для detach нужен --before YYYY-MM')
+    if args.drop and not args.archive_dir:
+        print('Внимание: секции удаляются без архива', file=sys.stderr)
+
+    conn = get_db_connection()
+    try:
+        if args.command == 'ensure':
+            ensure_partitions(conn, args.months_ahead)
+        elif args.command == 'mirror':
+            install_mirroring(conn, args.months_ahead)
+        elif args.command == 'copy':
+            copy_rows(conn, args.batch_size)
+        elif args.command == 'verify':
+            verify_rows(conn, args.batch_size)
+        elif args.command == 'search-index':
+            build_search_index(conn)
+        elif args.command == 'swap':
+            swap_tables(conn)
+        else:
+            year, month = args.before.split('-')
+            detach_partitions(conn, date(int(year), int(month), 1), args.archive_dir, args.drop)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+'''
+Сервер realtime-событий: одно подключение LISTEN к Postgres и раздача событий клиентам через SSE
+Функции posts и social вызывают pg_notify('social_events', ...) в той же транзакции, что и запись,
+поэтому клиенты узнают о новых постах, лайках, комментариях и подписках без опроса ленты.
+
+Клиент подключается к GET /events?token=<session_token> (или с заголовком X-Auth-Token; без токена —
+анонимно, только общие события). Токен проверяется так же, как в функциях: подпись v1.* и поколение
+сессии либо хэш в user_sessions; с недействительным токеном подключение отклоняется с 401.
+    post_created, comment — всем подписчикам
+    likes                 — всем, пакетом {"counts": {post_id: likes_count}} раз в --likes-interval
+    follow                — только участникам подписки (follower_id / following_id)
+
+Примеры:
+    python scripts/realtime_server.py --port 8081
+    python scripts/realtime_server.py --likes-interval 0.5 --max-buffer 262144
+'''
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+import psycopg2
+import psycopg2.extensions
+
+CHANNEL = 'social_events'
+
+DEFAULT_PORT = 8081
+DEFAULT_LIKES_INTERVAL = 1.0
+DEFAULT_HEARTBEAT_INTERVAL = 15.0
+# Клиент, не успевающий читать, отключается, а не копит события в памяти сервера
+DEFAULT_MAX_BUFFER = 256 * 1024
+
+RESPONSE_HEADERS = (
+    'HTTP/1.1 200 OK\r\n'
+    'Content-Type: text/event-stream\r\n'
+    'Cache-Control: no-cache\r\n'
+    'Connection: keep-alive\r\n'
+    'Access-Control-Allow-Origin: *\r\n'
+    '\r\n'
+    'retry: 3000\n\n'
+).encode()
+
+HEARTBEAT = b': ping\n\n'
+
+# Строка запроса и заголовки читаются с ограничением; после них от клиента ждут только EOF
+MAX_HEADER_BYTES = 8192
+MAX_HEADER_LINES = 64
+
+SESSION_SIGNING_KEY = os.environ.get('SESSION_SIGNING_KEY', '')
+
+def get_db_connection():
+    """Получение подключения к базе данных в режиме autocommit для LISTEN"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    return conn
+
+def parse_signed_token(session_token: str) -> Optional[Tuple[int, int]]:
+    """Проверка подписи и срока действия токена, возвращает (user_id, generation)"""
+    parts = session_token.split('.')
+    if not SESSION_SIGNING_KEY or len(parts) != 5 or parts[0] != 'v1':
+        return None
+
+    payload = '.'.join(parts[:4])
+    digest = hmac.new(SESSION_SIGNING_KEY.encode(), payload.encode(), hashlib.sha256).digest()
+    signature = base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+    if not hmac.compare_digest(signature, parts[4]):
+        return None
+
+    try:
+        user_id, expires, generation = int(parts[1]), int(parts[2]), int(parts[3])
+    except ValueError:
+        return None
+
+    if expires <= time.time():
+        return None
+    return user_id, generation
+
+class Authenticator:
+    """Проверка токенов сессий через отдельное подключение; вызывается из пула потоков"""
+
+    def __init__(self):
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def user_id(self, session_token: str) -> Optional[int]:
+        claims = None
+        if session_token.startswith('v1.'):
+            claims = parse_signed_token(session_token)
+            if not claims:
+                return None
+
+        with self.lock:
+            try:
+                if self.conn is None or self.conn.closed:
+                    self.conn = get_db_connection()
+                cursor = self.conn.cursor()
+                if claims:
+                    cursor.execute("SELECT session_generation FROM users WHERE id = %s", (claims[0],))
+                    row = cursor.fetchone()
+                    return claims[0] if row and row[0] == claims[1] else None
+                cursor.execute("""
+                    SELECT user_id FROM user_sessions
+                    WHERE token_hash = %s AND expires_at > NOW()
+                """, (hashlib.sha256(session_token.encode()).digest(),))
+                row = cursor.fetchone()
+                return row[0] if row else None
+            except psycopg2.Error:
+                if self.conn is not None:
+                    self.conn.close()
+                self.conn = None
+                raise
+
+def encode_event(event_type: str, data: Dict) -> bytes:
+    """SSE-кадр; кодируется один раз и раздается всем получателям"""
+    return f'event: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode()
+
+class Client:
+    def __init__(self, writer: asyncio.StreamWriter, user_id: Optional[int]):
+        self.writer = writer
+        self.user_id = user_id
+
+class Hub:
+    """Реестр подключенных клиентов и раздача кадров"""
+
+    def __init__(self, max_buffer: int):
+        self.max_buffer = max_buffer
+        self.clients: Set[Client] = set()
+        self.by_user: Dict[int, Set[Client]] = {}
+        # Последнее значение счетчика по посту с момента предыдущей рассылки
+        self.pending_likes: Dict[int, int] = {}
+        self.dropped = 0
+
+    def add(self, client: Client) -> None:
+        self.clients.add(client)
+        if client.user_id is not None:
+            self.by_user.setdefault(client.user_id, set()).add(client)
+
+    def remove(self, client: Client) -> None:
+        if client not in self.clients:
+            return
+        self.clients.discard(client)
+        if client.user_id is not None:
+            users = self.by_user.get(client.user_id)
+            if users is not None:
+                users.discard(client)
+                if not users:
+                    del self.by_user[client.user_id]
+        client.writer.close()
+
+    def send(self, clients, frame: bytes) -> None:
+        for client in list(clients):
+            transport = client.writer.transport
+            if transport.is_closing() or transport.get_write_buffer_size() > self.max_buffer:
+                self.dropped += 1
+                self.remove(client)
+                continue
+            client.writer.write(frame)
+
+    def dispatch(self, payload: str) -> None:
+        """Разбор уведомления Postgres и выбор получателей"""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            print(f'Некорректное уведомление: {payload[:200]}', file=sys.stderr)
+            return
+
+        event_type = event.pop('type', None)
+        if event_type == 'like':
+            self.pending_likes[event['post_id']] = event['likes_count']
+        elif event_type == 'likes':
+            # Пакет счетчиков от функции posts в режиме прямой записи лайков
+            for post_id, count in event['counts'].items():
+                self.pending_likes[int(post_id)] = count
+        elif event_type == 'follow':
+            frame = encode_event('follow', event)
+            for user_id in (event['follower_id'], event['following_id']):
+                self.send(self.by_user.get(user_id, ()), frame)
+        elif event_type:
+            self.send(self.clients, encode_event(event_type, event))
+
+    def flush_likes(self) -> None:
+        if not self.pending_likes:
+            return
+        counts = {str(post_id): count for post_id, count in self.pending_likes.items()}
+        self.pending_likes = {}
+        self.send(self.clients, encode_event('likes', {'counts': counts}))
+
+async def read_head(reader: asyncio.StreamReader) -> Tuple[bytes, Dict[str, str]]:
+    """Строка запроса и заголовки в пределах MAX_HEADER_BYTES / MAX_HEADER_LINES"""
+    request_line = await reader.readline()
+    size = len(request_line)
+    headers: Dict[str, str] = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        size += len(line)
+        if size > MAX_HEADER_BYTES:
+            raise ValueError('Слишком большие заголовки')
+        if line in (b'\r\n', b'\n', b''):
+            return request_line, headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    raise ValueError('Слишком много заголовков')
+
+async def handle_client(hub: Hub, auth: Authenticator, reader: asyncio.StreamReader,
+                        writer: asyncio.StreamWriter) -> None:
+    """Минимальный HTTP: GET /events?token=, дальше соединение держится открытым"""
+    try:
+        request_line, headers = await asyncio.wait_for(read_head(reader), timeout=10)
+    except (asyncio.TimeoutError, ConnectionError, ValueError, asyncio.LimitOverrunError):
+        writer.close()
+        return
+
+    parts = request_line.decode('latin-1').split()
+    if len(parts) < 2 or parts[0] not in ('GET', 'OPTIONS'):
+        writer.write(b'HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\n\r\n')
+        writer.close()
+        return
+
+    if parts[0] == 'OPTIONS':
+        writer.write(
+            b'HTTP/1.1 200 OK\r\n'
+            b'Access-Control-Allow-Origin: *\r\n'
+            b'Access-Control-Allow-Methods: GET, OPTIONS\r\n'
+            b'Access-Control-Allow-Headers: Content-Type\r\n'
+            b'Content-Length: 0\r\n\r\n'
+        )
+        writer.close()
+        return
+
+    url = urlsplit(parts[1])
+    if url.path != '/events':
+        writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n')
+        writer.close()
+        return
+
+    session_token = parse_qs(url.query).get('token', [''])[0] or headers.get('x-auth-token', '')
+    user_id = None
+    if session_token:
+        try:
+            user_id = await asyncio.get_running_loop().run_in_executor(None, auth.user_id, session_token)
+        except Exception as error:
+            print(f'Проверка токена не удалась: {error}', file=sys.stderr)
+            writer.write(b'HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n')
+            writer.close()
+            return
+        if user_id is None:
+            writer.write(b'HTTP/1.1 401 Unauthorized\r\nAccess-Control-Allow-Origin: *\r\nContent-Length: 0\r\n\r\n')
+            writer.close()
+            return
+
+    client = Client(writer, user_id)
+    writer.write(RESPONSE_HEADERS)
+    hub.add(client)
+
+    try:
+        # Клиент ничего не присылает; все, что пришло, отбрасывается порциями до EOF
+        while await reader.read(1024):
+            pass
+    except ConnectionError:
+        pass
+    finally:
+        hub.remove(client)
+
+async def listen(hub: Hub) -> None:
+    """LISTEN с переподключением; уведомления читаются по готовности сокета, без опроса"""
+    loop = asyncio.get_running_loop()
+
+    while True:
+        conn = None
+        try:
+            conn = get_db_connection()
+            conn.cursor().execute(f'LISTEN {CHANNEL}')
+        except Exception as error:
+            print(f'Нет подключения к базе: {error}', file=sys.stderr)
+            if conn is not None:
+                conn.close()
+            await asyncio.sleep(3)
+            continue
+
+        lost = loop.create_future()
+
+        def on_readable() -> None:
+            try:
+                conn.poll()
+            except psycopg2.Error as error:
+                if not lost.done():
+                    lost.set_result(error)
+                return
+            while conn.notifies:
+                hub.dispatch(conn.notifies.pop(0).payload)
+
+        loop.add_reader(conn.fileno(), on_readable)
+        print(f'LISTEN {CHANNEL}', file=sys.stderr)
+
+        error = await lost
+        loop.remove_reader(conn.fileno())
+        conn.close()
+        print(f'Подключение LISTEN потеряно: {error}', file=sys.stderr)
+        await asyncio.sleep(1)
+
+async def periodic(interval: float, callback) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        callback()
+
+async def report(hub: Hub, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        print(f'{time.strftime("%H:%M:%S")} клиентов {len(hub.clients)}, отключено медленных {hub.dropped}',
+              file=sys.stderr)
+
+async def serve(args: argparse.Namespace) -> None:
+    hub = Hub(args.max_buffer)
+    auth = Authenticator()
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_client(hub, auth, reader, writer),
+        args.host, args.port, backlog=4096
+    )
+    print(f'SSE на http://{args.host}:{args.port}/events', file=sys.stderr)
+
+    async with server:
+        await asyncio.gather(
+            server.serve_forever(),
+            listen(hub),
+            periodic(args.likes_interval, hub.flush_likes),
+            periodic(args.heartbeat_interval, lambda: hub.send(hub.clients, HEARTBEAT)),
+            report(hub, 60),
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Раздача событий LISTEN/NOTIFY клиентам через SSE')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--likes-interval', type=float, default=DEFAULT_LIKES_INTERVAL,
+                        help='Период пакетной рассылки счетчиков лайков, секунды')
+    parser.add_argument('--heartbeat-interval', type=float, default=DEFAULT_HEARTBEAT_INTERVAL)
+    parser.add_argument('--max-buffer', type=int, default=DEFAULT_MAX_BUFFER,
+                        help='Предел неотправленных байт на клиента, после которого он отключается')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
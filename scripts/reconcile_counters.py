@@ -0,0 +1,220 @@
+'''
+Сверка денормализованных счетчиков *_count с фактическими данными
+Пересчитывает только пользователей и посты из журнала counter_changes (водяной знак — id записи журнала),
+небольшими set-based пакетами в коротких транзакциях
+
+Примеры:
+    python scripts/reconcile_counters.py --dry-run
+    python scripts/reconcile_counters.py --batch-size 2000
+    python scripts/reconcile_counters.py --full
+'''
+
+import argparse
+import os
+import sys
+from typing import Dict, Any, List, Tuple
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Ожидаемые значения счетчиков считаются коррелированными подзапросами
+# по индексам idx_user_follows_*, idx_posts_user_id и idx_post_*_post_id
+ENTITIES: Dict[str, Dict[str, Any]] = {
+    'user': {
+        'table': 'users',
+        'counters': {
+            'followers_count': 'SELECT COUNT(*) FROM user_follows f WHERE f.following_id = t.id',
+            'following_count': 'SELECT COUNT(*) FROM user_follows f WHERE f.follower_id = t.id',
+            'posts_count': 'SELECT COUNT(*) FROM posts p WHERE p.user_id = t.id',
+        },
+    },
+    'post': {
+        'table': 'posts',
+        'counters': {
+            'likes_count': 'SELECT COUNT(*) FROM post_likes l WHERE l.post_id = t.id',
+            'comments_count': 'SELECT COUNT(*) FROM post_comments c WHERE c.post_id = t.id',
+        },
+    },
+}
+
+def get_db_connection():
+    """Получение подключения к базе данных"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+
+def drift_query(entity: str, dry_run: bool) -> str:
+    """SQL, который находит расхождения для набора id и (если не dry-run) исправляет их"""
+    table = ENTITIES[entity]['table']
+    counters = ENTITIES[entity]['counters']
+
+    expected_columns = ',\n'.join(f'({sql}) AS {name}' for name, sql in counters.items())
+    differs = ' OR '.join(f't.{name} IS DISTINCT FROM e.{name}' for name in counters)
+    drift_columns = ',\n'.join(
+        f'ABS(COALESCE(t.{name}, 0) - e.{name}) AS {name}_drift' for name in counters
+    )
+
+    base = f"""
+        WITH expected AS (
+            SELECT t.id, {expected_columns}
+            FROM {table} t
+            WHERE t.id = ANY(%s)
+        ),
+        drift AS (
+            SELECT e.*, {drift_columns}
+            FROM expected e
+            JOIN {table} t ON t.id = e.id
+            WHERE {differs}
+        )
+    """
+
+    drift_names = ', '.join(f'd.{name}_drift' for name in counters)
+    if dry_run:
+        return base + f'SELECT d.id, {drift_names} FROM drift d'
+
+    assignments = ', '.join(f'{name} = d.{name}' for name in counters)
+    return base + f"""
+        UPDATE {table} t SET {assignments}
+        FROM drift d
+        WHERE t.id = d.id
+        RETURNING d.id, {drift_names}
+    """
+
+def reconcile_ids(cursor, entity: str, ids: List[int], dry_run: bool, report: Dict[str, int]) -> None:
+    """Сверка счетчиков для пакета id одной сущности"""
+    if not ids:
+        return
+
+    cursor.execute(drift_query(entity, dry_run), (ids,))
+    rows = cursor.fetchall()
+
+    report[f'{entity}_checked'] += len(ids)
+    report[f'{entity}_drifted'] += len(rows)
+    for row in rows:
+        for name in ENTITIES[entity]['counters']:
+            report[f'{name}_drift'] += row[f'{name}_drift']
+
+def fetch_changes(cursor, after_id: int, batch_size: int, dry_run: bool) -> List[Dict]:
+    """Очередная порция журнала: в dry-run только чтение, иначе записи забираются из журнала"""
+    if dry_run:
+        cursor.execute("""
+            SELECT id, entity, entity_id FROM counter_changes
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+        """, (after_id, batch_size))
+    else:
+        # SKIP LOCKED позволяет запускать несколько воркеров параллельно
+        cursor.execute("""
+            WITH batch AS (
+                SELECT id FROM counter_changes
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            DELETE FROM counter_changes c
+            USING batch
+            WHERE c.id = batch.id
+            RETURNING c.id, c.entity, c.entity_id
+        """, (after_id, batch_size))
+    return cursor.fetchall()
+
+def group_changes(changes: List[Dict]) -> Tuple[List[int], List[int]]:
+    """Дедупликация затронутых id по сущностям"""
+    user_ids = sorted({change['entity_id'] for change in changes if change['entity'] == 'user'})
+    post_ids = sorted({change['entity_id'] for change in changes if change['entity'] == 'post'})
+    return user_ids, post_ids
+
+def run_incremental(conn, batch_size: int, dry_run: bool, report: Dict[str, int]) -> None:
+    """Сверка по журналу изменений начиная с водяного знака"""
+    cursor = conn.cursor()
+    watermark = 0
+
+    while True:
+        changes = fetch_changes(cursor, watermark, batch_size, dry_run)
+        if not changes:
+            conn.rollback()
+            break
+
+        user_ids, post_ids = group_changes(changes)
+        reconcile_ids(cursor, 'user', user_ids, dry_run, report)
+        reconcile_ids(cursor, 'post', post_ids, dry_run, report)
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+
+        watermark = max(change['id'] for change in changes)
+        report['changes'] += len(changes)
+
+    cursor.close()
+
+def run_full(conn, batch_size: int, dry_run: bool, report: Dict[str, int]) -> None:
+    """Полная сверка всех пользователей и постов пакетами по id"""
+    cursor = conn.cursor()
+
+    for entity, settings in ENTITIES.items():
+        last_id = 0
+        while True:
+            cursor.execute(f"""
+                SELECT id FROM {settings['table']}
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            ids = [row['id'] for row in cursor.fetchall()]
+            if not ids:
+                break
+
+            reconcile_ids(cursor, entity, ids, dry_run, report)
+
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+
+            last_id = ids[-1]
+
+    cursor.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Сверка денормализованных счетчиков')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='Только отчет о расхождениях, без исправлений')
+    parser.add_argument('--full', action='store_true', help='Проверить все строки, а не только журнал изменений')
+    parser.add_argument('--lock-timeout', default='2s', help='lock_timeout для пакетных UPDATE')
+    args = parser.parse_args()
+
+    report: Dict[str, int] = {key: 0 for key in [
+        'changes', 'user_checked', 'user_drifted', 'post_checked', 'post_drifted',
+        'followers_count_drift', 'following_count_drift', 'posts_count_drift',
+        'likes_count_drift', 'comments_count_drift',
+    ]}
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        # Пакет, не дождавшийся блокировки строки, падает, а не висит за длинной транзакцией
+        cursor.execute("SELECT set_config('lock_timeout', %s, false)", (args.lock_timeout,))
+        cursor.close()
+        conn.commit()
+
+        if args.full:
+            run_full(conn, args.batch_size, args.dry_run, report)
+        else:
+            run_incremental(conn, args.batch_size, args.dry_run, report)
+    finally:
+        conn.close()
+
+    mode = 'dry-run' if args.dry_run else 'исправлено'
+    print(f'Сверка счетчиков ({mode}):', file=sys.stderr)
+    for key, value in report.items():
+        print(f'  {key}: {value}', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+'''
+Обновление оценок популярности постов для ленты sort=top
+Пересчитывает post_scores только для постов окна, у которых изменились счетчики,
+и удаляет оценки постов, вышедших из окна
+
+Примеры:
+    python scripts/refresh_post_scores.py
+    python scripts/refresh_post_scores.py --window-days 3
+'''
+
+import argparse
+import os
+import sys
+import psycopg2
+
+DEFAULT_WINDOW_DAYS = 7
+
+def get_db_connection():
+    """Получение подключения к базе данных"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    return psycopg2.connect(DATABASE_URL)
+
+def refresh_scores(conn, window_days: int) -> None:
+    """Инкрементальное обновление post_scores"""
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        INSERT INTO post_scores (post_id, score, likes_count, comments_count, post_created_at, refreshed_at)
+        SELECT p.id, post_score(p.likes_count, p.comments_count, p.created_at),
+               COALESCE(p.likes_count, 0), COALESCE(p.comments_count, 0), p.created_at, NOW()
+        FROM posts p
+        LEFT JOIN post_scores s ON s.post_id = p.id
+        WHERE p.created_at > NOW() - %s * INTERVAL '1 day'
+          AND (s.post_id IS NULL
+               OR s.likes_count IS DISTINCT FROM COALESCE(p.likes_count, 0)
+               OR s.comments_count IS DISTINCT FROM COALESCE(p.comments_count, 0))
+        ON CONFLICT (post_id) DO UPDATE
+        SET score = EXCLUDED.score,
+            likes_count = EXCLUDED.likes_count,
+            comments_count = EXCLUDED.comments_count,
+            refreshed_at = EXCLUDED.refreshed_at
+    """, (window_days,))
+    updated = cursor.rowcount
+
+    cursor.execute("""
+        DELETE FROM post_scores
+        WHERE post_created_at <= NOW() - %s * INTERVAL '1 day'
+    """, (window_days,))
+    expired = cursor.rowcount
+
+    conn.commit()
+    cursor.close()
+
+    print(f'post_scores: обновлено {updated}, удалено устаревших {expired}', file=sys.stderr)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Обновление оценок популярности постов')
+    parser.add_argument('--window-days', type=int, default=DEFAULT_WINDOW_DAYS)
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        refresh_scores(conn, args.window_days)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+'''
+Проверка маршрутизации чтений на реплику и read-your-writes на паре из docker-compose.yml
+Подписка выполняется на основном сервере, затем профиль читается с подсказкой X-Min-Lsn
+и без нее; с подсказкой is_following должен быть виден сразу
+
+Пример:
+    DATABASE_URL=... DATABASE_REPLICA_URLS=... python scripts/replica/check_routing.py \\
+        --token <session_token> --user-id 2
+'''
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+
+def load_module(name: str):
+    """Загрузка backend/<name>/index.py как модуля"""
+    path = os.path.join(os.path.dirname(__file__), '..', '..', 'backend', name, 'index.py')
+    spec = importlib.util.spec_from_file_location(f'{name}_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def server_role(social) -> str:
+    """Куда попадает подключение для чтения"""
+    conn = social.get_db_connection(readonly=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_is_in_recovery() AS replica")
+    role = 'реплика' if cursor.fetchone()['replica'] else 'основной'
+    cursor.close()
+    conn.close()
+    return role
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Проверка read-your-writes через реплику')
+    parser.add_argument('--token', required=True)
+    parser.add_argument('--user-id', type=int, required=True, help='На кого подписаться')
+    args = parser.parse_args()
+
+    social = load_module('social')
+    if not social.DATABASE_REPLICA_URLS:
+        raise Exception('DATABASE_REPLICA_URLS не задан')
+
+    print(f'Чтение без подсказки идет на: {server_role(social)}', file=sys.stderr)
+
+    headers = {'X-Auth-Token': args.token}
+    social.handler({'httpMethod': 'POST', 'queryStringParameters': {'action': 'unfollow'},
+                    'headers': headers, 'body': json.dumps({'user_id': args.user_id})}, None)
+    follow = social.handler({'httpMethod': 'POST', 'queryStringParameters': {'action': 'follow'},
+                             'headers': headers, 'body': json.dumps({'user_id': args.user_id})}, None)
+    if follow['statusCode'] != 200:
+        raise Exception(follow['body'])
+
+    hint = follow['headers']['X-Write-Lsn']
+    profile = social.handler({'httpMethod': 'GET',
+                              'queryStringParameters': {'action': 'profile', 'user_id': str(args.user_id)},
+                              'headers': {**headers, 'X-Min-Lsn': hint}}, None)
+    is_following = json.loads(profile['body'])['user']['is_following']
+
+    print(f'X-Write-Lsn: {hint}, is_following после подписки: {is_following}', file=sys.stderr)
+    sys.exit(0 if is_following else 1)
+
+if __name__ == '__main__':
+    main()
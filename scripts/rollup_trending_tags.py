@@ -0,0 +1,69 @@
+'''
+Почасовой свод счетчиков хэштегов для трендов (action=trending функции posts)
+Пересчитывает tag_counts_hourly за последние --hours часов (текущий неполный час включительно)
+по индексу idx_post_tags_created; запускается раз в час или чаще
+
+Примеры:
+    python scripts/rollup_trending_tags.py
+    python scripts/rollup_trending_tags.py --hours 168   # после backfill_post_tags.py
+'''
+
+import argparse
+import os
+import sys
+import psycopg2
+
+DEFAULT_HOURS = 2
+DEFAULT_RETENTION_DAYS = 7
+
+def get_db_connection():
+    """Получение подключения к базе данных"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    return psycopg2.connect(DATABASE_URL)
+
+def rollup(conn, hours: int, retention_days: int) -> None:
+    """Пересчет часов окна одной транзакцией и удаление часов старше срока хранения"""
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT date_trunc('hour', NOW()) - %s * INTERVAL '1 hour'", (hours - 1,))
+    since = cursor.fetchone()[0]
+
+    # Теги, исчезнувшие из часа (например, после повторного backfill), не должны оставаться в своде
+    cursor.execute("DELETE FROM tag_counts_hourly WHERE hour >= %s", (since,))
+    cursor.execute("""
+        INSERT INTO tag_counts_hourly (hour, tag, posts_count)
+        SELECT date_trunc('hour', post_created_at), tag, COUNT(*)
+        FROM post_tags
+        WHERE post_created_at >= %s
+        GROUP BY 1, 2
+    """, (since,))
+    inserted = cursor.rowcount
+
+    cursor.execute("""
+        DELETE FROM tag_counts_hourly
+        WHERE hour < NOW() - %s * INTERVAL '1 day'
+    """, (retention_days,))
+    expired = cursor.rowcount
+
+    conn.commit()
+    cursor.close()
+
+    print(f'tag_counts_hourly: с {since} записано {inserted}, удалено устаревших {expired}', file=sys.stderr)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Почасовой свод счетчиков хэштегов')
+    parser.add_argument('--hours', type=int, default=DEFAULT_HOURS, help='Сколько последних часов пересчитать')
+    parser.add_argument('--retention-days', type=int, default=DEFAULT_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        rollup(conn, max(args.hours, 1), args.retention_days)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
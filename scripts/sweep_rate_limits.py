@@ -0,0 +1,71 @@
+'''
+Очистка корзин лимитов запросов
+Удаляет строки rate_limit_buckets, не обновлявшиеся дольше --idle, ограниченными пакетами в отдельных транзакциях.
+Такие корзины уже пополнились до конца, и при следующем запросе функция создаст их заново
+
+Примеры:
+    python scripts/sweep_rate_limits.py
+    python scripts/sweep_rate_limits.py --idle '2 days' --batch-size 5000
+'''
+
+import argparse
+import os
+import sys
+import time
+import psycopg2
+
+DEFAULT_BATCH_SIZE = 10000
+
+def get_db_connection():
+    """Получение подключения к базе данных"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    return psycopg2.connect(DATABASE_URL)
+
+def sweep_rate_limit_buckets(conn, batch_size: int, idle: str, pause: float) -> int:
+    """Пакетное удаление корзин по индексу idx_rate_limit_buckets_updated"""
+    cursor = conn.cursor()
+    deleted = 0
+
+    while True:
+        cursor.execute("""
+            DELETE FROM rate_limit_buckets
+            WHERE key IN (
+                SELECT key FROM rate_limit_buckets
+                WHERE updated_at <= NOW() - %s::interval
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+        """, (idle, batch_size))
+        batch_deleted = cursor.rowcount
+        conn.commit()
+
+        deleted += batch_deleted
+        if batch_deleted < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    cursor.close()
+    return deleted
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Очистка давно не обновлявшихся корзин лимитов')
+    parser.add_argument('--idle', default='1 day',
+                        help='Возраст корзины, после которого она удаляется (не меньше самого длинного периода лимита)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=0.0, help='Пауза между пакетами, секунды')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        deleted = sweep_rate_limit_buckets(conn, args.batch_size, args.idle, args.pause)
+    finally:
+        conn.close()
+
+    print(f'Удалено корзин лимитов: {deleted}', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
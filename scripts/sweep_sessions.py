@@ -0,0 +1,69 @@
+'''
+Очистка истекших сессий пользователей
+Удаляет строки user_sessions с истекшим expires_at ограниченными пакетами в отдельных транзакциях
+
+Примеры:
+    python scripts/sweep_sessions.py
+    python scripts/sweep_sessions.py --batch-size 5000 --pause 0.1
+'''
+
+import argparse
+import os
+import sys
+import time
+import psycopg2
+
+DEFAULT_BATCH_SIZE = 10000
+
+def get_db_connection():
+    """Получение подключения к базе данных"""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        raise Exception('DATABASE_URL environment variable not set')
+
+    return psycopg2.connect(DATABASE_URL)
+
+def sweep_expired_sessions(conn, batch_size: int, pause: float) -> int:
+    """Пакетное удаление истекших сессий по индексу idx_user_sessions_expires"""
+    cursor = conn.cursor()
+    deleted = 0
+
+    while True:
+        cursor.execute("""
+            DELETE FROM user_sessions
+            WHERE id IN (
+                SELECT id FROM user_sessions
+                WHERE expires_at <= NOW()
+                ORDER BY expires_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+        """, (batch_size,))
+        batch_deleted = cursor.rowcount
+        conn.commit()
+
+        deleted += batch_deleted
+        if batch_deleted < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    cursor.close()
+    return deleted
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Очистка истекших сессий')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=0.0, help='Пауза между пакетами, секунды')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        deleted = sweep_expired_sessions(conn, args.batch_size, args.pause)
+    finally:
+        conn.close()
+
+    print(f'Удалено истекших сессий: {deleted}', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
+import { apiFetch } from '@/lib/api';
 
 interface User {
   id: number;
@@ -46,7 +47,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
     if (!sessionToken) return;
 
     try {
-      const response = await fetch(`${API_BASE_URL}?action=me`, {
+      const response = await apiFetch(`${API_BASE_URL}?action=me`, {
         headers: {
           'X-Auth-Token': sessionToken,
         },
@@ -69,7 +70,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
   };
 
   const login = async (email: string, password: string) => {
-    const response = await fetch(`${API_BASE_URL}?action=login`, {
+    const response = await apiFetch(`${API_BASE_URL}?action=login`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -89,7 +90,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
   };
 
   const register = async (registerData: { username: string; email: string; password: string; fullName: string }) => {
-    const response = await fetch(`${API_BASE_URL}?action=register`, {
+    const response = await apiFetch(`${API_BASE_URL}?action=register`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -111,7 +112,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
   const logout = async () => {
     if (sessionToken) {
       try {
-        await fetch(`${API_BASE_URL}?action=logout`, {
+        await apiFetch(`${API_BASE_URL}?action=logout`, {
           method: 'POST',
           headers: {
             'X-Auth-Token': sessionToken,
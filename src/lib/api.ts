@@ -0,0 +1,19 @@
+// Подсказка read-your-writes: LSN последней записи из заголовка X-Write-Lsn.
+// Чтения передают ее в X-Min-Lsn, чтобы сервер не отвечал с отстающей реплики
+let writeLsnHint: string | null = null;
+
+export const apiFetch = async (input: string, init: RequestInit = {}): Promise<Response> => {
+  const headers = new Headers(init.headers);
+  if (writeLsnHint) {
+    headers.set('X-Min-Lsn', writeLsnHint);
+  }
+
+  const response = await fetch(input, { ...init, headers });
+
+  const writeLsn = response.headers.get('X-Write-Lsn');
+  if (writeLsn) {
+    writeLsnHint = writeLsn;
+  }
+
+  return response;
+};
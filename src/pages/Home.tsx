@@ -10,6 +10,7 @@ import { Badge } from '@/components/ui/badge';
 import Icon from '@/components/ui/icon';
 import ImageUpload from '@/components/ImageUpload';
 import { toast } from 'sonner';
+import { apiFetch } from '@/lib/api';
 
 interface Post {
   id: number;
@@ -49,13 +50,14 @@ const Home = () => {
 
   const loadPosts = async () => {
     try {
-      const response = await fetch(API_POSTS_URL, {
+      const response = await apiFetch(API_POSTS_URL, {
         headers: sessionToken ? { 'X-Auth-Token': sessionToken } : {},
       });
 
       if (response.ok) {
         const data = await response.json();
-        setPosts(data.posts || []);
+        const users = data.users || {};
+        setPosts((data.posts || []).map((post: Post) => ({ ...users[post.user_id], ...post })));
       }
     } catch (error) {
       console.error('Ошибка загрузки постов:', error);
@@ -70,7 +72,7 @@ const Home = () => {
 
     setCreating(true);
     try {
-      const response = await fetch(`${API_POSTS_URL}?action=create`, {
+      const response = await apiFetch(`${API_POSTS_URL}?action=create`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -103,7 +105,7 @@ const Home = () => {
     if (!sessionToken) return;
 
     try {
-      const response = await fetch(`${API_POSTS_URL}?action=like`, {
+      const response = await apiFetch(`${API_POSTS_URL}?action=like`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
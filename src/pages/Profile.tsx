@@ -7,6 +7,7 @@ import { Avatar, AvatarFallback, AvatarImage } from '@/components/ui/avatar';
 import { Badge } from '@/components/ui/badge';
 import Icon from '@/components/ui/icon';
 import { toast } from 'sonner';
+import { apiFetch } from '@/lib/api';
 
 interface UserProfile {
   id: number;
@@ -54,7 +55,7 @@ const Profile = () => {
     if (!userId) return;
 
     try {
-      const response = await fetch(`${API_SOCIAL_URL}?action=profile&user_id=${userId}`, {
+      const response = await apiFetch(`${API_SOCIAL_URL}?action=profile&user_id=${userId}`, {
         headers: sessionToken ? { 'X-Auth-Token': sessionToken } : {},
       });
 
@@ -79,7 +80,7 @@ const Profile = () => {
     setFollowLoading(true);
     try {
       const action = profile.is_following ? 'unfollow' : 'follow';
-      const response = await fetch(`${API_SOCIAL_URL}?action=${action}`, {
+      const response = await apiFetch(`${API_SOCIAL_URL}?action=${action}`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -112,7 +113,7 @@ const Profile = () => {
     if (!sessionToken) return;
 
     try {
-      const response = await fetch(`${API_POSTS_URL}?action=like`, {
+      const response = await apiFetch(`${API_POSTS_URL}?action=like`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -0,0 +1,108 @@
+import importlib.util
+import io
+import os
+
+import pytest
+
+pytest.importorskip('psycopg2')
+
+SCRIPT = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'bulk_io.py')
+
+
+def load_bulk_io():
+    spec = importlib.util.spec_from_file_location('bulk_io', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class RecordingCursor:
+    """Курсор, запоминающий SQL и данные, переданные в COPY"""
+
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.statements.append(' '.join(sql.split()))
+        self.rowcount = sum(chunk.count('\n') for chunk in self.copied[-1:]) if 'INSERT' in sql else 0
+
+    def copy_expert(self, sql, buffer):
+        self.statements.append(' '.join(sql.split()))
+        self.copied.append(buffer.read())
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.cursor_instance = RecordingCursor()
+        self.commits = 0
+
+    def cursor(self):
+        return self.cursor_instance
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_import_small_csv_copies_file_rows():
+    bulk_io = load_bulk_io()
+    conn = RecordingConnection()
+    source = io.StringIO(
+        'follower_id,following_id,created_at\n'
+        '1,2,2024-01-01 10:00:00\n'
+        '2,1,2024-01-02 11:00:00\n'
+        '3,3,2024-01-03 12:00:00\n'
+    )
+
+    imported = bulk_io.import_table(conn, 'user_follows', source, 'csv', chunk_rows=2)
+
+    cursor = conn.cursor_instance
+    assert cursor.copied == [
+        '1,2,2024-01-01 10:00:00\r\n2,1,2024-01-02 11:00:00\r\n',
+        '3,3,2024-01-03 12:00:00\r\n',
+    ]
+    assert imported == 3
+    inserts = [sql for sql in cursor.statements if sql.startswith('INSERT INTO user_follows')]
+    assert len(inserts) == 2
+    assert all('FROM bulk_stage WHERE follower_id <> following_id' in sql for sql in inserts)
+
+
+def test_import_likes_joins_posts_for_post_created_at():
+    bulk_io = load_bulk_io()
+    conn = RecordingConnection()
+    source = io.StringIO('post_id,user_id,created_at\n10,1,2024-01-01 10:00:00\n')
+
+    bulk_io.import_table(conn, 'post_likes', source, 'csv', chunk_rows=100)
+
+    cursor = conn.cursor_instance
+    assert cursor.copied == ['10,1,2024-01-01 10:00:00\r\n']
+    insert = next(sql for sql in cursor.statements if sql.startswith('INSERT INTO post_likes'))
+    assert 'post_created_at' in insert
+    assert 'FROM bulk_stage s JOIN posts p ON p.id = s.post_id' in insert
+
+
+def test_import_without_counter_log_sets_session_flag():
+    bulk_io = load_bulk_io()
+    conn = RecordingConnection()
+    source = io.StringIO('follower_id,following_id,created_at\n1,2,2024-01-01 10:00:00\n')
+
+    bulk_io.import_table(conn, 'user_follows', source, 'csv', chunk_rows=100, log_counter_changes=False)
+
+    statements = conn.cursor_instance.statements
+    assert statements[0] == "SET app.skip_counter_log = 'on'"
+    assert statements[-1] == 'RESET app.skip_counter_log'
+    assert not any('skip_counter_log' in sql for sql in statements[1:-1])
+
+
+def test_import_with_counter_log_leaves_session_untouched():
+    bulk_io = load_bulk_io()
+    conn = RecordingConnection()
+    source = io.StringIO('follower_id,following_id,created_at\n1,2,2024-01-01 10:00:00\n')
+
+    bulk_io.import_table(conn, 'user_follows', source, 'csv', chunk_rows=100)
+
+    assert not any('skip_counter_log' in sql for sql in conn.cursor_instance.statements)